@@ -9,8 +9,23 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from .core.warmup import warmup  # noqa: E402
+from .graphql.subscriptions import subscriptions_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # the GraphQL subscriptions are served by WebSocket on the GraphQL path
+    if scope["type"] == "websocket" and scope["path"] == "/graphql/":
+        return await subscriptions_application(scope, receive, send)
+    return await django_application(scope, receive, send)
+
+
+if settings.WARMUP_ON_STARTUP:
+    warmup()
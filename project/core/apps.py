@@ -0,0 +1,12 @@
+from django.apps import AppConfig, apps
+
+
+class CoreConfig(AppConfig):
+    name = 'project.core'
+
+    def ready(self):
+        from .signals import get_file_fields, track_blob_references
+
+        for model in apps.get_models():
+            if get_file_fields(model):
+                track_blob_references(model)
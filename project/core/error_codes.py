@@ -3,5 +3,16 @@ from enum import Enum
 
 class UploadErrorCodes(Enum):
     GRAPHQL_ERROR = "graphql_error"
+    INVALID = "invalid"
+    INVALID_OFFSET = "invalid_offset"
+    NOT_FOUND = "not_found"
+    QUOTA_EXCEEDED = "quota_exceeded"
+    REQUIRED = "required"
 
 
+class QueryErrorCodes(Enum):
+    QUERY_TOO_DEEP = "query_too_deep"
+    QUERY_TOO_COMPLEX = "query_too_complex"
+    BATCH_TOO_LARGE = "batch_too_large"
+    INVALID_CURSOR = "invalid_cursor"
+    SEARCH_NOT_SUPPORTED = "search_not_supported"
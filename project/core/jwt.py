@@ -6,8 +6,11 @@ from typing import Any, Dict, Optional
 
 from django.conf import settings
 from django.core.handlers.wsgi import WSGIRequest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from ..users.error_codes import UserErrorCodes
+from .jwt_keys import keyset
 
 from ..users.models import User
 
@@ -52,20 +55,52 @@ def jwt_user_payload(
 
 
 def jwt_encode(payload: Dict[str, Any]) -> str:
+    """Sign the token with the newest published key of the keyset. The tokens
+    are signed with the SECRET_KEY with HS256 until a key is published."""
+    key = None
+    if settings.JWT_ALGORITHM != "HS256":
+        key = keyset.get_signing_key()
+    if key is None:
+        return jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
+
     token = jwt.encode(
-        payload, 
-        settings.SECRET_KEY, 
-        algorithm="HS256",
+        payload,
+        key.private_key,
+        algorithm=key.algorithm,
+        headers={"kid": key.kid},
     )
     return token
 
 
+def secret_key_tokens_accepted() -> bool:
+    """Return whether the tokens signed with the SECRET_KEY are verified.
+
+    With an asymmetric `JWT_ALGORITHM` they are only accepted until
+    `JWT_SECRET_KEY_TOKENS_UNTIL`, the end of the migration to the keyset.
+    """
+    if settings.JWT_ALGORITHM == "HS256":
+        return True
+    until = parse_datetime(settings.JWT_SECRET_KEY_TOKENS_UNTIL or "")
+    if until is None:
+        return False
+    if timezone.is_naive(until):
+        until = timezone.make_aware(until, timezone.utc)
+    return timezone.now() < until
+
+
 def jwt_decode(token: str) -> Dict[str, Any]:
-    payload = jwt.decode(
-        token,
-        settings.SECRET_KEY, 
-        algorithms=["HS256"]
-    )
+    """Verify the token with the key of its `kid`, or with the SECRET_KEY
+    for the tokens without `kid` while they are accepted."""
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid is None:
+        if not secret_key_tokens_accepted():
+            raise jwt.InvalidTokenError("Tokens without signing key are rejected.")
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+
+    key = keyset.get_verification_key(kid)
+    if key is None:
+        raise jwt.InvalidTokenError("Unknown signing key.")
+    payload = jwt.decode(token, key.public_key, algorithms=[key.algorithm])
     return payload
 
 
@@ -109,7 +144,12 @@ def is_custom_token(token: str) -> bool:
 
 
 def get_user_from_payload(payload: Dict[str, Any]) -> Optional[User]:
-    user = User.objects.filter(email=payload["email"], is_active=True).first()
+    # the user is looked up by primary key, the email of the token may have
+    # changed since it was signed
+    try:
+        user = User.objects.get(pk=payload.get("user_id"), is_active=True)
+    except (User.DoesNotExist, ValidationError):
+        user = None
     user_jwt_token = payload.get("token")
     if not user_jwt_token or not user:
         raise jwt.InvalidTokenError(
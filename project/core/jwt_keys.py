@@ -0,0 +1,198 @@
+import base64
+import json
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+from jwt.algorithms import get_default_algorithms
+
+from .models import JWTSigningKey
+
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+except ImportError:
+    serialization = None
+
+# Algorithms signing the tokens with the keys of the keyset.
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "ES256", "RS256")
+# Minimum seconds between two loads of the keyset for unknown `kid`, the
+# tokens of unknown keys don't query the database every time.
+KEYSET_MIN_RELOAD_INTERVAL = 5
+
+
+class Key(NamedTuple):
+    kid: str
+    algorithm: str
+    private_key: object
+    public_key: object
+    created: datetime
+
+
+def generate_private_key(algorithm: str):
+    if serialization is None:
+        raise ImportError(
+            "Asymmetric JWT signing requires the cryptography package."
+        )
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    if algorithm == "RS256":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    raise ValueError(f"Unsupported JWT signing algorithm: {algorithm}.")
+
+
+def create_signing_key(algorithm: Optional[str] = None) -> JWTSigningKey:
+    """Generate a key of the keyset, with the `JWT_ALGORITHM` by default."""
+    algorithm = algorithm or settings.JWT_ALGORITHM
+    private_key = generate_private_key(algorithm)
+    pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    return JWTSigningKey.objects.create(
+        kid=secrets.token_urlsafe(16), algorithm=algorithm, private_key=pem.decode()
+    )
+
+
+def get_key_lifetime() -> timedelta:
+    """Return how long a key is kept after its creation.
+
+    A key signs until the next rotation, and the last token it signed stays
+    valid until the expiration of the refresh tokens.
+    """
+    return (
+        timedelta(days=settings.JWT_KEY_ROTATION_INTERVAL)
+        + timedelta(seconds=settings.JWT_KEY_PUBLICATION_DELAY)
+        + timedelta(minutes=int(settings.JWT_SIGNATURE_REFRESH_EXPIRED_TIME))
+    )
+
+
+def rotate_signing_keys(force: bool = False) -> Tuple[Optional[JWTSigningKey], int]:
+    """Create a key when the newest key is older than the rotation interval
+    and delete the expired keys, return the created key and the number of
+    deleted keys."""
+    now = timezone.now()
+    newest = JWTSigningKey.objects.order_by("-created").first()
+    created = None
+    rotation_interval = timedelta(days=settings.JWT_KEY_ROTATION_INTERVAL)
+    if force or newest is None or newest.created <= now - rotation_interval:
+        created = create_signing_key()
+    deleted, _ = JWTSigningKey.objects.filter(
+        created__lt=now - get_key_lifetime()
+    ).delete()
+    return created, deleted
+
+
+def base64url_uint(value: int, size: int) -> str:
+    encoded = base64.urlsafe_b64encode(value.to_bytes(size, "big"))
+    return encoded.rstrip(b"=").decode()
+
+
+def get_public_jwk(key: Key) -> dict:
+    algorithms = get_default_algorithms()
+    if key.algorithm == "ES256":
+        numbers = key.public_key.public_numbers()
+        jwk = {
+            "kty": "EC",
+            "crv": "P-256",
+            "x": base64url_uint(numbers.x, 32),
+            "y": base64url_uint(numbers.y, 32),
+        }
+    else:
+        jwk = json.loads(algorithms[key.algorithm].to_jwk(key.public_key))
+    jwk.update({"kid": key.kid, "alg": key.algorithm, "use": "sig"})
+    return jwk
+
+
+class Keyset:
+    """Keys of the keyset, parsed once by every process.
+
+    The keys are loaded again every `JWT_KEYSET_CACHE_TIMEOUT` seconds, so the
+    processes sign with the newest key after a rotation, and when a token has
+    an unknown `kid`. A new key only signs `JWT_KEY_PUBLICATION_DELAY`
+    seconds after its creation, once the verifiers caching the JWKS know it,
+    the previous key signs meanwhile.
+    """
+
+    def __init__(self):
+        self.keys: Dict[str, Key] = {}
+        self.loaded = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        self.loaded = time.monotonic()
+        if serialization is None:
+            # the keys can't be parsed, the tokens are only signed and
+            # verified with the SECRET_KEY
+            return
+        keys = {}
+        for signing_key in JWTSigningKey.objects.filter(
+            created__gte=timezone.now() - get_key_lifetime()
+        ):
+            cached = self.keys.get(signing_key.kid)
+            if cached is None:
+                private_key = serialization.load_pem_private_key(
+                    signing_key.private_key.encode(), password=None
+                )
+                cached = Key(
+                    signing_key.kid,
+                    signing_key.algorithm,
+                    private_key,
+                    private_key.public_key(),
+                    signing_key.created,
+                )
+            keys[signing_key.kid] = cached
+        self.keys = keys
+
+    def load_if_stale(self):
+        if time.monotonic() - self.loaded > settings.JWT_KEYSET_CACHE_TIMEOUT:
+            with self._lock:
+                self.load()
+
+    def get_keys(self) -> List[Key]:
+        self.load_if_stale()
+        return sorted(self.keys.values(), key=lambda key: key.created, reverse=True)
+
+    def get_signing_key(self) -> Optional[Key]:
+        """Return the newest published key, or None when no key is published
+        yet. The first key of an empty keyset is created then, it signs once
+        it's published."""
+        keys = self.get_keys()
+        if not keys:
+            create_signing_key()
+            with self._lock:
+                self.load()
+            keys = self.get_keys()
+        published = timezone.now() - timedelta(
+            seconds=settings.JWT_KEY_PUBLICATION_DELAY
+        )
+        for key in keys:
+            if key.created <= published:
+                return key
+        # the verifiers caching the JWKS may not know the unpublished keys
+        return None
+
+    def get_verification_key(self, kid: str) -> Optional[Key]:
+        """Return the key of the `kid`, the deleted keys stop verifying once
+        the cached keyset is stale."""
+        self.load_if_stale()
+        key = self.keys.get(kid)
+        reloadable = time.monotonic() - self.loaded > KEYSET_MIN_RELOAD_INTERVAL
+        if key is None and reloadable:
+            with self._lock:
+                self.load()
+            key = self.keys.get(kid)
+        return key
+
+    def get_jwks(self) -> dict:
+        return {"keys": [get_public_jwk(key) for key in self.get_keys()]}
+
+
+keyset = Keyset()
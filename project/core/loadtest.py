@@ -0,0 +1,323 @@
+import http.client
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from graphql_relay import to_global_id
+
+# Number of buckets between two powers of two, the recorded values are
+# rounded down by less than 1 / HISTOGRAM_SUB_BUCKETS of their value.
+HISTOGRAM_SUB_BUCKETS = 128
+PERCENTILES = (50, 95, 99, 99.9)
+
+QUESTIONS_QUERY = "query Questions { questions { id questionText created } }"
+QUESTIONS_WITH_CHOICES_QUERY = """
+    query QuestionsWithChoices {
+        questions { id questionText choices { id choiceText votes } }
+    }
+"""
+NODE_QUERY = """
+    query Node($id: ID!) { node(id: $id) { ... on QuestionType { id questionText } } }
+"""
+CHOICE_VOTE_MUTATION = """
+    mutation ChoiceVote($id: UUID!, $votes: Int!) {
+        choiceUpdate(id: $id, input: { votes: $votes }) {
+            choice { id votes } errors { code }
+        }
+    }
+"""
+TOKEN_CREATE_MUTATION = """
+    mutation TokenCreate($email: String!, $password: String!) {
+        tokenCreate(email: $email, password: $password) { token errors { code } }
+    }
+"""
+
+
+class LatencyHistogram:
+    """Log-linear histogram of latencies in microseconds.
+
+    Like an HDR histogram, values are counted in buckets whose width grows
+    with the value, so the memory doesn't depend on the number of recorded
+    values and the relative error of the percentiles stays bounded.
+    Histograms of several workers or runs are combined with `merge`.
+    """
+
+    def __init__(self, counts: Optional[Dict[int, int]] = None):
+        self.counts: Dict[int, int] = dict(counts or {})
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        """Return the lowest value of the bucket of the value."""
+        shift = max(value.bit_length() - HISTOGRAM_SUB_BUCKETS.bit_length(), 0)
+        return (value >> shift) << shift
+
+    def record(self, seconds: float):
+        bucket = self.bucket(max(int(seconds * 1_000_000), 0))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+
+    def merge(self, other: "LatencyHistogram"):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def percentile(self, percentile: float) -> float:
+        """Return the latency in milliseconds under which the percentage of
+        the values are."""
+        total = self.total
+        if not total:
+            return 0.0
+        rank = max(math.ceil(total * percentile / 100), 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return bucket / 1000
+        return max(self.counts) / 1000
+
+    def as_dict(self) -> Dict[str, int]:
+        # JSON keys are strings, the buckets are sorted to ease diffing runs
+        return {str(bucket): self.counts[bucket] for bucket in sorted(self.counts)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, int]) -> "LatencyHistogram":
+        return cls({int(bucket): count for bucket, count in data.items()})
+
+
+class LoadTestContext:
+    """Objects of the tested server the operations are built from."""
+
+    def __init__(
+        self,
+        question_ids: List[str],
+        choice_ids: List[str],
+        email: Optional[str] = None,
+        password: Optional[str] = None,
+        token: Optional[str] = None,
+    ):
+        self.question_ids = question_ids
+        self.choice_ids = choice_ids
+        self.email = email
+        self.password = password
+        self.token = token
+
+
+def questions(context, rng):
+    return QUESTIONS_QUERY, None, False
+
+
+def questions_with_choices(context, rng):
+    return QUESTIONS_WITH_CHOICES_QUERY, None, False
+
+
+def node(context, rng):
+    question_id = rng.choice(context.question_ids)
+    return NODE_QUERY, {"id": to_global_id("QuestionType", question_id)}, False
+
+
+def choice_vote(context, rng):
+    # the votes go to a few hot choices to contend on the same rows
+    choice_id = rng.choice(context.choice_ids[:10])
+    return CHOICE_VOTE_MUTATION, {"id": choice_id, "votes": rng.randint(0, 1000)}, True
+
+
+def token_create(context, rng):
+    variables = {"email": context.email, "password": context.password}
+    return TOKEN_CREATE_MUTATION, variables, False
+
+
+def token_create_invalid(context, rng):
+    variables = {
+        "email": f"user{rng.randint(0, 10_000)}@loadtest.invalid",
+        "password": "invalid",
+    }
+    return TOKEN_CREATE_MUTATION, variables, False
+
+
+OPERATIONS = {
+    "questions": questions,
+    "questions_with_choices": questions_with_choices,
+    "node": node,
+    "choice_vote": choice_vote,
+    "token_create": token_create,
+    "token_create_invalid": token_create_invalid,
+}
+
+# Weighted operation mixes, the weights are relative.
+MIXES = {
+    "browse": {"questions": 50, "questions_with_choices": 20, "node": 30},
+    "votes": {"choice_vote": 80, "questions_with_choices": 10, "node": 10},
+    "login": {"token_create": 60, "token_create_invalid": 40},
+    "mixed": {
+        "questions": 30,
+        "questions_with_choices": 10,
+        "node": 30,
+        "choice_vote": 20,
+        "token_create": 5,
+        "token_create_invalid": 5,
+    },
+}
+
+AUTHENTICATED_MIXES = {
+    name for name, mix in MIXES.items() if set(mix) & {"choice_vote", "token_create"}
+}
+
+
+def has_errors(response_data) -> bool:
+    """Return whether the response has GraphQL errors or mutation errors."""
+    if not isinstance(response_data, dict) or response_data.get("errors"):
+        return True
+    for value in (response_data.get("data") or {}).values():
+        if isinstance(value, dict) and value.get("errors"):
+            return True
+    return False
+
+
+class GraphQLClient:
+    """Client with a persistent HTTP connection for each thread."""
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        url = urlsplit(url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.path = url.path or "/"
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def get_connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+            self.local.connection = connection
+        return connection
+
+    def execute(self, query, variables=None, token=None):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"JWT {token}"
+        body = json.dumps({"query": query, "variables": variables})
+        connection = self.get_connection()
+        try:
+            connection.request("POST", self.path, body, headers)
+            response = connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            # the next request of the thread opens a new connection
+            connection.close()
+            self.local.connection = None
+            raise
+        if response.status != 200:
+            raise http.client.HTTPException(f"HTTP {response.status}")
+        return json.loads(content)
+
+
+def load_context(client: GraphQLClient, email=None, password=None):
+    data = client.execute(QUESTIONS_WITH_CHOICES_QUERY)["data"]
+    question_ids = [question["id"] for question in data["questions"]]
+    choice_ids = [
+        choice["id"] for question in data["questions"] for choice in question["choices"]
+    ]
+    token = None
+    if email:
+        result = client.execute(
+            TOKEN_CREATE_MUTATION, {"email": email, "password": password}
+        )
+        token = result["data"]["tokenCreate"]["token"]
+    return LoadTestContext(question_ids, choice_ids, email, password, token)
+
+
+def run_worker(
+    url: str,
+    mix: Dict[str, int],
+    context: LoadTestContext,
+    rate: float,
+    duration: float,
+    concurrency: int,
+    seed: int,
+) -> Dict:
+    """Send requests of the mix at a constant rate and return the results.
+
+    The requests are scheduled ahead of time (open loop): a slow response
+    doesn't delay the next requests, and the latency is measured from the
+    time the request was scheduled, so the time it waited for a free
+    connection is included.
+    """
+    client = GraphQLClient(url)
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    histograms = {name: LatencyHistogram() for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+
+    def send(name, request, scheduled):
+        query, variables, authenticated = request
+        try:
+            failed = has_errors(
+                client.execute(
+                    query, variables, context.token if authenticated else None
+                )
+            )
+        except (OSError, ValueError, http.client.HTTPException):
+            failed = True
+        latency = time.perf_counter() - scheduled
+        with lock:
+            histograms[name].record(latency)
+            if failed:
+                errors[name] += 1
+
+    interval = 1 / rate
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for index in range(int(rate * duration)):
+            scheduled = started + index * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            name = rng.choices(names, weights)[0]
+            executor.submit(send, name, OPERATIONS[name](context, rng), scheduled)
+    elapsed = time.perf_counter() - started
+    return {
+        "elapsed": elapsed,
+        "histograms": {
+            name: histogram.as_dict() for name, histogram in histograms.items()
+        },
+        "errors": errors,
+    }
+
+
+def merge_results(results: Iterable[Dict]) -> Dict:
+    histograms: Dict[str, LatencyHistogram] = {}
+    errors: Dict[str, int] = {}
+    elapsed = 0.0
+    for result in results:
+        elapsed = max(elapsed, result["elapsed"])
+        for name, data in result["histograms"].items():
+            histograms.setdefault(name, LatencyHistogram()).merge(
+                LatencyHistogram.from_dict(data)
+            )
+        for name, count in result["errors"].items():
+            errors[name] = errors.get(name, 0) + count
+    return {"elapsed": elapsed, "histograms": histograms, "errors": errors}
+
+
+def summarize(histogram: LatencyHistogram, errors: int, elapsed: float) -> Dict:
+    total = histogram.total
+    summary = {
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "throughput": total / elapsed if elapsed else 0.0,
+    }
+    for percentile in PERCENTILES:
+        summary[f"p{percentile:g}"] = histogram.percentile(percentile)
+    return summary
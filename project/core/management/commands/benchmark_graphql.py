@@ -0,0 +1,417 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from ...middleware import SQLRecorder
+
+SEED_QUESTIONS = 200
+SEED_CHOICES_PER_QUESTION = 5
+BULK_MUTATION_IDS = 10_000
+BENCHMARK_PASSWORD = "benchmark-password"
+# Baseline of the query counts of the benchmarks, kept in the repository as
+# the wall times depend on the machine.
+QUERY_BASELINE = "benchmarks/graphql_queries.json"
+
+QUESTIONS_QUERY = "{ questions { id questionText created } }"
+QUESTIONS_WITH_CHOICES_QUERY = """
+    { questions { id questionText created choices { id choiceText votes } } }
+"""
+POLL_RESULTS_BULK_QUERY = """
+    query($ids: [UUID!]!) { pollResultsBulk(ids: $ids) {
+        questionId totalVotes choiceCount choices { id choiceText votes share } } }
+"""
+ME_QUERY = "{ me { id email firstName lastName } }"
+
+QUESTION_CREATE_MUTATION = """
+    mutation { questionCreate(input: { questionText: "Benchmark question" }) {
+        question { id } errors { code } } }
+"""
+QUESTION_UPDATE_MUTATION = """
+    mutation($id: UUID!) { questionUpdate(id: $id, input: { questionText: "Updated" }) {
+        question { id } errors { code } } }
+"""
+QUESTION_DELETE_MUTATION = """
+    mutation($id: UUID!) { questionDelete(id: $id) { question { id } errors { code } } }
+"""
+CHOICE_CREATE_MUTATION = """
+    mutation($question: UUID!) {
+        choiceCreate(input: { question: $question, choiceText: "Benchmark choice" }) {
+            choice { id } errors { code } } }
+"""
+CHOICE_UPDATE_MUTATION = """
+    mutation($id: UUID!) { choiceUpdate(id: $id, input: { votes: 1 }) {
+        choice { id } errors { code } } }
+"""
+CHOICE_DELETE_MUTATION = """
+    mutation($id: UUID!) { choiceDelete(id: $id) { choice { id } errors { code } } }
+"""
+TOKEN_CREATE_MUTATION = """
+    mutation($email: String!, $password: String!) {
+        tokenCreate(email: $email, password: $password) { token errors { code } } }
+"""
+TOKEN_REFRESH_MUTATION = """
+    mutation($refreshToken: String!) {
+        tokenRefresh(refreshToken: $refreshToken) { token errors { code } } }
+"""
+QUESTION_BULK_DELETE_MUTATION = """
+    mutation($ids: [UUID!]!) { questionBulkDelete(ids: $ids) { count errors { code } } }
+"""
+
+
+def get_bulk_schema():
+    """Return a schema with a bulk mutation, the API doesn't expose one."""
+    import graphene
+
+    from ....graphql.api import Query
+    from ....graphql.core.mutations import ModelBulkDeleteMutation
+    from ....graphql.core.types.errors import QuestionError
+    from ....graphql.polls.types import QuestionType
+    from ....polls.models import Question
+
+    class QuestionBulkDelete(ModelBulkDeleteMutation):
+        class Arguments:
+            ids = graphene.List(graphene.NonNull(graphene.UUID), required=True)
+
+        class Meta:
+            description = "Deletes questions."
+            model = Question
+            object_type = QuestionType
+            error_type_class = QuestionError
+
+    class Mutation(graphene.ObjectType):
+        question_bulk_delete = QuestionBulkDelete.Field()
+
+    return graphene.Schema(query=Query, mutation=Mutation)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the benchmarks of the GraphQL hot paths on a seeded test database, "
+        "save the results as JSON and compare them against a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument(
+            "--output", help="Path of the JSON file to save the results to."
+        )
+        parser.add_argument(
+            "--baseline",
+            help=(
+                "Path of the JSON results to compare against. The wall times "
+                "are only compared when the baseline has them, "
+                f"{QUERY_BASELINE} has the query counts of the benchmarks."
+            ),
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Allowed relative slowdown of the median wall time.",
+        )
+        parser.add_argument(
+            "--filter", help="Only run the benchmarks whose name contains it."
+        )
+
+    def handle(self, *args, **options):
+        from ....polls.trending import reset_leaderboard
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # the login limits and the last login coalescing would make the
+            # repeated logins measure something else on every iteration
+            with override_settings(
+                LOGIN_RATE_LIMIT_PER_IP=0,
+                LOGIN_RATE_LIMIT_PER_EMAIL=0,
+                LAST_LOGIN_UPDATE_GRANULARITY=0,
+                LAST_LOGIN_BUFFER_SIZE=0,
+                DEBUG=False,
+            ):
+                self.seed()
+                results = self.run_benchmarks(options)
+        finally:
+            # the votes of the benchmarks are checkpointed in the test database
+            # before it's dropped, not at exit
+            reset_leaderboard()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+        if options["baseline"]:
+            self.compare(results, options["baseline"], options["threshold"])
+
+    def seed(self):
+        from ....core.jwt import create_access_token, create_refresh_token
+        from ....polls.models import Choice, Question
+        from ....users.models import User
+
+        self.user = User.objects.create(
+            email="benchmark@example.com",
+            password=make_password(BENCHMARK_PASSWORD),
+            is_staff=True,
+            is_superuser=True,
+        )
+        self.access_token = create_access_token(self.user)
+        self.refresh_token = create_refresh_token(self.user)
+        questions = Question.objects.bulk_create(
+            [
+                Question(
+                    question_text=f"Question {i}",
+                    choice_count=SEED_CHOICES_PER_QUESTION,
+                    total_votes=sum(range(SEED_CHOICES_PER_QUESTION)),
+                )
+                for i in range(SEED_QUESTIONS)
+            ]
+        )
+        self.question_ids = [str(question.id) for question in questions[:100]]
+        Choice.objects.bulk_create(
+            [
+                Choice(question=question, choice_text=f"Choice {i}", votes=i)
+                for question in questions
+                for i in range(SEED_CHOICES_PER_QUESTION)
+            ]
+        )
+        self.question = questions[0]
+        self.choice = Choice.objects.filter(question=self.question).first()
+
+    def get_benchmarks(self):
+        """Return the name, the setup and the measured function of benchmarks.
+
+        The setup runs before every iteration and returns the arguments of the
+        measured function.
+        """
+        from ....graphql.api import schema
+        from ....graphql.core.handle_errors import validation_error_to_error_type
+        from ....graphql.core.types.errors import QuestionError
+        from ....polls.models import Choice, Question
+
+        bulk_schema = get_bulk_schema()
+        client = Client()
+        auth_header = {"HTTP_AUTHORIZATION": f"JWT {self.access_token}"}
+
+        def execute(query, variables=None, target_schema=schema):
+            request = RequestFactory().post("/graphql/")
+            request.user = self.user
+            result = target_schema.execute(
+                query, context_value=request, variable_values=variables
+            )
+            if result.errors:
+                raise CommandError(f"Benchmark query failed: {result.errors}")
+            return result
+
+        def post(query, variables=None):
+            response = client.post(
+                "/graphql/",
+                json.dumps({"query": query, "variables": variables}),
+                content_type="application/json",
+                **auth_header,
+            )
+            if response.status_code != 200:
+                raise CommandError(f"Benchmark request failed: {response.content}")
+            return response
+
+        def new_question():
+            return {"id": str(Question.objects.create(question_text="New").id)}
+
+        def new_choice():
+            choice = Choice.objects.create(question=self.question, choice_text="New")
+            return {"id": str(choice.id)}
+
+        def bulk_ids():
+            questions = Question.objects.bulk_create(
+                [Question(question_text="Bulk") for _ in range(BULK_MUTATION_IDS)]
+            )
+            return {"ids": [str(question.id) for question in questions]}
+
+        def validation_error():
+            return ValidationError(
+                {
+                    f"field_{i}": ValidationError("Invalid value.", code="invalid")
+                    for i in range(100)
+                }
+            )
+
+        question_id = {"id": str(self.question.id)}
+        choice_id = {"id": str(self.choice.id)}
+        credentials = {"email": self.user.email, "password": BENCHMARK_PASSWORD}
+        return [
+            ("schema.questions", None, lambda: execute(QUESTIONS_QUERY)),
+            (
+                "schema.questions_with_choices",
+                None,
+                lambda: execute(QUESTIONS_WITH_CHOICES_QUERY),
+            ),
+            (
+                "schema.poll_results_bulk",
+                None,
+                lambda: execute(POLL_RESULTS_BULK_QUERY, {"ids": self.question_ids}),
+            ),
+            ("schema.me", None, lambda: execute(ME_QUERY)),
+            # the queries of the lists run before the mutations adding questions,
+            # their query counts don't depend on the iterations
+            ("http.questions", None, lambda: post(QUESTIONS_QUERY)),
+            (
+                "http.questions_with_choices",
+                None,
+                lambda: post(QUESTIONS_WITH_CHOICES_QUERY),
+            ),
+            (
+                "schema.question_create",
+                None,
+                lambda: execute(QUESTION_CREATE_MUTATION),
+            ),
+            (
+                "schema.question_update",
+                None,
+                lambda: execute(QUESTION_UPDATE_MUTATION, question_id),
+            ),
+            (
+                "schema.question_delete",
+                new_question,
+                lambda variables: execute(QUESTION_DELETE_MUTATION, variables),
+            ),
+            (
+                "schema.choice_create",
+                None,
+                lambda: execute(
+                    CHOICE_CREATE_MUTATION, {"question": str(self.question.id)}
+                ),
+            ),
+            (
+                "schema.choice_update",
+                None,
+                lambda: execute(CHOICE_UPDATE_MUTATION, choice_id),
+            ),
+            (
+                "schema.choice_delete",
+                new_choice,
+                lambda variables: execute(CHOICE_DELETE_MUTATION, variables),
+            ),
+            (
+                "schema.token_create",
+                None,
+                lambda: execute(TOKEN_CREATE_MUTATION, credentials),
+            ),
+            (
+                "schema.token_refresh",
+                None,
+                lambda: execute(
+                    TOKEN_REFRESH_MUTATION, {"refreshToken": self.refresh_token}
+                ),
+            ),
+            (
+                "schema.bulk_delete_10k",
+                bulk_ids,
+                lambda variables: execute(
+                    QUESTION_BULK_DELETE_MUTATION, variables, target_schema=bulk_schema
+                ),
+            ),
+            (
+                "errors.validation_error_to_error_type",
+                validation_error,
+                lambda error: validation_error_to_error_type(error, QuestionError),
+            ),
+            ("http.me", None, lambda: post(ME_QUERY)),
+            (
+                "http.token_create",
+                None,
+                lambda: post(TOKEN_CREATE_MUTATION, credentials),
+            ),
+        ]
+
+    def run_benchmarks(self, options):
+        results = {}
+        for name, setup, function in self.get_benchmarks():
+            if options["filter"] and options["filter"] not in name:
+                continue
+            iterations = options["iterations"]
+            if name == "schema.bulk_delete_10k":
+                iterations = max(1, iterations // 10)
+            results[name] = self.run_benchmark(setup, function, iterations)
+            self.stdout.write(
+                f"{name:<45} {results[name]['wall_time_ms']:>9.2f} ms "
+                f"{results[name]['queries']:>5} queries "
+                f"{results[name]['peak_memory_kb']:>9.1f} KB"
+            )
+        return results
+
+    @staticmethod
+    def run_benchmark(setup, function, iterations):
+        def call():
+            arguments = () if setup is None else (setup(),)
+            # counted by an execute wrapper, `connection.queries` is reset by
+            # the requests and limited to 9000 queries
+            recorder = SQLRecorder()
+            with connection.execute_wrapper(recorder):
+                started = time.perf_counter()
+                function(*arguments)
+                elapsed = time.perf_counter() - started
+            return elapsed, recorder.queries
+
+        # warm up the caches, then measure the allocations in a separate run
+        # since tracing them slows the execution down
+        call()
+        tracemalloc.start()
+        call()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings, query_counts = [], []
+        for _ in range(iterations):
+            elapsed, query_count = call()
+            timings.append(elapsed)
+            query_counts.append(query_count)
+        return {
+            "wall_time_ms": statistics.median(timings) * 1000,
+            "min_wall_time_ms": min(timings) * 1000,
+            "queries": max(query_counts),
+            "peak_memory_kb": peak_memory / 1024,
+            "iterations": iterations,
+        }
+
+    def compare(self, results, baseline_path, threshold):
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = []
+        for name, result in results.items():
+            expected = baseline.get(name)
+            if not expected:
+                continue
+            slowdown = (
+                result["wall_time_ms"] / expected["wall_time_ms"] - 1
+                if "wall_time_ms" in expected
+                else 0
+            )
+            if slowdown > threshold:
+                regressions.append(
+                    f"{name}: {result['wall_time_ms']:.2f} ms, "
+                    f"{slowdown:.0%} slower than {expected['wall_time_ms']:.2f} ms"
+                )
+            if result["queries"] > expected["queries"]:
+                regressions.append(
+                    f"{name}: {result['queries']} queries, "
+                    f"{expected['queries']} in the baseline"
+                )
+
+        if regressions:
+            raise CommandError(
+                "Performance regressions:\n" + "\n".join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("No performance regression."))
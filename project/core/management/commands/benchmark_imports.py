@@ -0,0 +1,100 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ....graphql.api import MUTATIONS, QUERIES, SUBSCRIPTIONS
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+# Modules loaded on demand, `manage.py check` must not import them.
+LAZY_MODULES = sorted(
+    {path.rsplit(".", 1)[0] for path in QUERIES + MUTATIONS + SUBSCRIPTIONS}
+    | {"graphql_jwt"}
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the imports of `manage.py check` with `python -X importtime` "
+        "and fail when they exceed the budget or load the lazy modules."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--budget",
+            type=float,
+            default=None,
+            help="Maximum median import time in ms.",
+        )
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--top", type=int, default=15)
+
+    def handle(self, *args, **options):
+        runs = [self.run_check() for _ in range(options["runs"])]
+        total = statistics.median(sum(run.values()) for run in runs) / 1000
+        project = (
+            statistics.median(
+                sum(t for name, t in run.items() if name.startswith("project"))
+                for run in runs
+            )
+            / 1000
+        )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Slowest packages (cumulative)"))
+        cumulative = self.run_check(cumulative=True)
+        for name, duration in sorted(
+            cumulative.items(), key=lambda item: item[1], reverse=True
+        )[: options["top"]]:
+            self.stdout.write(f"  {duration / 1000:>8.1f} ms  {name}")
+        self.stdout.write(f"Total imports    {total:>8.1f} ms")
+        self.stdout.write(f"Project modules  {project:>8.1f} ms")
+
+        loaded = [
+            module
+            for module in LAZY_MODULES
+            if any(name == module or name.startswith(f"{module}.") for name in runs[0])
+        ]
+        if loaded:
+            raise CommandError(
+                f"Lazy modules imported by `manage.py check`: {', '.join(loaded)}"
+            )
+        if options["budget"] is not None and total > options["budget"]:
+            raise CommandError(
+                f"Imports took {total:.1f} ms, over the budget of "
+                f"{options['budget']:.1f} ms."
+            )
+
+    @staticmethod
+    def run_check(cumulative=False):
+        """Return the import time of every module in µs, the time of the module
+        alone or with its imports when `cumulative` is set.
+
+        The cumulative times are only kept for the top-level imports, nested
+        imports are included in their importer.
+        """
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "manage.py", "check"],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            raise CommandError(process.stderr)
+        durations = {}
+        for line in process.stderr.splitlines():
+            match = IMPORT_TIME_LINE.match(line)
+            if not match:
+                continue
+            own, total, indent, name = match.groups()
+            if not cumulative:
+                durations[name] = int(own)
+            elif len(indent) == 1:
+                durations[name] = int(total)
+        return durations
@@ -0,0 +1,102 @@
+import json
+import statistics
+import time
+import tracemalloc
+import uuid
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ....graphql.core.encoders import OrjsonEncoder, StdlibJSONEncoder, orjson
+
+
+class GrapheneDjangoEncoder:
+    """Encoding of the graphene-django view, the reference of the benchmark."""
+
+    def encode(self, data, pretty=False):
+        return json.dumps(data, separators=(",", ":"))
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the time and the memory allocated to encode large `questions` "
+        "responses with the available JSON encoders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=2_000)
+        parser.add_argument("--choices", type=int, default=10)
+        parser.add_argument("--iterations", type=int, default=20)
+
+    def handle(self, *args, **options):
+        encoders = {
+            "graphene-django": GrapheneDjangoEncoder(),
+            "stdlib": StdlibJSONEncoder(),
+        }
+        if orjson is not None:
+            encoders["orjson"] = OrjsonEncoder()
+
+        payloads = {
+            "serialized": self.get_payload(options, native=False),
+            "native": self.get_payload(options, native=True),
+        }
+        for payload_name, payload in payloads.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{payload_name} values"))
+            for encoder_name, encoder in encoders.items():
+                try:
+                    encoder.encode(payload)
+                except TypeError:
+                    # the reference encoder doesn't handle UUID and datetime
+                    continue
+                self.report(encoder_name, encoder, payload, options["iterations"])
+
+    @staticmethod
+    def get_payload(options, native):
+        """Return the result data of a `questions { choices }` query.
+
+        The ids and dates are strings as serialized by the graphene scalars,
+        or `uuid.UUID` and `datetime` objects with `native`.
+        """
+        now = timezone.now()
+
+        def scalar(value):
+            if native:
+                return value
+            return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+        questions = [
+            OrderedDict(
+                id=scalar(uuid.uuid4()),
+                questionText=f"Question {index}?",
+                created=scalar(now),
+                choices=[
+                    OrderedDict(
+                        id=scalar(uuid.uuid4()),
+                        choiceText=f"Choice {rank} – ünïcödé",
+                        votes=rank * 7,
+                        created=scalar(now),
+                    )
+                    for rank in range(options["choices"])
+                ],
+            )
+            for index in range(options["questions"])
+        ]
+        return {"data": OrderedDict(questions=questions)}
+
+    def report(self, name, encoder, payload, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            content = encoder.encode(payload)
+            timings.append(time.perf_counter() - started)
+
+        tracemalloc.start()
+        encoder.encode(payload)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f"  {name:<16} {statistics.median(timings) * 1000:>8.2f} ms "
+            f"{len(content) / 1024:>9.0f} KB output "
+            f"{peak / 1024:>9.0f} KB peak allocated"
+        )
@@ -0,0 +1,59 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MB = 1024 ** 2
+
+FIRST_REQUEST_QUERY = "query Questions { questions { id questionText choices { id } } }"
+
+PROBE_SCRIPT = (
+    "import sys; from project.core.warmup import measure_startup; "
+    "measure_startup(sys.argv[1] == 'warm', int(sys.argv[2]), sys.argv[3])"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the startup time, the time to the first request and the unique "
+        "memory of forked workers, with and without the warmup of the master."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--query", default=FIRST_REQUEST_QUERY)
+
+    def handle(self, *args, **options):
+        for mode in ("cold", "warm"):
+            result = self.run_probe(mode, options["workers"], options["query"])
+            workers = result["workers"]
+            self.stdout.write(self.style.MIGRATE_HEADING(mode.capitalize()))
+            self.stdout.write(f"  startup          {result['startup'] * 1000:>8.1f} ms")
+            self.stdout.write(
+                "  first request    "
+                f"{statistics.mean(w['first_request'] for w in workers) * 1000:>8.1f} ms"
+            )
+            self.stdout.write(
+                "  worker USS       "
+                f"{statistics.mean(w['unique_memory'] for w in workers) / MB:>8.1f} MB"
+            )
+
+    @staticmethod
+    def run_probe(mode, workers, query):
+        # every mode starts from a new interpreter, the warmup of the wsgi
+        # module isn't involved
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        process = subprocess.run(
+            [sys.executable, "-c", PROBE_SCRIPT, mode, str(workers), query],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            raise CommandError(process.stderr)
+        return json.loads(process.stdout.strip().splitlines()[-1])
@@ -0,0 +1,248 @@
+import json
+import os
+import secrets
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from django.core.files.storage import default_storage
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+
+MB = 1024 ** 2
+
+FILE_UPLOAD_MUTATION = """
+    mutation FileUpload($file: Upload!) {
+        fileUpload(file: $file) {
+            uploadedFile { url }
+            errors { code message }
+        }
+    }
+"""
+
+FILE_UPLOAD_START_MUTATION = """
+    mutation FileUploadStart($fileName: String!, $size: BigInt!) {
+        fileUploadStart(fileName: $fileName, size: $size) {
+            upload { id }
+            errors { code message }
+        }
+    }
+"""
+
+FILE_UPLOAD_CHUNK_MUTATION = """
+    mutation FileUploadChunk($uploadId: String!, $offset: BigInt!, $chunk: Upload!) {
+        fileUploadChunk(uploadId: $uploadId, offset: $offset, chunk: $chunk) {
+            upload { offset }
+            errors { code message }
+        }
+    }
+"""
+
+FILE_UPLOAD_FINISH_MUTATION = """
+    mutation FileUploadFinish($uploadId: String!) {
+        fileUploadFinish(uploadId: $uploadId) {
+            uploadedFile { url }
+            errors { code message }
+        }
+    }
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the throughput and the peak memory of the single request and "
+        "the chunked file uploads, as handled by the WSGI application."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size", type=int, default=1024, help="Size of the file in MB."
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=64, help="Size of the chunks in MB."
+        )
+
+    def handle(self, *args, **options):
+        self.handler = WSGIHandler()
+        self.workdir = tempfile.mkdtemp()
+        self.uploaded = []
+        size = options["size"] * MB
+        try:
+            source = os.path.join(self.workdir, "source.bin")
+            self.create_file(source, size)
+            self.report("Single request upload", size, self.upload_file, source)
+            self.report(
+                "Chunked upload",
+                size,
+                self.upload_file_in_chunks,
+                source,
+                options["chunk_size"] * MB,
+            )
+            self.report(
+                "Streamed chunked upload",
+                size,
+                self.upload_file_in_chunks,
+                source,
+                options["chunk_size"] * MB,
+                True,
+            )
+        finally:
+            shutil.rmtree(self.workdir)
+            for name in self.uploaded:
+                default_storage.delete(name)
+
+    @staticmethod
+    def create_file(path, size):
+        block = os.urandom(MB)
+        with open(path, "wb") as file:
+            for offset in range(0, size, MB):
+                file.write(block[: min(MB, size - offset)])
+
+    def report(self, title, size, upload, *args):
+        """Run the upload, it returns the time spent handling its requests."""
+        tracemalloc.start()
+        elapsed = upload(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        self.stdout.write(
+            f"  {size / MB:.0f} MB in {elapsed:.2f} s, "
+            f"{size / MB / elapsed:.1f} MB/s, peak memory {peak / MB:.1f} MB"
+        )
+
+    def write_multipart_body(self, path, operation, variables, file_path, offset, size):
+        """Write the multipart request of the operation in a file.
+
+        The request body is prepared outside of the measured upload, so the
+        handler reads it from disk like it would read it from a socket.
+        """
+        boundary = secrets.token_hex(16)
+        with open(path, "wb") as body, open(file_path, "rb") as source:
+            for name, value in (
+                ("query", operation),
+                ("variables", json.dumps(variables)),
+            ):
+                body.write(
+                    f"--{boundary}\r\n"
+                    f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                    f"{value}\r\n".encode()
+                )
+            body.write(
+                f"--{boundary}\r\n"
+                'Content-Disposition: form-data; name="file"; filename="file.bin"\r\n'
+                "Content-Type: application/octet-stream\r\n\r\n".encode()
+            )
+            source.seek(offset)
+            remaining = size
+            while remaining:
+                data = source.read(min(MB, remaining))
+                body.write(data)
+                remaining -= len(data)
+            body.write(f"\r\n--{boundary}--\r\n".encode())
+        return f"multipart/form-data; boundary={boundary}"
+
+    def request(self, body_path, content_type, method="POST", path="/graphql/", **meta):
+        with open(body_path, "rb") as body:
+            environ = {
+                **meta,
+                "REQUEST_METHOD": method,
+                "PATH_INFO": path,
+                "SERVER_NAME": "localhost",
+                "SERVER_PORT": "80",
+                "HTTP_HOST": "localhost",
+                "HTTP_ACCEPT": "application/json",
+                "CONTENT_TYPE": content_type,
+                "CONTENT_LENGTH": str(os.path.getsize(body_path)),
+                "wsgi.input": body,
+                "wsgi.url_scheme": "http",
+            }
+            response = self.handler(environ, lambda status, headers: None)
+            content = b"".join(response)
+            response.close()
+        return json.loads(content)
+
+    def json_request(self, operation, variables):
+        body_path = os.path.join(self.workdir, "body.json")
+        with open(body_path, "w") as body:
+            json.dump({"query": operation, "variables": variables}, body)
+        return self.request(body_path, "application/json")
+
+    def upload_file(self, source):
+        body_path = os.path.join(self.workdir, "body.bin")
+        content_type = self.write_multipart_body(
+            body_path,
+            FILE_UPLOAD_MUTATION,
+            {"file": "file"},
+            source,
+            0,
+            os.path.getsize(source),
+        )
+        started = time.perf_counter()
+        result = self.request(body_path, content_type)
+        elapsed = time.perf_counter() - started
+        self.uploaded.append(self.get_uploaded_name(result["data"]["fileUpload"]))
+        return elapsed
+
+    def upload_file_in_chunks(self, source, chunk_size, streamed=False):
+        size = os.path.getsize(source)
+        started = time.perf_counter()
+        result = self.json_request(
+            FILE_UPLOAD_START_MUTATION, {"fileName": "file.bin", "size": size}
+        )
+        elapsed = time.perf_counter() - started
+        upload_id = result["data"]["fileUploadStart"]["upload"]["id"]
+        body_path = os.path.join(self.workdir, "chunk.bin")
+        for offset in range(0, size, chunk_size):
+            if streamed:
+                elapsed += self.stream_chunk(
+                    upload_id, body_path, source, offset, min(chunk_size, size - offset)
+                )
+                continue
+            content_type = self.write_multipart_body(
+                body_path,
+                FILE_UPLOAD_CHUNK_MUTATION,
+                {"uploadId": upload_id, "offset": offset, "chunk": "file"},
+                source,
+                offset,
+                min(chunk_size, size - offset),
+            )
+            started = time.perf_counter()
+            result = self.request(body_path, content_type)
+            elapsed += time.perf_counter() - started
+            if result["data"]["fileUploadChunk"]["errors"]:
+                raise Exception(result["data"]["fileUploadChunk"]["errors"])
+        started = time.perf_counter()
+        result = self.json_request(FILE_UPLOAD_FINISH_MUTATION, {"uploadId": upload_id})
+        elapsed += time.perf_counter() - started
+        self.uploaded.append(self.get_uploaded_name(result["data"]["fileUploadFinish"]))
+        return elapsed
+
+    def stream_chunk(self, upload_id, body_path, source, offset, size):
+        """Send the chunk as the body of a `PATCH /uploads/<id>` request."""
+        with open(body_path, "wb") as body, open(source, "rb") as source_file:
+            source_file.seek(offset)
+            remaining = size
+            while remaining:
+                data = source_file.read(min(MB, remaining))
+                body.write(data)
+                remaining -= len(data)
+        started = time.perf_counter()
+        result = self.request(
+            body_path,
+            "application/offset+octet-stream",
+            method="PATCH",
+            path=f"/uploads/{upload_id}",
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+        elapsed = time.perf_counter() - started
+        if "errors" in result:
+            raise Exception(result["errors"])
+        return elapsed
+
+    @staticmethod
+    def get_uploaded_name(data):
+        if data["errors"]:
+            raise Exception(data["errors"])
+        url = data["uploadedFile"]["url"]
+        return url[url.index("file_upload/"):]
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from ...query_plans import PLAN_PATTERNS, explain, get_plan_problems
+
+# Functions returning the names and the querysets of the queries whose plans
+# should use an index, e.g. for their ordering.
+QUERY_PLAN_CHECKS = [
+    "project.graphql.polls.filters.get_query_plan_checks",
+    "project.users.query_plans.get_query_plan_checks",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the queries of the indexed lookups and orderings and fail when "
+        "a plan scans a whole table or index or sorts the rows instead of "
+        "seeking an index."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in PLAN_PATTERNS:
+            self.stdout.write(f"The plans of {connection.vendor} aren't checked.")
+        failures = []
+        checks = [
+            check for path in QUERY_PLAN_CHECKS for check in import_string(path)()
+        ]
+        for name, queryset in checks:
+            plan = explain(queryset)
+            problems = get_plan_problems(plan)
+            if problems:
+                failures.append(name)
+            if problems or options["verbosity"] > 1:
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(plan)
+            if problems:
+                self.stdout.write(self.style.ERROR(f"{'/'.join(problems):<10}{name}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{'OK':<10}{name}"))
+
+        if failures:
+            raise CommandError(
+                f"{len(failures)} of {len(checks)} plans don't seek an index."
+            )
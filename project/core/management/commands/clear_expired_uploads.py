@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ...uploads import ChunkedUpload
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the chunked uploads that received no chunk for "
+        "FILE_UPLOAD_SESSION_TTL seconds, with the space reserved for their "
+        "files."
+    )
+
+    def handle(self, *args, **options):
+        deleted = ChunkedUpload.delete_expired_uploads()
+        self.stdout.write(f"Deleted {deleted} expired uploads.")
@@ -0,0 +1,86 @@
+import os
+import time
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...models import FileBlob
+from ...uploads import DIGEST_REGEX, UPLOAD_BLOBS_DIRECTORY, get_blob_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the blobs of the content addressed upload storage that aren't "
+        "referenced anymore, and the blob files without blob."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-period",
+            type=int,
+            default=24 * 60 * 60,
+            help=(
+                "Age in seconds under which unreferenced blobs and blob files "
+                "without blob are kept, as they can belong to an upload not "
+                "saved in a model yet."
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the blobs to delete without deleting them.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        unreferenced = FileBlob.objects.filter(
+            ref_count=0,
+            modified__lte=timezone.now()
+            - timedelta(seconds=options["grace_period"]),
+        )
+        deleted_blobs = 0
+        for digest in unreferenced.values_list("digest", flat=True).iterator():
+            if not dry_run:
+                # the blob can be claimed again since it was listed
+                if not unreferenced.filter(digest=digest).delete()[0]:
+                    continue
+                default_storage.delete(get_blob_name(digest))
+            deleted_blobs += 1
+
+        deleted_files = 0
+        if os.path.isdir(default_storage.path(UPLOAD_BLOBS_DIRECTORY)):
+            deleted_files = self.delete_orphan_files(
+                options["grace_period"], dry_run
+            )
+
+        action = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(
+            f"{action} {deleted_blobs} unreferenced blobs and "
+            f"{deleted_files} files without blob."
+        )
+
+    def delete_orphan_files(self, grace_period, dry_run):
+        stored_before = time.time() - grace_period
+        deleted = 0
+        for directory, _, file_names in os.walk(
+            default_storage.path(UPLOAD_BLOBS_DIRECTORY)
+        ):
+            digests = {
+                file_name: os.path.join(directory, file_name)
+                for file_name in file_names
+                if DIGEST_REGEX.match(file_name)
+            }
+            known = set(
+                FileBlob.objects.filter(digest__in=digests).values_list(
+                    "digest", flat=True
+                )
+            )
+            for digest, path in digests.items():
+                if digest in known or os.path.getmtime(path) > stored_before:
+                    continue
+                if not dry_run:
+                    os.remove(path)
+                deleted += 1
+        return deleted
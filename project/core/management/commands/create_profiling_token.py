@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from ...profiling import create_profiling_token
+
+
+class Command(BaseCommand):
+    help = (
+        "Print a token to send in the X-GraphQL-Profile header of a GraphQL "
+        "request to profile it."
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(create_profiling_token())
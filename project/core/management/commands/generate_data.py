@@ -0,0 +1,219 @@
+import random
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from ....polls.models import Choice, Question
+from ....polls.search import get_search_backend
+from ....users.models import User
+
+# Number of users and questions of the size profiles.
+PROFILES = {
+    "small": {"users": 1_000, "questions": 10_000},
+    "medium": {"users": 100_000, "questions": 1_000_000},
+    "large": {"users": 500_000, "questions": 5_000_000},
+}
+
+MAX_CHOICES_PER_QUESTION = 20
+GENERATED_EMAIL_DOMAIN = "generated.invalid"
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a reproducible synthetic dataset of users, questions and "
+        "choices with skewed choice counts and votes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", choices=sorted(PROFILES), default="small")
+        parser.add_argument("--users", type=int, help="Overrides the profile.")
+        parser.add_argument("--questions", type=int, help="Overrides the profile.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument(
+            "--password",
+            default="password",
+            help="Password of the generated users, hashed once for all of them.",
+        )
+        parser.add_argument(
+            "--keep-indexes",
+            action="store_true",
+            help="Maintain the secondary indexes during the inserts.",
+        )
+
+    def handle(self, *args, **options):
+        profile = PROFILES[options["profile"]]
+        users = options["users"] if options["users"] is not None else profile["users"]
+        questions = options["questions"]
+        if questions is None:
+            questions = profile["questions"]
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+
+        with self.bulk_load_mode():
+            self.report(
+                "users", self.generate_users, users, make_password(options["password"])
+            )
+            if options["keep_indexes"]:
+                self.report("polls", self.generate_polls, questions)
+            else:
+                with self.indexes_dropped(Choice):
+                    self.report("polls", self.generate_polls, questions)
+
+    def uuid(self):
+        # ids are drawn from the seeded generator to be reproducible
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def report(self, label, generate, *args):
+        started = time.perf_counter()
+        rows = generate(*args)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{label}: {rows} rows in {elapsed:.1f} s, "
+            f"{rows / elapsed if elapsed else 0:.0f} rows/s"
+        )
+
+    def generate_users(self, count, password_hash):
+        for start in range(0, count, self.batch_size):
+            users = [
+                User(
+                    id=self.uuid(),
+                    email=f"user{index}@{GENERATED_EMAIL_DOMAIN}",
+                    first_name=f"First{index}",
+                    last_name=f"Last{index}",
+                    password=password_hash,
+                )
+                for index in range(start, min(start + self.batch_size, count))
+            ]
+            with transaction.atomic():
+                User.objects.bulk_create(users, ignore_conflicts=True)
+        return count
+
+    def get_choice_count(self):
+        """Return a power law distributed number of choices, most questions
+        have two or three choices and a few have many."""
+        return min(int(self.rng.paretovariate(1.5)) + 1, MAX_CHOICES_PER_QUESTION)
+
+    def get_votes(self, choice_count):
+        """Return the votes of the choices of a question.
+
+        The popularity of the questions is log-normal and the votes of a
+        question are concentrated on its first choices.
+        """
+        total = int(self.rng.lognormvariate(3, 2))
+        weights = [1 / (rank + 1) for rank in range(choice_count)]
+        scale = total / sum(weights)
+        return [int(weight * scale * self.rng.uniform(0.5, 1.5)) for weight in weights]
+
+    def generate_polls(self, count):
+        choices_count = 0
+        for start in range(0, count, self.batch_size):
+            questions, choices = [], []
+            for index in range(start, min(start + self.batch_size, count)):
+                choice_votes = self.get_votes(self.get_choice_count())
+                # bulk_create doesn't send the signals maintaining the totals
+                question = Question(
+                    id=self.uuid(),
+                    question_text=f"Question {index}?",
+                    choice_count=len(choice_votes),
+                    total_votes=sum(choice_votes),
+                )
+                questions.append(question)
+                for rank, votes in enumerate(choice_votes):
+                    choices.append(
+                        Choice(
+                            id=self.uuid(),
+                            question=question,
+                            choice_text=f"Choice {rank + 1}",
+                            votes=votes,
+                        )
+                    )
+            with transaction.atomic():
+                Question.objects.bulk_create(questions)
+                Choice.objects.bulk_create(choices)
+                # nor the signals indexing the questions
+                get_search_backend().index_questions(
+                    [question.id for question in questions]
+                )
+            choices_count += len(choices)
+        self.stdout.write(f"{count} questions and {choices_count} choices")
+        return count + choices_count
+
+    @contextmanager
+    def bulk_load_mode(self):
+        """Trade the durability of the inserts for speed when the backend
+        allows it, the data can be generated again on a crash."""
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("PRAGMA synchronous = OFF")
+            elif connection.vendor == "postgresql":
+                cursor.execute("SET synchronous_commit TO OFF")
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                if connection.vendor == "sqlite":
+                    cursor.execute("PRAGMA synchronous = FULL")
+                elif connection.vendor == "postgresql":
+                    cursor.execute("SET synchronous_commit TO DEFAULT")
+
+    @contextmanager
+    def indexes_dropped(self, model):
+        """Drop the secondary indexes of the model table and create them again
+        once the rows are inserted, building an index at once is faster than
+        updating it for every row.
+
+        Only SQLite and PostgreSQL, whose catalogs store the index
+        definitions, are supported; the indexes are kept on other backends.
+        """
+        definitions = self.get_index_definitions(model._meta.db_table)
+        with connection.cursor() as cursor:
+            for name in definitions:
+                cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+        try:
+            yield
+        finally:
+            started = time.perf_counter()
+            with connection.cursor() as cursor:
+                for definition in definitions.values():
+                    cursor.execute(definition)
+            if definitions:
+                self.stdout.write(
+                    f"{len(definitions)} indexes of {model._meta.db_table} "
+                    f"created in {time.perf_counter() - started:.1f} s"
+                )
+
+    @staticmethod
+    def get_index_definitions(table):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        names = [
+            name
+            for name, constraint in constraints.items()
+            if constraint["index"]
+            and not constraint["unique"]
+            and not constraint["primary_key"]
+        ]
+        if not names:
+            return {}
+        placeholders = ", ".join(["%s"] * len(names))
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(
+                    "SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+                    f"AND sql IS NOT NULL AND name IN ({placeholders})",
+                    names,
+                )
+            elif connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT indexname, indexdef FROM pg_indexes "
+                    f"WHERE indexname IN ({placeholders})",
+                    names,
+                )
+            else:
+                return {}
+            return dict(cursor.fetchall())
@@ -0,0 +1,218 @@
+import json
+import multiprocessing
+import os
+import signal
+import socket
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+
+from ...loadtest import (
+    AUTHENTICATED_MIXES,
+    MIXES,
+    PERCENTILES,
+    GraphQLClient,
+    LatencyHistogram,
+    load_context,
+    merge_results,
+    run_worker,
+    summarize,
+)
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_wsgi(listener: socket.socket):
+    """Serve the WSGI application on the socket shared by the workers."""
+    server = ThreadingWSGIServer(
+        listener.getsockname(), QuietWSGIRequestHandler, bind_and_activate=False
+    )
+    server.socket = listener
+    server.server_name, server.server_port = listener.getsockname()
+    server.setup_environ()
+    server.set_app(get_wsgi_application())
+    server.serve_forever()
+
+
+def run_load_worker(queue, *args):
+    queue.put(run_worker(*args))
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a weighted mix of GraphQL operations at a constant request rate "
+        "from several processes and report the latency percentiles, the error "
+        "rate and the throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            help=(
+                "GraphQL endpoint of a running server, e.g. one started with "
+                "`gunicorn project.wsgi` or `uvicorn project.asgi:application`."
+            ),
+        )
+        parser.add_argument(
+            "--serve-workers",
+            type=int,
+            default=4,
+            help=(
+                "Without --url, number of processes of the local WSGI server "
+                "started for the run."
+            ),
+        )
+        parser.add_argument("--mix", choices=sorted(MIXES), default="browse")
+        parser.add_argument(
+            "--rate", type=float, default=100.0, help="Requests per second."
+        )
+        parser.add_argument("--duration", type=float, default=30.0)
+        parser.add_argument(
+            "--processes", type=int, default=2, help="Load generator processes."
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=32,
+            help="Connections of every load generator process.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--email", help="Account used by the authenticated mixes.")
+        parser.add_argument("--password")
+        parser.add_argument(
+            "--output", help="Path of the JSON file to save the histograms to."
+        )
+        parser.add_argument(
+            "--baseline", help="Path of a saved run to compare the percentiles to."
+        )
+
+    def handle(self, *args, **options):
+        if options["mix"] in AUTHENTICATED_MIXES and not options["email"]:
+            raise CommandError(f"The {options['mix']} mix requires --email.")
+
+        server_processes = []
+        url = options["url"]
+        if not url:
+            listener, server_processes = self.start_server(options["serve_workers"])
+            host, port = listener.getsockname()
+            url = f"http://{host}:{port}/graphql/"
+        try:
+            context = load_context(
+                GraphQLClient(url), options["email"], options["password"]
+            )
+            if not context.question_ids:
+                raise CommandError("The tested server has no questions.")
+            results = self.run(url, context, options)
+        finally:
+            for process in server_processes:
+                os.kill(process.pid, signal.SIGTERM)
+                process.join()
+
+        self.report(results, options)
+
+    @staticmethod
+    def start_server(workers):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1024)
+        processes = []
+        for _ in range(workers):
+            process = multiprocessing.Process(
+                target=serve_wsgi, args=(listener,), daemon=True
+            )
+            process.start()
+            processes.append(process)
+        return listener, processes
+
+    def run(self, url, context, options):
+        processes = options["processes"]
+        queue = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=run_load_worker,
+                args=(
+                    queue,
+                    url,
+                    MIXES[options["mix"]],
+                    context,
+                    options["rate"] / processes,
+                    options["duration"],
+                    options["concurrency"],
+                    options["seed"] + index,
+                ),
+            )
+            for index in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        # the results are read before joining, a worker doesn't exit until
+        # its result is consumed from the queue
+        results = [queue.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        return merge_results(results)
+
+    def report(self, results, options):
+        elapsed = results["elapsed"]
+        total_histogram = LatencyHistogram()
+        summaries = {}
+        for name, histogram in sorted(results["histograms"].items()):
+            total_histogram.merge(histogram)
+            summaries[name] = summarize(histogram, results["errors"][name], elapsed)
+        summaries["total"] = summarize(
+            total_histogram, sum(results["errors"].values()), elapsed
+        )
+
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as baseline_file:
+                baseline = json.load(baseline_file)["summaries"]
+
+        columns = [f"p{percentile:g}" for percentile in PERCENTILES]
+        self.stdout.write(
+            f"{'operation':<24}{'requests':>9}{'errors':>8}{'rps':>9}"
+            + "".join(f"{column + ' ms':>11}" for column in columns)
+        )
+        for name, summary in summaries.items():
+            self.stdout.write(
+                f"{name:<24}{summary['requests']:>9}{summary['error_rate']:>8.1%}"
+                f"{summary['throughput']:>9.1f}"
+                + "".join(f"{summary[column]:>11.2f}" for column in columns)
+            )
+            if baseline and name in baseline:
+                self.stdout.write(
+                    f"{'  baseline':<24}{baseline[name]['requests']:>9}"
+                    f"{baseline[name]['error_rate']:>8.1%}"
+                    f"{baseline[name]['throughput']:>9.1f}"
+                    + "".join(
+                        f"{baseline[name][column]:>11.2f}" for column in columns
+                    )
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(
+                    {
+                        "mix": options["mix"],
+                        "rate": options["rate"],
+                        "duration": options["duration"],
+                        "elapsed": elapsed,
+                        "summaries": summaries,
+                        "histograms": {
+                            name: histogram.as_dict()
+                            for name, histogram in results["histograms"].items()
+                        },
+                    },
+                    output,
+                    indent=2,
+                )
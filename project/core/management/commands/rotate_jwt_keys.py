@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...jwt_keys import ASYMMETRIC_ALGORITHMS, create_signing_key, rotate_signing_keys
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a JWT signing key when the newest key is older than "
+        "JWT_KEY_ROTATION_INTERVAL days and delete the expired keys. Run it "
+        "on a schedule, daily for example."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true", help="Create a key in any case."
+        )
+        parser.add_argument(
+            "--algorithm",
+            choices=ASYMMETRIC_ALGORITHMS,
+            help="Algorithm of a key created in any case, JWT_ALGORITHM by default.",
+        )
+
+    def handle(self, *args, **options):
+        algorithm = options["algorithm"] or settings.JWT_ALGORITHM
+        if algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise CommandError(
+                f"The {algorithm} tokens are signed with the SECRET_KEY, not by "
+                "the keyset."
+            )
+        if options["algorithm"]:
+            created = create_signing_key(options["algorithm"])
+            _, deleted = rotate_signing_keys()
+        else:
+            created, deleted = rotate_signing_keys(force=options["force"])
+        if created:
+            self.stdout.write(f"Created the {created.algorithm} key {created.kid}.")
+        else:
+            self.stdout.write("The newest key doesn't need a rotation.")
+        self.stdout.write(f"Deleted {deleted} expired keys.")
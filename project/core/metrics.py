@@ -0,0 +1,308 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+DEFAULT_DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+DEFAULT_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Request attributes set by the middlewares.
+METRICS_SAMPLED_ATTRIBUTE = "metrics_sampled"
+METRICS_OPERATION_ATTRIBUTE = "metrics_operation"
+
+# Label of the operations past the `METRICS_MAX_OPERATIONS` distinct names.
+OTHER_OPERATION = "other"
+
+Labels = Tuple[str, ...]
+
+
+class Metric:
+    """Metric aggregated per thread.
+
+    Every thread records its values in its own dictionary so recording
+    doesn't take a lock. The dictionaries of all threads are merged when the
+    metric is collected, the values of the finished threads are folded in a
+    single dictionary so a thread per request doesn't grow the metric.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._local = threading.local()
+        self._thread_values: List[Tuple[threading.Thread, Dict[Labels, list]]] = []
+        self._finished_values: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def _get_values(self) -> Dict[Labels, list]:
+        values = getattr(self._local, "values", None)
+        if values is None:
+            values = self._local.values = {}
+            with self._lock:
+                self._fold_finished_threads()
+                self._thread_values.append((threading.current_thread(), values))
+        return values
+
+    def _fold_finished_threads(self):
+        """Merge the values of the finished threads, which don't record
+        anymore, and forget them. Called with the lock held."""
+        running = []
+        for thread, values in self._thread_values:
+            if thread.is_alive():
+                running.append((thread, values))
+            else:
+                self._merge_values(self._finished_values, values)
+        self._thread_values = running
+
+    def _merge_values(self, merged: Dict[Labels, list], values: Dict[Labels, list]):
+        # copying the items is atomic, the owner thread can keep recording
+        for labels, value in list(values.items()):
+            if labels not in merged:
+                merged[labels] = self.new_value()
+            self.merge_value(merged[labels], list(value))
+
+    def new_value(self) -> list:
+        raise NotImplementedError
+
+    def merge_value(self, value: list, other: list):
+        for index, item in enumerate(other):
+            value[index] += item
+
+    def collect(self) -> Dict[Labels, list]:
+        merged: Dict[Labels, list] = {}
+        with self._lock:
+            self._fold_finished_threads()
+            self._merge_values(merged, self._finished_values)
+            thread_values = [values for _, values in self._thread_values]
+        for values in thread_values:
+            self._merge_values(merged, values)
+        return merged
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def new_value(self) -> list:
+        return [0]
+
+    def inc(self, *labels: str, amount: float = 1):
+        values = self._get_values()
+        value = values.get(labels)
+        if value is None:
+            value = values[labels] = self.new_value()
+        value[0] += amount
+
+
+class Histogram(Metric):
+    """Histogram whose value is the counts of the buckets, the sum and the
+    count of the observed values."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Tuple[str, ...],
+        buckets=DEFAULT_DURATION_BUCKETS,
+    ):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(buckets)
+
+    def new_value(self) -> list:
+        return [0] * (len(self.buckets) + 3)
+
+    def observe(self, amount: float, *labels: str):
+        values = self._get_values()
+        value = values.get(labels)
+        if value is None:
+            value = values[labels] = self.new_value()
+        # the last bucket counts the values over the highest bound
+        value[bisect_left(self.buckets, amount)] += 1
+        value[-2] += amount
+        value[-1] += 1
+
+
+class MetricsRegistry:
+    """Registry of the metrics of the process.
+
+    When `METRICS_DIRECTORY` is set, the metrics of the process are saved in
+    a file of the directory every `METRICS_FLUSH_INTERVAL` seconds, and the
+    metrics of every process of the host are merged from these files.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self._last_flush = time.monotonic()
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, description, label_names=()) -> Counter:
+        return self.register(Counter(name, description, label_names))
+
+    def histogram(self, name, description, label_names=(), **kwargs) -> Histogram:
+        return self.register(Histogram(name, description, label_names, **kwargs))
+
+    def collect(self) -> Dict[str, Dict[Labels, list]]:
+        return {name: metric.collect() for name, metric in self.metrics.items()}
+
+    @staticmethod
+    def _get_process_path() -> Optional[str]:
+        directory = settings.METRICS_DIRECTORY
+        if not directory:
+            return None
+        return os.path.join(directory, f"{os.getpid()}.json")
+
+    def flush(self):
+        path = self._get_process_path()
+        if path is None:
+            return
+        self._last_flush = time.monotonic()
+        data = {
+            name: [[list(labels), value] for labels, value in values.items()]
+            for name, values in self.collect().items()
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as metrics_file:
+            json.dump(data, metrics_file)
+        os.replace(temp_path, path)
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def collect_host(self) -> Dict[str, Dict[Labels, list]]:
+        """Return the metrics merged from the files of every process.
+
+        The files of the processes that exited are kept, so the counters of
+        the host don't go back when a worker is replaced.
+        """
+        directory = settings.METRICS_DIRECTORY
+        if not directory:
+            return self.collect()
+        self.flush()
+        merged: Dict[str, Dict[Labels, list]] = {name: {} for name in self.metrics}
+        for file_name in os.listdir(directory):
+            if not file_name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, file_name)) as metrics_file:
+                    data = json.load(metrics_file)
+            except (OSError, ValueError):
+                continue
+            for name, values in data.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                for labels, value in values:
+                    labels = tuple(labels)
+                    if labels not in merged[name]:
+                        merged[name][labels] = metric.new_value()
+                    metric.merge_value(merged[name][labels], value)
+        return merged
+
+    def render(self) -> str:
+        """Return the metrics of the host in the Prometheus text format."""
+        lines = []
+        for name, values in self.collect_host().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.description}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for labels, value in sorted(values.items()):
+                label_pairs = list(zip(metric.label_names, labels))
+                if metric.type == "counter":
+                    lines.append(f"{name}{format_labels(label_pairs)} {value[0]}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + ("+Inf",), value):
+                    cumulative += count
+                    bucket_labels = format_labels(label_pairs + [("le", str(bound))])
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(label_pairs)} {value[-2]}")
+                lines.append(f"{name}_count{format_labels(label_pairs)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+_operation_labels = set()
+_operation_labels_lock = threading.Lock()
+
+
+def get_operation_label(operation: str) -> str:
+    """Return the label of the operation in the metrics.
+
+    The operation names are chosen by the clients, past
+    `METRICS_MAX_OPERATIONS` distinct names the other operations of the
+    process are labeled `other`.
+    """
+    if operation in _operation_labels:
+        return operation
+    with _operation_labels_lock:
+        if len(_operation_labels) < settings.METRICS_MAX_OPERATIONS:
+            _operation_labels.add(operation)
+            return operation
+    return OTHER_OPERATION
+
+
+def format_labels(label_pairs) -> str:
+    if not label_pairs:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in label_pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
+
+operation_duration = registry.histogram(
+    "graphql_operation_duration_seconds",
+    "Duration of the GraphQL requests by operation.",
+    ("operation",),
+)
+field_duration = registry.histogram(
+    "graphql_field_duration_seconds",
+    "Duration of the resolvers by Type.field, for the sampled requests.",
+    ("field",),
+)
+operation_sql_queries = registry.histogram(
+    "graphql_operation_sql_queries",
+    "SQL queries of the GraphQL requests by operation, for the sampled requests.",
+    ("operation",),
+    buckets=DEFAULT_COUNT_BUCKETS,
+)
+operation_sql_duration = registry.histogram(
+    "graphql_operation_sql_duration_seconds",
+    "Time spent in SQL queries by operation, for the sampled requests.",
+    ("operation",),
+)
+errors_total = registry.counter(
+    "graphql_errors_total",
+    "Errors returned by the GraphQL operations by code.",
+    ("operation", "code"),
+)
@@ -0,0 +1,64 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .metrics import (
+    METRICS_OPERATION_ATTRIBUTE,
+    METRICS_SAMPLED_ATTRIBUTE,
+    operation_duration,
+    operation_sql_duration,
+    operation_sql_queries,
+    registry,
+)
+
+
+class SQLRecorder:
+    """Execute wrapper counting the queries and the time spent in them."""
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.queries += 1
+
+
+class MetricsMiddleware:
+    """Record the duration of the GraphQL operations.
+
+    The SQL queries and, through the GraphQL `MetricsMiddleware`, the
+    resolvers are only measured for a `METRICS_SAMPLE_RATE` share of the
+    requests.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sampled = random.random() < settings.METRICS_SAMPLE_RATE
+        setattr(request, METRICS_SAMPLED_ATTRIBUTE, sampled)
+        started = time.perf_counter()
+        if sampled:
+            recorder = SQLRecorder()
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        # the operation is only set on the requests that executed GraphQL
+        operation = getattr(request, METRICS_OPERATION_ATTRIBUTE, None)
+        if operation is not None:
+            operation_duration.observe(elapsed, operation)
+            if sampled:
+                operation_sql_queries.observe(recorder.queries, operation)
+                operation_sql_duration.observe(recorder.duration, operation)
+        registry.maybe_flush()
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.12 on 2026-10-19 09:53
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JWTSigningKey',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, null=True, verbose_name='created date')),
+                ('modified', models.DateTimeField(auto_now=True, null=True, verbose_name='modified date')),
+                ('kid', models.CharField(max_length=64, unique=True)),
+                ('algorithm', models.CharField(max_length=16)),
+                ('private_key', models.TextField()),
+            ],
+            options={
+                'ordering': ('-created',),
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.12 on 2026-10-19 10:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0002_jwt_signing_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileblob',
+            name='owners',
+            field=models.ManyToManyField(blank=True, related_name='file_blobs', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -1,4 +1,5 @@
 import uuid
+from django.conf import settings
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
@@ -33,4 +34,28 @@ class SimpleModel(BaseModel):
 
     class Meta:
         abstract = True
-        ordering = ("-created",)
\ No newline at end of file
+        ordering = ("-created",)
+
+class FileBlob(SimpleModel):
+    """
+    A file of the content addressed upload storage, stored once under the
+    SHA-256 digest of its content and shared by every upload of that content.
+    `ref_count` counts the model file fields storing the blob, and `owners`
+    are the users who uploaded its content.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    owners = models.ManyToManyField(
+        settings.AUTH_USER_MODEL, related_name="file_blobs", blank=True
+    )
+
+
+class JWTSigningKey(SimpleModel):
+    """
+    A key of the keyset signing the JWT, identified in the tokens by its
+    `kid`. The public keys are published by the JWKS endpoint.
+    """
+    kid = models.CharField(max_length=64, unique=True)
+    algorithm = models.CharField(max_length=16)
+    private_key = models.TextField()
@@ -0,0 +1,143 @@
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.wsgi import WSGIRequest
+
+# Header requesting the profile of a request, its value is a token created
+# by `create_profiling_token`.
+PROFILING_HEADER = "HTTP_X_GRAPHQL_PROFILE"
+PROFILING_SALT = "project.core.profiling"
+# Request attribute holding the profiler of the request.
+PROFILER_ATTRIBUTE = "profiler"
+PROFILE_SUFFIX = ".folded"
+# Sequence number of the profiles written by the process, the profiles of a
+# thread started in the same second have distinct names.
+_profile_numbers = itertools.count()
+
+
+def create_profiling_token() -> str:
+    return signing.TimestampSigner(salt=PROFILING_SALT).sign("profile")
+
+
+def is_profiling_token_valid(token: str) -> bool:
+    try:
+        signing.TimestampSigner(salt=PROFILING_SALT).unsign(
+            token, max_age=settings.GRAPHQL_PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def should_profile(request: WSGIRequest) -> bool:
+    """Return whether the request is profiled, by its signed header or by
+    the `GRAPHQL_PROFILING_SAMPLE_RATE`."""
+    if not settings.GRAPHQL_PROFILING_DIRECTORY:
+        return False
+    token = request.META.get(PROFILING_HEADER)
+    if token:
+        return is_profiling_token_valid(token)
+    sample_rate = settings.GRAPHQL_PROFILING_SAMPLE_RATE
+    return bool(sample_rate) and random.random() < sample_rate
+
+
+def remove_old_profiles(directory: str, max_files: int):
+    """Remove the oldest profiles of the directory beyond `max_files`."""
+    profiles = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith(PROFILE_SUFFIX):
+                continue
+            try:
+                profiles.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+    profiles.sort()
+    for _, path in profiles[: max(len(profiles) - max_files, 0)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # removed by another process
+            pass
+
+
+def get_frame_name(frame) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+class SamplingProfiler:
+    """Sample the stack of the thread handling a request.
+
+    A background thread reads the stack of the profiled thread every
+    `interval` seconds and counts the distinct stacks, the profiled code
+    isn't instrumented. The GraphQL resolver being executed, set in
+    `resolver_paths` by the `ProfilingMiddleware`, is added as the root frame
+    of the samples.
+    """
+
+    def __init__(self, interval: Optional[float] = None):
+        if interval is None:
+            interval = settings.GRAPHQL_PROFILING_INTERVAL
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.operation: Optional[str] = None
+        self.resolver_paths: List[str] = []
+        self.samples: Counter = Counter()
+        self.path: Optional[str] = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.started = time.time()
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(get_frame_name(frame))
+                frame = frame.f_back
+            resolver_path = self.resolver_paths[-1] if self.resolver_paths else None
+            stack.append(f"graphql:{resolver_path or self.operation or 'request'}")
+            self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, directory: Optional[str] = None) -> str:
+        """Write the samples as collapsed stacks, the input of the flamegraph
+        tools, and return the path of the file.
+
+        Only the `GRAPHQL_PROFILING_MAX_FILES` most recent profiles of the
+        directory are kept.
+        """
+        if directory is None:
+            directory = settings.GRAPHQL_PROFILING_DIRECTORY
+        os.makedirs(directory, exist_ok=True)
+        operation = "".join(
+            char for char in (self.operation or "anonymous") if char.isalnum()
+        )
+        path = os.path.join(
+            directory,
+            f"{time.strftime('%Y%m%d%H%M%S', time.gmtime(self.started))}"
+            f"-{operation}-{os.getpid()}-{self.thread_id}"
+            f"-{next(_profile_numbers)}{PROFILE_SUFFIX}",
+        )
+        with open(path, "w") as profile_file:
+            for stack, count in self.samples.most_common():
+                profile_file.write(f"{stack} {count}\n")
+        remove_old_profiles(directory, settings.GRAPHQL_PROFILING_MAX_FILES)
+        return path
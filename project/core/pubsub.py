@@ -0,0 +1,131 @@
+import glob
+import logging
+import os
+import socket
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Maximum size of a message sent between the processes.
+BRIDGE_MESSAGE_MAX_SIZE = 64 * 1024
+
+Callback = Callable[[str, str], None]
+
+
+class SocketBridge:
+    """Deliver the published messages to the other processes of the host.
+
+    Every listening process binds a datagram socket in `directory`, the
+    messages are sent to all the sockets of the directory. Sockets left by
+    stopped processes are removed when a message can't be delivered to them.
+    """
+
+    def __init__(self, directory: str, deliver: Callback):
+        self.directory = directory
+        self.deliver = deliver
+        self.path: Optional[str] = None
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        # the publishers never wait for the slow processes
+        self._sender.setblocking(False)
+        self._lock = threading.Lock()
+
+    def listen(self):
+        """Bind the socket of the process and deliver the messages it
+        receives, in a background thread."""
+        with self._lock:
+            if self.path is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self.path = os.path.join(self.directory, f"{os.getpid()}.sock")
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receiver.bind(self.path)
+        threading.Thread(target=self._receive, args=(receiver,), daemon=True).start()
+
+    def _receive(self, receiver: socket.socket):
+        while True:
+            data = receiver.recv(BRIDGE_MESSAGE_MAX_SIZE)
+            channel, _, message = data.decode().partition("\0")
+            try:
+                self.deliver(channel, message)
+            except Exception:
+                logger.exception("Delivery of a message of %s failed", channel)
+
+    def send(self, channel: str, message: str):
+        data = f"{channel}\0{message}".encode()
+        for path in glob.glob(os.path.join(self.directory, "*.sock")):
+            if path == self.path:
+                continue
+            try:
+                self._sender.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                logger.warning("Message of %s dropped, %s is full", channel, path)
+
+
+class PubSub:
+    """Publish messages to the callbacks subscribed to their channel.
+
+    The callbacks are called in the thread of the publisher, or in the
+    thread of the bridge for the messages of the other processes. The
+    messages are sent to the other processes when `PUBSUB_BRIDGE_DIRECTORY`
+    is set.
+    """
+
+    def __init__(self, bridge_directory: Optional[str] = None):
+        self._subscribers: Dict[str, List[Callback]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.bridge = None
+        if bridge_directory:
+            self.bridge = SocketBridge(bridge_directory, self.deliver)
+
+    def subscribe(self, channel: str, callback: Callback):
+        if self.bridge is not None:
+            self.bridge.listen()
+        with self._lock:
+            self._subscribers[channel].append(callback)
+
+    def unsubscribe(self, channel: str, callback: Callback):
+        with self._lock:
+            callbacks = self._subscribers.get(channel, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                self._subscribers.pop(channel, None)
+
+    def publish(self, channel: str, message: str = ""):
+        self.deliver(channel, message)
+        if self.bridge is not None:
+            self.bridge.send(channel, message)
+
+    def deliver(self, channel: str, message: str):
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, ()))
+        for callback in callbacks:
+            callback(channel, message)
+
+
+_pubsub: Optional[PubSub] = None
+_pubsub_pid: Optional[int] = None
+
+
+def get_pubsub() -> PubSub:
+    """Return the pub/sub of the process.
+
+    It's created again in forked processes, the socket and the thread of
+    the bridge aren't inherited.
+    """
+    global _pubsub, _pubsub_pid
+    if _pubsub is None or _pubsub_pid != os.getpid():
+        _pubsub = PubSub(settings.PUBSUB_BRIDGE_DIRECTORY)
+        _pubsub_pid = os.getpid()
+    return _pubsub
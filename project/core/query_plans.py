@@ -0,0 +1,35 @@
+import re
+from typing import List
+
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+# Patterns of the plans scanning a whole table or index, or sorting the rows,
+# by database vendor.
+PLAN_PATTERNS = {
+    "sqlite": {
+        "SCAN": re.compile(r"\bSCAN\b"),
+        "SORT": re.compile(r"USE TEMP B-TREE"),
+    },
+    "postgresql": {
+        "SCAN": re.compile(r"\bSeq Scan\b"),
+        "SORT": re.compile(r"\bSort\s+\("),
+    },
+}
+
+
+def explain(queryset: QuerySet) -> str:
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            # the tables of the development databases are small enough to be
+            # scanned, the plans should still use the indexes
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+
+def get_plan_problems(plan: str) -> List[str]:
+    """Return the problems of the plan, `SCAN` when it scans a whole table or
+    index and `SORT` when it sorts the rows instead of seeking an index."""
+    patterns = PLAN_PATTERNS.get(connection.vendor, {})
+    return [problem for problem, pattern in patterns.items() if pattern.search(plan)]
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.handlers.wsgi import WSGIRequest
+
+# Maximum number of keys kept by the in-process limiter, the least recently
+# used keys are dropped first so random keys can't exhaust the memory.
+LOCAL_RATE_LIMITER_MAX_KEYS = 100_000
+
+
+class LocalRateLimiter:
+    """In-process token bucket limiter.
+
+    Every key has a bucket of `rate` tokens refilled at `rate` tokens per
+    `period` seconds, a hit consumes one token.
+    """
+
+    def __init__(self, rate: int, period: int, max_keys=LOCAL_RATE_LIMITER_MAX_KEYS):
+        self.rate = rate
+        self.period = period
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str) -> bool:
+        """Consume a token, return False when the key is over the limit."""
+        now = time.monotonic()
+        refill_rate = self.rate / self.period
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.rate, now))
+            tokens = min(self.rate, tokens + (now - updated) * refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed
+
+    def reset(self, key: str):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class CacheRateLimiter:
+    """Sliding window limiter stored in a Django cache.
+
+    The counters are shared by every process that uses the same cache, so
+    with a host-local cache (e.g. `FileBasedCache` or a local memcached) the
+    limits hold across all workers of the host. The window is approximated
+    from the counters of the current and the previous fixed windows.
+    """
+
+    def __init__(self, rate: int, period: int, cache_alias: str, prefix: str):
+        self.rate = rate
+        self.period = period
+        self.cache = caches[cache_alias]
+        self.prefix = prefix
+
+    def _window_key(self, key: str, window: int) -> str:
+        return f"rate-limit:{self.prefix}:{key}:{window}"
+
+    def hit(self, key: str) -> bool:
+        """Count the hit then check the limit with the value returned by the
+        atomic `incr`, so concurrent hits can't all pass the check."""
+        now = time.time()
+        window = int(now // self.period)
+        current_key = self._window_key(key, window)
+        previous_key = self._window_key(key, window - 1)
+
+        # keep the counter for two windows as it's read as the previous one
+        self.cache.add(current_key, 0, timeout=self.period * 2)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # the key expired between add and incr
+            self.cache.add(current_key, 0, timeout=self.period * 2)
+            current = self.cache.incr(current_key)
+
+        elapsed = (now % self.period) / self.period
+        previous = self.cache.get(previous_key, 0)
+        if current + previous * (1 - elapsed) > self.rate:
+            # the rejected hits don't count, a client retrying doesn't
+            # extend its own lockout
+            try:
+                self.cache.decr(current_key)
+            except ValueError:
+                # the key expired since the incr, with the counted hit
+                pass
+            return False
+        return True
+
+    def reset(self, key: str):
+        window = int(time.time() // self.period)
+        self.cache.delete_many(
+            [self._window_key(key, window), self._window_key(key, window - 1)]
+        )
+
+
+_rate_limiters: Dict[str, object] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, rate: int, period: int):
+    """Return the limiter registered under the name, create it if needed.
+
+    Limiters use the cache defined in `RATE_LIMIT_CACHE` when it's set,
+    otherwise the counters are kept in the memory of the process.
+    """
+    cache_alias = settings.RATE_LIMIT_CACHE
+    limiter_key = f"{name}:{rate}:{period}:{cache_alias}"
+    limiter = _rate_limiters.get(limiter_key)
+    if limiter is not None:
+        return limiter
+
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(limiter_key)
+        if limiter is None:
+            if cache_alias:
+                limiter = CacheRateLimiter(rate, period, cache_alias, prefix=name)
+            else:
+                limiter = LocalRateLimiter(rate, period)
+            _rate_limiters[limiter_key] = limiter
+    return limiter
+
+
+def get_client_ip(request: WSGIRequest) -> Optional[str]:
+    return request.META.get("REMOTE_ADDR")
@@ -0,0 +1,71 @@
+from django.db.models import FileField
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .uploads import claim_blob, get_blob_digest, release_blob
+
+# Attribute of the instances with the names of their files, as stored.
+STORED_FILE_NAMES_ATTRIBUTE = "_stored_file_names"
+
+
+def get_file_fields(model):
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if isinstance(field, FileField)
+    ]
+
+
+def get_file_names(instance):
+    """Return the names of the loaded files of the instance by field, deferred
+    fields are left out."""
+    names = {}
+    for field in get_file_fields(type(instance)):
+        if field.attname in instance.__dict__:
+            value = instance.__dict__[field.attname]
+            names[field.attname] = getattr(value, "name", value) or None
+    return names
+
+
+def remember_file_names(sender, instance, **kwargs):
+    setattr(instance, STORED_FILE_NAMES_ATTRIBUTE, get_file_names(instance))
+
+
+def update_blob_references(sender, instance, created, update_fields, **kwargs):
+    """Reference the blobs saved in the file fields and release the blobs
+    they replaced, so `collect_file_blobs` deletes them once nothing
+    references them. The references are updated in the transaction of the
+    save."""
+    stored = {} if created else getattr(instance, STORED_FILE_NAMES_ATTRIBUTE, {})
+    names = get_file_names(instance)
+    for field in get_file_fields(sender):
+        if update_fields is not None and field.name not in update_fields:
+            continue
+        if not created and field.attname not in stored:
+            # deferred when the instance was loaded, the stored name is unknown
+            continue
+        previous, name = stored.get(field.attname), names.get(field.attname)
+        if previous == name:
+            continue
+        digest = get_blob_digest(name)
+        if digest:
+            claim_blob(digest)
+        digest = get_blob_digest(previous)
+        if digest:
+            release_blob(digest)
+    setattr(instance, STORED_FILE_NAMES_ATTRIBUTE, {**stored, **names})
+
+
+def release_deleted_blobs(sender, instance, **kwargs):
+    names = getattr(instance, STORED_FILE_NAMES_ATTRIBUTE, None)
+    if names is None:
+        names = get_file_names(instance)
+    for digest in filter(None, map(get_blob_digest, names.values())):
+        release_blob(digest)
+
+
+def track_blob_references(model):
+    """Count the references of the model file fields to the blobs of the
+    content addressed storage."""
+    post_init.connect(remember_file_names, sender=model)
+    post_save.connect(update_blob_references, sender=model)
+    post_delete.connect(release_deleted_blobs, sender=model)
@@ -0,0 +1,610 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+import jwt
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, models
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import isolate_apps
+from django.utils import timezone
+
+from ..graphql.api import schema
+from ..users.models import User
+from . import metrics
+from .error_codes import UploadErrorCodes
+from .jwt import create_access_token, jwt_decode, jwt_encode
+from .jwt_keys import Keyset, serialization
+from .management.commands import benchmark_imports
+from .metrics import MetricsRegistry
+from .models import FileBlob, JWTSigningKey
+from .profiling import (
+    SamplingProfiler,
+    create_profiling_token,
+    is_profiling_token_valid,
+    should_profile,
+)
+from .rate_limit import CacheRateLimiter, LocalRateLimiter
+from .signals import track_blob_references
+from .uploads import (
+    ChunkedUpload,
+    get_blob_digest,
+    get_upload_owner,
+    save_content_addressed,
+)
+
+OWNER = "a" * 32
+OTHER_OWNER = "b" * 32
+# Milliseconds spent importing the project modules by `manage.py check`, about
+# 25 ms when the schema packages are loaded lazily.
+PROJECT_IMPORT_BUDGET_MS = 100
+
+
+class MediaRootMixin:
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = media_root
+
+
+@override_settings(FILE_UPLOAD_QUOTA=100, FILE_UPLOAD_SESSION_TTL=60)
+class ChunkedUploadTests(MediaRootMixin, TestCase):
+    def test_unfinished_uploads_of_an_owner_cant_exceed_the_quota(self):
+        ChunkedUpload.start(OWNER, "first.bin", 60)
+
+        with self.assertRaises(ValidationError) as context:
+            ChunkedUpload.start(OWNER, "second.bin", 60)
+        self.assertEqual(
+            context.exception.error_dict["size"][0].code,
+            UploadErrorCodes.QUOTA_EXCEEDED.value,
+        )
+        ChunkedUpload.start(OTHER_OWNER, "second.bin", 60)
+
+    def test_upload_isnt_found_by_other_owners(self):
+        upload = ChunkedUpload.start(OWNER, "file.bin", 10)
+
+        with self.assertRaises(ValidationError):
+            ChunkedUpload.get(upload.id, OTHER_OWNER)
+
+    def test_finish_reads_the_offset_written_by_other_workers(self):
+        upload = ChunkedUpload.start(OWNER, "file.bin", 4)
+        ChunkedUpload.get(upload.id, OWNER).write_chunk(0, io.BytesIO(b"data"), 4)
+
+        self.assertEqual(upload.finish(), upload.name)
+        with open(os.path.join(self.media_root, upload.name), "rb") as file:
+            self.assertEqual(file.read(), b"data")
+
+    def test_chunks_are_streamed_from_the_request_body(self):
+        user = User.objects.create_user(email="user@example.com", password="x")
+        request = RequestFactory().get("/")
+        request.user = user
+        upload = ChunkedUpload.start(get_upload_owner(request), "file.bin", 8)
+        token = create_access_token(user)
+
+        def send_chunk(offset, body, token=token):
+            return self.client.generic(
+                "PATCH",
+                f"/uploads/{upload.id}",
+                body,
+                content_type="application/offset+octet-stream",
+                HTTP_UPLOAD_OFFSET=str(offset),
+                HTTP_AUTHORIZATION=f"JWT {token}",
+            )
+
+        response = send_chunk(0, b"abcd")
+        self.assertEqual(response.json(), {**response.json(), "offset": 4})
+        response = send_chunk(6, b"gh")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"][0]["code"], "INVALID_OFFSET")
+        self.assertEqual(send_chunk(4, b"efgh", token="invalid").status_code, 404)
+        response = send_chunk(4, b"efgh")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["completed"])
+
+        self.assertEqual(upload.finish(), upload.name)
+        with open(os.path.join(self.media_root, upload.name), "rb") as file:
+            self.assertEqual(file.read(), b"abcdefgh")
+
+    @override_settings(FILE_UPLOAD_CONTENT_ADDRESSED=True)
+    def test_chunks_written_in_order_are_hashed_while_written(self):
+        upload = ChunkedUpload.start(OWNER, "file.bin", 8)
+        upload.write_chunk(0, io.BytesIO(b"abcd"), 4)
+        upload.write_chunk(4, io.BytesIO(b"efgh"), 4)
+
+        with mock.patch("project.core.uploads.get_file_digest") as get_file_digest:
+            name = upload.finish()
+
+        get_file_digest.assert_not_called()
+        digest = hashlib.sha256(b"abcdefgh").hexdigest()
+        self.assertEqual(get_blob_digest(name), digest)
+
+    @override_settings(FILE_UPLOAD_CONTENT_ADDRESSED=True)
+    def test_chunks_written_by_other_workers_invalidate_the_digest(self):
+        upload = ChunkedUpload.start(OWNER, "file.bin", 8)
+        upload.write_chunk(0, io.BytesIO(b"abcd"), 4)
+        # another worker, without the hasher of the process, rewrites the start
+        with mock.patch.dict("project.core.uploads._upload_hashers", clear=True):
+            upload.write_chunk(0, io.BytesIO(b"ab"), 2)
+            upload.write_chunk(2, io.BytesIO(b"CD"), 2)
+        upload.write_chunk(4, io.BytesIO(b"efgh"), 4)
+
+        name = upload.finish()
+
+        digest = hashlib.sha256(b"abCDefgh").hexdigest()
+        self.assertEqual(get_blob_digest(name), digest)
+
+    def test_expired_uploads_are_deleted_with_their_files(self):
+        expired = ChunkedUpload.start(OWNER, "expired.bin", 60)
+        with mock.patch("time.time", return_value=expired.updated + 61):
+            active = ChunkedUpload.start(OWNER, "active.bin", 60)
+            with self.assertRaises(ValidationError):
+                ChunkedUpload.get(expired.id, OWNER)
+
+            call_command("clear_expired_uploads", stdout=io.StringIO())
+
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, expired.name)))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, active.name)))
+        self.assertEqual(ChunkedUpload.get(active.id, OWNER).id, active.id)
+
+
+class FileBlobCollectionTests(MediaRootMixin, TransactionTestCase):
+    @isolate_apps("project.core")
+    def test_replaced_and_deleted_files_are_collected(self):
+        class Document(models.Model):
+            file = models.FileField()
+
+        track_blob_references(Document)
+        with connection.schema_editor() as editor:
+            editor.create_model(Document)
+        self.addCleanup(self.delete_model, Document)
+        first = save_content_addressed(ContentFile(b"first", name="first.txt"))
+        Document.objects.create(file=first)
+
+        # the blob saved in a model is kept, even after the grace period
+        self.collect_file_blobs()
+        self.assertTrue(default_storage.exists(first))
+        blob = FileBlob.objects.get(digest=get_blob_digest(first))
+        self.assertEqual(blob.ref_count, 1)
+
+        second = save_content_addressed(ContentFile(b"second", name="second.txt"))
+        document = Document.objects.get()
+        document.file = second
+        document.save()
+        self.collect_file_blobs()
+
+        self.assertFalse(default_storage.exists(first))
+        self.assertFalse(
+            FileBlob.objects.filter(digest=get_blob_digest(first)).exists()
+        )
+        self.assertTrue(default_storage.exists(second))
+
+        document.delete()
+        self.collect_file_blobs()
+
+        self.assertFalse(default_storage.exists(second))
+        self.assertFalse(FileBlob.objects.exists())
+
+    def test_unsaved_uploads_are_kept_during_the_grace_period(self):
+        name = save_content_addressed(ContentFile(b"data", name="data.txt"))
+
+        call_command("collect_file_blobs", stdout=io.StringIO())
+
+        self.assertTrue(default_storage.exists(name))
+
+    @staticmethod
+    def collect_file_blobs():
+        call_command("collect_file_blobs", grace_period=0, stdout=io.StringIO())
+
+    @staticmethod
+    def delete_model(model):
+        with connection.schema_editor() as editor:
+            editor.delete_model(model)
+
+
+@override_settings(FILE_UPLOAD_CONTENT_ADDRESSED=True)
+class FileBlobOwnershipTests(MediaRootMixin, TestCase):
+    FILE_BLOB_QUERY = """
+        query($digest: String!) { fileBlob(digest: $digest) { url } }
+    """
+    UPLOAD_BY_DIGEST_MUTATION = """
+        mutation($digest: String!) {
+            fileUploadByDigest(digest: $digest) {
+                uploadedFile { url } errors { code }
+            }
+        }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email="owner@example.com", password="password"
+        )
+        cls.other = User.objects.create_user(
+            email="other@example.com", password="password"
+        )
+
+    def execute(self, query, user, **variables):
+        request = RequestFactory().post("/graphql/")
+        request.user = user
+        return schema.execute(query, context_value=request, variable_values=variables)
+
+    def test_only_the_uploaders_of_a_blob_find_it_by_its_digest(self):
+        name = save_content_addressed(ContentFile(b"data", name="data.txt"), self.owner)
+        digest = get_blob_digest(name)
+
+        result = self.execute(self.FILE_BLOB_QUERY, self.owner, digest=digest)
+        self.assertIsNone(result.errors)
+        self.assertTrue(result.data["fileBlob"]["url"].endswith(name))
+        result = self.execute(self.FILE_BLOB_QUERY, self.other, digest=digest)
+        self.assertIsNone(result.errors)
+        self.assertIsNone(result.data["fileBlob"])
+        result = self.execute(self.FILE_BLOB_QUERY, AnonymousUser(), digest=digest)
+        self.assertIsNotNone(result.errors)
+
+    def test_upload_by_digest_requires_an_uploader_and_adds_no_reference(self):
+        name = save_content_addressed(ContentFile(b"data", name="data.txt"), self.owner)
+        digest = get_blob_digest(name)
+
+        result = self.execute(self.UPLOAD_BY_DIGEST_MUTATION, self.other, digest=digest)
+        self.assertEqual(
+            result.data["fileUploadByDigest"]["errors"],
+            [{"code": UploadErrorCodes.NOT_FOUND.name}],
+        )
+        result = self.execute(
+            self.UPLOAD_BY_DIGEST_MUTATION, AnonymousUser(), digest=digest
+        )
+        self.assertIsNotNone(result.errors)
+
+        for _ in range(3):
+            result = self.execute(
+                self.UPLOAD_BY_DIGEST_MUTATION, self.owner, digest=digest
+            )
+            self.assertEqual(result.data["fileUploadByDigest"]["errors"], [])
+        self.assertEqual(FileBlob.objects.get(digest=digest).ref_count, 0)
+
+        # the content proves the possession of the blob
+        save_content_addressed(ContentFile(b"data", name="copy.txt"), self.other)
+        result = self.execute(self.FILE_BLOB_QUERY, self.other, digest=digest)
+        self.assertIsNotNone(result.data["fileBlob"])
+
+
+class ImportTimeTests(SimpleTestCase):
+    def test_check_doesnt_import_the_lazy_modules_and_stays_within_budget(self):
+        imports = benchmark_imports.Command.run_check()
+
+        loaded = [
+            name
+            for name in imports
+            for module in benchmark_imports.LAZY_MODULES
+            if name == module or name.startswith(f"{module}.")
+        ]
+        self.assertEqual(loaded, [])
+        project_ms = (
+            sum(time for name, time in imports.items() if name.startswith("project"))
+            / 1000
+        )
+        self.assertLess(project_ms, PROJECT_IMPORT_BUDGET_MS)
+
+
+@skipUnless(serialization, "The cryptography package isn't installed.")
+@override_settings(
+    JWT_ALGORITHM="EdDSA",
+    JWT_KEY_PUBLICATION_DELAY=3600,
+    JWT_SECRET_KEY_TOKENS_UNTIL="2100-01-01T00:00:00Z",
+)
+class JWTSigningKeyTests(TestCase):
+    def setUp(self):
+        keyset_patch = mock.patch("project.core.jwt.keyset", Keyset())
+        self.keyset = keyset_patch.start()
+        self.addCleanup(keyset_patch.stop)
+
+    def test_tokens_are_only_signed_with_published_keys(self):
+        token = jwt_encode({"user_id": "1"})
+
+        # the first key was created, it doesn't sign before its publication
+        self.assertNotIn("kid", jwt.get_unverified_header(token))
+        self.assertEqual(jwt_decode(token), {"user_id": "1"})
+        key = JWTSigningKey.objects.get()
+
+        published = timezone.now() + timedelta(hours=2)
+        with mock.patch("django.utils.timezone.now", return_value=published):
+            token = jwt_encode({"user_id": "1"})
+
+        self.assertEqual(jwt.get_unverified_header(token)["kid"], key.kid)
+        self.assertEqual(jwt_decode(token), {"user_id": "1"})
+
+    def test_secret_key_tokens_are_rejected_after_the_migration(self):
+        with override_settings(JWT_ALGORITHM="HS256"):
+            token = jwt_encode({"user_id": "1"})
+
+        self.assertEqual(jwt_decode(token), {"user_id": "1"})
+        for until in ("2000-01-01T00:00:00Z", None):
+            with self.subTest(until), override_settings(
+                JWT_SECRET_KEY_TOKENS_UNTIL=until
+            ):
+                with self.assertRaises(jwt.InvalidTokenError):
+                    jwt_decode(token)
+
+    @override_settings(JWT_KEYSET_CACHE_TIMEOUT=300)
+    def test_deleted_keys_stop_verifying_once_the_keyset_is_stale(self):
+        jwt_encode({"user_id": "1"})
+        key = JWTSigningKey.objects.get()
+        published = timezone.now() + timedelta(hours=2)
+        with mock.patch("django.utils.timezone.now", return_value=published):
+            token = jwt_encode({"user_id": "1"})
+        key.delete()
+
+        self.assertEqual(jwt_decode(token), {"user_id": "1"})
+        stale = self.keyset.loaded + 301
+        with mock.patch("time.monotonic", return_value=stale):
+            with self.assertRaises(jwt.InvalidTokenError):
+                jwt_decode(token)
+
+
+class RateLimiterTestsMixin:
+    def get_limiter(self, rate, period=60):
+        raise NotImplementedError
+
+    def hit_concurrently(self, limiter, threads=8, hits=25):
+        results = []
+
+        def hit():
+            for _ in range(hits):
+                results.append(limiter.hit("key"))
+
+        workers = [threading.Thread(target=hit) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return results
+
+    def test_hits_over_the_rate_are_rejected_per_key(self):
+        limiter = self.get_limiter(3)
+
+        results = [limiter.hit("key") for _ in range(5)]
+
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertTrue(limiter.hit("other"))
+
+    def test_reset_clears_the_hits_of_the_key(self):
+        limiter = self.get_limiter(2)
+        for _ in range(3):
+            limiter.hit("key")
+
+        limiter.reset("key")
+
+        self.assertTrue(limiter.hit("key"))
+
+    def test_concurrent_hits_cant_exceed_the_rate(self):
+        limiter = self.get_limiter(50)
+
+        results = self.hit_concurrently(limiter)
+
+        self.assertEqual(results.count(True), 50)
+
+
+class LocalRateLimiterTests(RateLimiterTestsMixin, SimpleTestCase):
+    def get_limiter(self, rate, period=60):
+        return LocalRateLimiter(rate, period)
+
+    def test_tokens_are_refilled_over_the_period(self):
+        limiter = self.get_limiter(3, period=60)
+        with mock.patch("time.monotonic", return_value=1000.0):
+            for _ in range(3):
+                limiter.hit("key")
+            self.assertFalse(limiter.hit("key"))
+        with mock.patch("time.monotonic", return_value=1020.0):
+            self.assertEqual([limiter.hit("key") for _ in range(2)], [True, False])
+
+    def test_least_recently_used_keys_are_dropped(self):
+        limiter = LocalRateLimiter(1, 60, max_keys=2)
+        for key in ("first", "second", "third"):
+            limiter.hit(key)
+
+        self.assertEqual(list(limiter._buckets), ["second", "third"])
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "rate-limit": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "rate-limit-tests",
+        },
+    }
+)
+class CacheRateLimiterTests(RateLimiterTestsMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(caches["rate-limit"].clear)
+
+    def get_limiter(self, rate, period=60):
+        return CacheRateLimiter(rate, period, "rate-limit", prefix="tests")
+
+    def test_hits_of_the_previous_window_are_weighted_by_its_overlap(self):
+        limiter = self.get_limiter(4, period=60)
+        with mock.patch("time.time", return_value=6000.0):
+            for _ in range(4):
+                limiter.hit("key")
+        # half of the previous window overlaps the sliding window
+        with mock.patch("time.time", return_value=6090.0):
+            results = [limiter.hit("key") for _ in range(3)]
+
+        self.assertEqual(results, [True, True, False])
+
+    def test_rejected_hit_of_an_expired_counter_isnt_an_error(self):
+        limiter = self.get_limiter(1)
+        limiter.hit("key")
+
+        with mock.patch.object(limiter.cache, "decr", side_effect=ValueError):
+            self.assertFalse(limiter.hit("key"))
+
+
+def spin(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+class ProfilingTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_profile(self, operation="Questions"):
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.operation = operation
+        profiler.start()
+        spin(0.05)
+        profiler.stop()
+        return profiler.write(self.directory)
+
+    def test_samples_are_written_as_collapsed_stacks(self):
+        path = self.write_profile()
+
+        with open(path) as profile_file:
+            lines = profile_file.read().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertTrue(stack.startswith("graphql:Questions;"))
+        self.assertIn(f"{__name__}:spin", stack)
+        self.assertGreater(int(count), 0)
+
+    def test_profiles_written_in_the_same_second_are_kept(self):
+        with mock.patch("time.time", return_value=1600000000.0):
+            paths = {self.write_profile() for _ in range(3)}
+
+        self.assertEqual(len(paths), 3)
+        self.assertEqual(len(os.listdir(self.directory)), 3)
+
+    @override_settings(GRAPHQL_PROFILING_MAX_FILES=2)
+    def test_oldest_profiles_are_removed(self):
+        paths = []
+        for mtime in range(3):
+            paths.append(self.write_profile())
+            os.utime(paths[-1], (mtime, mtime))
+        other_path = os.path.join(self.directory, "notes.txt")
+        open(other_path, "w").close()
+
+        paths.append(self.write_profile())
+
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            sorted(os.path.basename(path) for path in [*paths[2:], other_path]),
+        )
+
+    @override_settings(GRAPHQL_PROFILING_DIRECTORY="profiles")
+    def test_requests_are_profiled_with_a_valid_token(self):
+        factory = RequestFactory()
+        token = create_profiling_token()
+
+        self.assertTrue(is_profiling_token_valid(token))
+        self.assertTrue(
+            should_profile(factory.post("/", HTTP_X_GRAPHQL_PROFILE=token))
+        )
+        self.assertFalse(
+            should_profile(factory.post("/", HTTP_X_GRAPHQL_PROFILE=token + "x"))
+        )
+        self.assertFalse(should_profile(factory.post("/")))
+
+    @override_settings(GRAPHQL_PROFILING_DIRECTORY=None)
+    def test_requests_arent_profiled_without_a_directory(self):
+        request = RequestFactory().post(
+            "/", HTTP_X_GRAPHQL_PROFILE=create_profiling_token()
+        )
+
+        self.assertFalse(should_profile(request))
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.counter = self.registry.counter("errors_total", "Errors.", ("code",))
+        self.histogram = self.registry.histogram(
+            "duration_seconds", "Duration.", ("operation",), buckets=(0.1, 1.0)
+        )
+
+    def test_values_of_finished_threads_are_kept_and_their_threads_forgotten(self):
+        def record():
+            self.counter.inc("invalid")
+            self.histogram.observe(0.5, "Questions")
+
+        for _ in range(10):
+            thread = threading.Thread(target=record)
+            thread.start()
+            thread.join()
+        record()
+
+        self.assertEqual(self.counter.collect(), {("invalid",): [11]})
+        self.assertEqual(len(self.counter._thread_values), 1)
+        self.assertEqual(
+            self.histogram.collect(), {("Questions",): [0, 11, 0, 5.5, 11]}
+        )
+
+    @override_settings(METRICS_DIRECTORY=None)
+    def test_render_returns_the_prometheus_text_format(self):
+        self.counter.inc('quote"d')
+        self.histogram.observe(0.05, "Questions")
+        self.histogram.observe(2, "Questions")
+
+        self.assertEqual(
+            self.registry.render(),
+            "# HELP errors_total Errors.\n"
+            "# TYPE errors_total counter\n"
+            'errors_total{code="quote\\"d"} 1\n'
+            "# HELP duration_seconds Duration.\n"
+            "# TYPE duration_seconds histogram\n"
+            'duration_seconds_bucket{operation="Questions",le="0.1"} 1\n'
+            'duration_seconds_bucket{operation="Questions",le="1.0"} 1\n'
+            'duration_seconds_bucket{operation="Questions",le="+Inf"} 2\n'
+            'duration_seconds_sum{operation="Questions"} 2.05\n'
+            'duration_seconds_count{operation="Questions"} 2\n',
+        )
+
+    def test_host_metrics_merge_the_files_of_the_processes(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, "1.json"), "w") as metrics_file:
+            json.dump({"errors_total": [[["invalid"], [2]]]}, metrics_file)
+        self.counter.inc("invalid")
+
+        with override_settings(METRICS_DIRECTORY=directory):
+            merged = self.registry.collect_host()
+
+        self.assertEqual(merged["errors_total"], {("invalid",): [3]})
+
+    @override_settings(METRICS_MAX_OPERATIONS=2)
+    def test_operation_labels_are_capped(self):
+        with mock.patch.object(metrics, "_operation_labels", set()):
+            labels = [
+                metrics.get_operation_label(name)
+                for name in ["First", "Second", "Third", "First"]
+            ]
+
+        self.assertEqual(labels, ["First", "Second", metrics.OTHER_OPERATION, "First"])
+
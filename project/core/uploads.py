@@ -0,0 +1,580 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .error_codes import UploadErrorCodes
+from .models import FileBlob
+from .rate_limit import get_client_ip
+
+UPLOAD_DIRECTORY = "file_upload"
+UPLOAD_TEMP_DIRECTORY = "file_upload/tmp"
+UPLOAD_SESSIONS_DIRECTORY = "file_upload/sessions"
+UPLOAD_BLOBS_DIRECTORY = "file_upload/blobs"
+
+UPLOAD_ID_REGEX = re.compile(r"^[0-9a-f]{32}$")
+DIGEST_REGEX = re.compile(r"^[0-9a-f]{64}$")
+
+# Bytes of a chunk read from the request and written at once.
+CHUNK_BUFFER_SIZE = 256 * 1024
+# Maximum number of chunked uploads hashed by a process while their chunks are
+# written, the least recently written uploads are hashed again once finished.
+UPLOAD_HASHERS_MAX_SIZE = 1000
+
+
+def get_upload_name(file_name: str) -> str:
+    """Return the storage name of an uploaded file.
+
+    A unique text fragment is added to the file name to prevent file
+    overriding.
+    """
+    file_name, format = os.path.splitext(os.path.basename(file_name))
+    hash = secrets.token_hex(nbytes=4)
+    return f"{UPLOAD_DIRECTORY}/{file_name}_{hash}{format}"
+
+
+class MediaTemporaryUploadedFile(TemporaryUploadedFile):
+    """Temporary uploaded file created in the media storage directory.
+
+    Being on the same filesystem as the final location, the storage saves the
+    file by renaming it instead of copying its content.
+    """
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        directory = default_storage.path(UPLOAD_TEMP_DIRECTORY)
+        os.makedirs(directory, exist_ok=True)
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix=".upload" + ext, dir=directory)
+        super(TemporaryUploadedFile, self).__init__(
+            file, name, content_type, size, charset, content_type_extra
+        )
+
+
+class MediaFileUploadHandler(TemporaryFileUploadHandler):
+    """Stream the uploaded files into the media storage directory."""
+
+    def new_file(self, *args, **kwargs):
+        super(TemporaryFileUploadHandler, self).new_file(*args, **kwargs)
+        self.file = MediaTemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+
+
+class HashingMediaFileUploadHandler(MediaFileUploadHandler):
+    """Stream the uploaded files into the media storage directory and compute
+    the SHA-256 digest of their content while the data is received.
+
+    The digest is set on the `sha256` attribute of the uploaded file, it's
+    installed when `FILE_UPLOAD_CONTENT_ADDRESSED` is enabled.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.hasher.hexdigest()
+        return file
+
+
+def get_file_digest(file) -> str:
+    """Return the SHA-256 digest of the file, computed by the upload handler
+    when the file was streamed to disk.
+    """
+    digest = getattr(file, "sha256", None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    for data in file.chunks():
+        hasher.update(data)
+    file.seek(0)
+    return hasher.hexdigest()
+
+
+def get_blob_name(digest: str) -> str:
+    return f"{UPLOAD_BLOBS_DIRECTORY}/{digest[:2]}/{digest}"
+
+
+def claim_blob(digest: str) -> bool:
+    """Add a reference to the stored blob, return whether it exists."""
+    return bool(
+        FileBlob.objects.filter(digest=digest).update(ref_count=F("ref_count") + 1)
+    )
+
+
+def release_blob(digest: str):
+    """Remove a reference to the blob, unreferenced blobs are deleted by the
+    `collect_file_blobs` command.
+    """
+    FileBlob.objects.filter(digest=digest, ref_count__gt=0).update(
+        ref_count=F("ref_count") - 1
+    )
+
+
+def _add_blob_owner(digest: str, owner) -> bool:
+    """Record the owner as an uploader of the blob, return whether it exists.
+
+    The blob is touched, `collect_file_blobs` keeps the unreferenced blobs
+    during their grace period so the upload can be saved in a model.
+    """
+    blob = FileBlob.objects.filter(digest=digest).first()
+    if blob is None:
+        return False
+    blob.save(update_fields=["modified"])
+    if owner is not None and owner.is_authenticated:
+        blob.owners.add(owner)
+    return True
+
+
+def _register_blob(digest: str, size: int, owner):
+    try:
+        with transaction.atomic():
+            FileBlob.objects.create(digest=digest, size=size)
+    except IntegrityError:
+        # registered concurrently by an upload of the same content
+        pass
+    _add_blob_owner(digest, owner)
+
+
+def _get_blob_path(digest: str) -> str:
+    path = default_storage.path(get_blob_name(digest))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def save_content_addressed(file, owner=None) -> str:
+    """Store the file under the digest of its content and return its name.
+
+    Content that is already stored isn't written again. The uploading user
+    becomes an owner of the blob, the owners can upload it again by its
+    digest.
+    """
+    digest = get_file_digest(file)
+    if _add_blob_owner(digest, owner):
+        return get_blob_name(digest)
+
+    # the content is saved under a temporary name and renamed, so the blob
+    # file is complete even when the same content is saved concurrently
+    temp_name = default_storage.save(f"{UPLOAD_TEMP_DIRECTORY}/{digest}", file)
+    os.replace(default_storage.path(temp_name), _get_blob_path(digest))
+    _register_blob(digest, file.size, owner)
+    return get_blob_name(digest)
+
+
+def move_content_addressed(name: str, owner=None, digest: Optional[str] = None) -> str:
+    """Move a stored file under the digest of its content, return its new name.
+
+    The content is read to compute the digest unless it's given. The file is
+    deleted when the content is already stored.
+    """
+    if digest is None:
+        with default_storage.open(name) as file:
+            digest = get_file_digest(file)
+    size = default_storage.size(name)
+    if _add_blob_owner(digest, owner):
+        default_storage.delete(name)
+        return get_blob_name(digest)
+
+    os.replace(default_storage.path(name), _get_blob_path(digest))
+    _register_blob(digest, size, owner)
+    return get_blob_name(digest)
+
+
+def get_owned_blob_name(digest: str, owner) -> Optional[str]:
+    """Return the name of the blob when the user uploaded its content, the
+    digest alone doesn't prove the possession of the content."""
+    if not DIGEST_REGEX.match(digest or "") or not owner.is_authenticated:
+        return None
+    owned = FileBlob.objects.filter(digest=digest, owners=owner)
+    # touched like an upload of the content
+    if not owned.update(modified=timezone.now()):
+        return None
+    return get_blob_name(digest)
+
+
+def get_blob_digest(name: Optional[str]) -> Optional[str]:
+    """Return the digest of the blob stored under the name, if it's one."""
+    directory, _, digest = (name or "").rpartition("/")
+    if directory.startswith(f"{UPLOAD_BLOBS_DIRECTORY}/") and DIGEST_REGEX.match(
+        digest
+    ):
+        return digest
+    return None
+
+
+def get_upload_owner(request) -> str:
+    """Return the key of the owner of the chunked uploads of the request, the
+    user or, for anonymous requests, the client IP address."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        owner = f"user:{user.pk}"
+    else:
+        owner = f"ip:{get_client_ip(request)}"
+    return hashlib.sha256(owner.encode()).hexdigest()[:32]
+
+
+class UploadHasher:
+    """SHA-256 digest of the first `offset` bytes of a chunked upload."""
+
+    def __init__(self):
+        self.id = secrets.token_hex(8)
+        self.offset = 0
+        self.sha256 = hashlib.sha256()
+
+    def update(self, data: bytes):
+        self.sha256.update(data)
+        self.offset += len(data)
+
+
+_upload_hashers: "OrderedDict[str, UploadHasher]" = OrderedDict()
+_upload_hashers_lock = threading.Lock()
+
+
+def _pop_upload_hasher(upload_id: str) -> Optional[UploadHasher]:
+    with _upload_hashers_lock:
+        return _upload_hashers.pop(upload_id, None)
+
+
+def _keep_upload_hasher(upload_id: str, hasher: UploadHasher):
+    with _upload_hashers_lock:
+        _upload_hashers[upload_id] = hasher
+        while len(_upload_hashers) > UPLOAD_HASHERS_MAX_SIZE:
+            _upload_hashers.popitem(last=False)
+
+
+class ChunkedUpload:
+    """File uploaded in chunks written straight to its final location.
+
+    The file is allocated with its full size when the upload starts and every
+    chunk is streamed at its offset. The upload state is stored next to the
+    files, in a directory per owner, so an interrupted upload can be resumed
+    from `offset` by any worker of the host. The uploads of an owner can't
+    reserve more than `FILE_UPLOAD_QUOTA` bytes, and an upload without chunk
+    for `FILE_UPLOAD_SESSION_TTL` seconds expires.
+
+    With the content addressed storage, the chunks written in order by a
+    process are hashed while they are written. The state keeps the id of the
+    hasher of the last chunk, a chunk written without it, e.g. by another
+    worker, invalidates it and the file is hashed again when finished.
+    """
+
+    def __init__(
+        self,
+        id: str,
+        owner: str,
+        name: str,
+        size: int,
+        content_type: Optional[str] = None,
+        offset: int = 0,
+        updated: Optional[float] = None,
+        hasher: Optional[str] = None,
+    ):
+        self.id = id
+        self.owner = owner
+        self.name = name
+        self.size = size
+        self.content_type = content_type
+        self.offset = offset
+        self.updated = updated
+        self.hasher = hasher
+
+    @property
+    def completed(self) -> bool:
+        return self.offset == self.size
+
+    @property
+    def expired(self) -> bool:
+        return time.time() - self.updated > settings.FILE_UPLOAD_SESSION_TTL
+
+    @staticmethod
+    def _owner_directory(owner: str) -> str:
+        return default_storage.path(f"{UPLOAD_SESSIONS_DIRECTORY}/{owner}")
+
+    @classmethod
+    def _state_path(cls, upload_id: str, owner: str) -> str:
+        return os.path.join(cls._owner_directory(owner), f"{upload_id}.json")
+
+    def _save_state(self):
+        self.updated = time.time()
+        path = self._state_path(self.id, self.owner)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as state_file:
+            json.dump(
+                {
+                    "name": self.name,
+                    "size": self.size,
+                    "content_type": self.content_type,
+                    "offset": self.offset,
+                    "updated": self.updated,
+                    "hasher": self.hasher,
+                },
+                state_file,
+            )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def _load(cls, upload_id: str, owner: str) -> Optional["ChunkedUpload"]:
+        try:
+            with open(cls._state_path(upload_id, owner)) as state_file:
+                return cls(id=upload_id, owner=owner, **json.load(state_file))
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def list_uploads(cls, owner: str) -> List["ChunkedUpload"]:
+        """Return the uploads of the owner, expired ones included."""
+        try:
+            file_names = os.listdir(cls._owner_directory(owner))
+        except FileNotFoundError:
+            return []
+        uploads = []
+        for file_name in file_names:
+            upload_id, ext = os.path.splitext(file_name)
+            if ext == ".json" and UPLOAD_ID_REGEX.match(upload_id):
+                upload = cls._load(upload_id, owner)
+                if upload is not None:
+                    uploads.append(upload)
+        return uploads
+
+    @classmethod
+    def start(
+        cls,
+        owner: str,
+        file_name: str,
+        size: int,
+        content_type: Optional[str] = None,
+    ):
+        if size < 0 or size > settings.FILE_UPLOAD_MAX_SIZE:
+            raise ValidationError(
+                {
+                    "size": ValidationError(
+                        "File size must be between 0 and "
+                        f"{settings.FILE_UPLOAD_MAX_SIZE} bytes.",
+                        code=UploadErrorCodes.INVALID.value,
+                    )
+                }
+            )
+        owner_directory = cls._owner_directory(owner)
+        os.makedirs(owner_directory, exist_ok=True)
+        os.makedirs(default_storage.path(UPLOAD_DIRECTORY), exist_ok=True)
+
+        with open(os.path.join(owner_directory, ".lock"), "w") as lock_file:
+            # serialize the quota checks of the owner between workers
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            reserved = sum(
+                upload.size for upload in cls.list_uploads(owner) if not upload.expired
+            )
+            if reserved + size > settings.FILE_UPLOAD_QUOTA:
+                raise ValidationError(
+                    {
+                        "size": ValidationError(
+                            "The unfinished uploads can't reserve more than "
+                            f"{settings.FILE_UPLOAD_QUOTA} bytes, "
+                            f"{reserved} bytes are reserved.",
+                            code=UploadErrorCodes.QUOTA_EXCEEDED.value,
+                        )
+                    }
+                )
+            upload = cls(
+                id=secrets.token_hex(16),
+                owner=owner,
+                name=default_storage.get_available_name(get_upload_name(file_name)),
+                size=size,
+                content_type=content_type,
+            )
+            fd = os.open(
+                default_storage.path(upload.name),
+                os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                settings.FILE_UPLOAD_PERMISSIONS or 0o644,
+            )
+            try:
+                if size and hasattr(os, "posix_fallocate"):
+                    os.posix_fallocate(fd, 0, size)
+                else:
+                    os.ftruncate(fd, size)
+            finally:
+                os.close(fd)
+            upload._save_state()
+        return upload
+
+    @classmethod
+    def get(cls, upload_id: str, owner: str) -> "ChunkedUpload":
+        """Return the unexpired upload of the owner, the uploads of the other
+        owners aren't found."""
+        if UPLOAD_ID_REGEX.match(upload_id or ""):
+            upload = cls._load(upload_id, owner)
+            if upload is not None and not upload.expired:
+                return upload
+        raise cls._not_found_error()
+
+    @staticmethod
+    def _not_found_error() -> ValidationError:
+        return ValidationError(
+            {
+                "upload_id": ValidationError(
+                    "Upload with this id doesn't exists.",
+                    code=UploadErrorCodes.NOT_FOUND.value,
+                )
+            }
+        )
+
+    @contextmanager
+    def _locked_file(self):
+        """Open the file of the upload, locked for the process and re-read the
+        state, which other workers may have changed."""
+        try:
+            file = open(default_storage.path(self.name), "r+b")
+        except FileNotFoundError:
+            # deleted with the expired upload
+            raise self._not_found_error()
+        with file:
+            # serialize the chunks of the upload between workers
+            fcntl.flock(file, fcntl.LOCK_EX)
+            current = self.get(self.id, self.owner)
+            self.offset = current.offset
+            self.hasher = current.hasher
+            yield file
+
+    def _take_hasher(self, offset: int) -> Optional[UploadHasher]:
+        """Return the hasher of the data before the offset, if the process
+        hashed it."""
+        if not settings.FILE_UPLOAD_CONTENT_ADDRESSED:
+            return None
+        hasher = _pop_upload_hasher(self.id)
+        if offset == 0:
+            return UploadHasher()
+        if hasher is not None and hasher.id == self.hasher and hasher.offset == offset:
+            return hasher
+        return None
+
+    def write_chunk(self, offset: int, stream, size: int):
+        """Stream `size` bytes read from the stream into the file at the offset.
+
+        The offset can't go past the received data, chunks sent again after a
+        dropped connection overwrite the data at their offset. When the stream
+        ends early, the upload resumes from the received data.
+        """
+        with self._locked_file() as file:
+            if offset < 0 or offset > self.offset:
+                raise ValidationError(
+                    {
+                        "offset": ValidationError(
+                            f"Expected a chunk at offset {self.offset}.",
+                            code=UploadErrorCodes.INVALID_OFFSET.value,
+                        )
+                    }
+                )
+            if size < 0 or offset + size > self.size:
+                raise ValidationError(
+                    {
+                        "chunk": ValidationError(
+                            "Chunk exceeds the size of the file.",
+                            code=UploadErrorCodes.INVALID.value,
+                        )
+                    }
+                )
+            hasher = self._take_hasher(offset)
+            file.seek(offset)
+            written = 0
+            while written < size:
+                data = stream.read(min(CHUNK_BUFFER_SIZE, size - written))
+                if not data:
+                    break
+                file.write(data)
+                if hasher is not None:
+                    hasher.update(data)
+                written += len(data)
+            self.offset = max(self.offset, offset + written)
+            self.hasher = hasher.id if hasher is not None else None
+            self._save_state()
+            if hasher is not None:
+                _keep_upload_hasher(self.id, hasher)
+
+    def finish(self, user=None) -> str:
+        """Complete the upload, return the name of its file. With the content
+        addressed storage, the user becomes an owner of the blob."""
+        with self._locked_file():
+            if not self.completed:
+                raise ValidationError(
+                    {
+                        "upload_id": ValidationError(
+                            f"Upload is incomplete, expected a chunk at offset "
+                            f"{self.offset}.",
+                            code=UploadErrorCodes.INVALID_OFFSET.value,
+                        )
+                    }
+                )
+            os.remove(self._state_path(self.id, self.owner))
+        hasher = _pop_upload_hasher(self.id)
+        if settings.FILE_UPLOAD_CONTENT_ADDRESSED:
+            digest = None
+            if (
+                hasher is not None
+                and hasher.id == self.hasher
+                and hasher.offset == self.size
+            ):
+                digest = hasher.sha256.hexdigest()
+            return move_content_addressed(self.name, user, digest)
+        return self.name
+
+    def delete_expired(self) -> bool:
+        """Delete the upload and its file if it's still expired once locked,
+        return whether it was deleted. Uploads receiving a chunk are kept."""
+        try:
+            file = open(default_storage.path(self.name), "r+b")
+        except FileNotFoundError:
+            file = None
+        try:
+            if file is not None:
+                try:
+                    fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+            current = self._load(self.id, self.owner)
+            if current is None or not current.expired:
+                return False
+            os.remove(self._state_path(self.id, self.owner))
+            if file is not None:
+                os.remove(default_storage.path(self.name))
+            return True
+        finally:
+            if file is not None:
+                file.close()
+
+    @classmethod
+    def delete_expired_uploads(cls) -> int:
+        """Delete the expired uploads of every owner, return their number."""
+        try:
+            owners = os.listdir(default_storage.path(UPLOAD_SESSIONS_DIRECTORY))
+        except FileNotFoundError:
+            return 0
+        deleted = 0
+        for owner in owners:
+            if not UPLOAD_ID_REGEX.match(owner):
+                continue
+            for upload in cls.list_uploads(owner):
+                if upload.expired and upload.delete_expired():
+                    deleted += 1
+        return deleted
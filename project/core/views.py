@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .error_codes import UploadErrorCodes
+from .metrics import registry
+from .rate_limit import get_client_ip
+from .uploads import ChunkedUpload, get_upload_owner
+
+
+def metrics(request):
+    """Return the metrics of the host in the Prometheus text format."""
+    if get_client_ip(request) not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def jwks(request):
+    """Return the public keys verifying the JWT as a JSON Web Key Set."""
+    # PyJWT and cryptography are only imported by the requests using them
+    from .jwt_keys import keyset
+
+    response = JsonResponse(keyset.get_jwks())
+    patch_cache_control(
+        response, public=True, max_age=settings.JWT_KEYSET_CACHE_TIMEOUT
+    )
+    return response
+
+
+def get_upload_errors(error: ValidationError):
+    return [
+        {
+            "field": field,
+            "code": UploadErrorCodes(field_error.code).name,
+            "message": field_error.messages[0],
+        }
+        for field, field_errors in error.error_dict.items()
+        for field_error in field_errors
+    ]
+
+
+@csrf_exempt
+@require_http_methods(["PATCH"])
+def upload_chunk(request, upload_id):
+    """Write the body of the request in a chunked upload, at the offset given
+    by the `Upload-Offset` header.
+
+    The body is streamed into the file of the upload, without the temporary
+    copy of a multipart request. The response is the state of the upload, the
+    next chunk is sent from its `offset`.
+    """
+    # PyJWT is only imported by the requests using it
+    from jwt import PyJWTError
+
+    try:
+        user = authenticate(request=request)
+    except (PyJWTError, ValidationError):
+        # the uploads of an invalid token aren't found
+        user = None
+    if user is not None:
+        request.user = user
+    try:
+        offset = int(request.headers["Upload-Offset"])
+        size = int(request.headers["Content-Length"])
+    except (KeyError, ValueError):
+        error = ValidationError(
+            {
+                "offset": ValidationError(
+                    "The Upload-Offset and Content-Length headers are required.",
+                    code=UploadErrorCodes.REQUIRED.value,
+                )
+            }
+        )
+        return JsonResponse({"errors": get_upload_errors(error)}, status=400)
+
+    try:
+        upload = ChunkedUpload.get(upload_id, get_upload_owner(request))
+        upload.write_chunk(offset, request, size)
+    except ValidationError as error:
+        errors = get_upload_errors(error)
+        not_found = errors[0]["code"] == UploadErrorCodes.NOT_FOUND.name
+        return JsonResponse({"errors": errors}, status=404 if not_found else 400)
+    return JsonResponse(
+        {
+            "id": upload.id,
+            "size": upload.size,
+            "offset": upload.offset,
+            "completed": upload.completed,
+        }
+    )
@@ -0,0 +1,157 @@
+import gc
+import importlib
+import io
+import json
+import logging
+import os
+import pkgutil
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# Packages that aren't used to serve requests.
+WARMUP_SKIPPED_PACKAGES = ("migrations", "management", "tests")
+# Entry points of the servers, they run the warmup.
+WARMUP_SKIPPED_MODULES = ("project.asgi", "project.wsgi")
+
+
+def import_submodules(package_name: str):
+    package = importlib.import_module(package_name)
+    for module_info in pkgutil.walk_packages(package.__path__, f"{package_name}."):
+        parts = module_info.name.split(".")
+        if module_info.name in WARMUP_SKIPPED_MODULES or any(
+            part in WARMUP_SKIPPED_PACKAGES for part in parts
+        ):
+            continue
+        importlib.import_module(module_info.name)
+
+
+def get_warmup_documents(directory):
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith(".graphql"):
+            with open(os.path.join(directory, file_name)) as document_file:
+                yield document_file.read()
+
+
+def warmup():
+    """Load in memory what the workers would otherwise load on their first
+    requests, then freeze the objects of the garbage collector.
+
+    Run in the master of a pre-forking server, the loaded objects are shared
+    by the workers. Frozen objects aren't scanned by the collector anymore,
+    which would write in their pages and copy them into every worker. No
+    database connection is opened, the workers would share it.
+    """
+    from django.conf import settings
+    from django.contrib.auth.password_validation import (
+        get_default_password_validators,
+    )
+    from django.db import connections
+    from django.urls import get_resolver
+    from graphql.error import GraphQLError
+
+    from ..graphql.api import get_schema
+    from ..graphql.core.backend import get_default_backend
+
+    started = time.perf_counter()
+    import_submodules("project")
+    # the schema is built on first use, the introspection compiles its resolvers
+    schema = get_schema()
+    schema.introspect()
+    # the validators are loaded on demand, the common password validator
+    # reads its list of passwords
+    get_default_password_validators()
+    get_resolver().resolve("/graphql/")
+
+    documents = 0
+    if settings.GRAPHQL_WARMUP_DOCUMENTS_DIR:
+        backend = get_default_backend()
+        for document in get_warmup_documents(settings.GRAPHQL_WARMUP_DOCUMENTS_DIR):
+            try:
+                backend.document_from_string(schema, document)
+            except GraphQLError:
+                logger.warning("Invalid warmup document: %s", document)
+                continue
+            documents += 1
+
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
+    logger.info(
+        "Warmed up in %.2f s, %s documents cached, %s objects frozen",
+        time.perf_counter() - started,
+        documents,
+        gc.get_freeze_count(),
+    )
+
+
+def get_unique_memory() -> int:
+    """Return the memory only used by the current process in bytes, 0 when
+    it can't be read."""
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            lines = smaps.readlines()
+    except OSError:
+        return 0
+    unique = 0
+    for line in lines:
+        if line.startswith(("Private_Clean:", "Private_Dirty:")):
+            unique += int(line.split()[1]) * 1024
+    return unique
+
+
+def measure_worker(application, query: str) -> dict:
+    body = json.dumps({"query": query}).encode()
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "PATH_INFO": "/graphql/",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "HTTP_HOST": "localhost",
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.url_scheme": "http",
+        "wsgi.errors": sys.stderr,
+    }
+    started = time.perf_counter()
+    response = application(environ, lambda status, headers: None)
+    b"".join(response)
+    response.close()
+    return {
+        "first_request": time.perf_counter() - started,
+        "unique_memory": get_unique_memory(),
+    }
+
+
+def measure_startup(warm: bool, workers: int, query: str):
+    """Load the WSGI application, fork the workers and print as JSON the
+    startup time, and the time of the first request and the unique memory
+    of every worker.
+
+    It's run in a new interpreter by the `benchmark_startup` command.
+    """
+    started = time.perf_counter()
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+    if warm:
+        warmup()
+    startup = time.perf_counter() - started
+
+    results = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            with os.fdopen(write_fd, "w") as pipe:
+                json.dump(measure_worker(application, query), pipe)
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            results.append(json.load(pipe))
+        os.waitpid(pid, 0)
+    json.dump({"startup": startup, "workers": results}, sys.stdout)
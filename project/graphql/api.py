@@ -1,21 +1,53 @@
+from functools import lru_cache
+
 import graphene
+from django.utils.module_loading import import_string
+
+# Root fields of every schema package. The packages are imported when the
+# schema is first used, not when the URLs are loaded.
+QUERIES = [
+    "project.graphql.core.schema.CoreQueries",
+    "project.graphql.nodes.schema.NodeQueries",
+    "project.graphql.polls.schema.PollsQueries",
+    "project.graphql.users.schema.UsersQueries",
+]
+MUTATIONS = [
+    "project.graphql.core.schema.CoreMutations",
+    "project.graphql.polls.schema.PollsMutations",
+    "project.graphql.users.schema.UsersMutation",
+]
+SUBSCRIPTIONS = [
+    "project.graphql.polls.schema.PollsSubscriptions",
+]
+
+
+ROOT_TYPES = {
+    "Query": QUERIES,
+    "Mutation": MUTATIONS,
+    "Subscription": SUBSCRIPTIONS,
+}
+
+
+@lru_cache(maxsize=None)
+def get_root_type(name: str) -> type:
+    bases = tuple(import_string(path) for path in ROOT_TYPES[name])
+    return type(name, bases, {"__module__": __name__})
+
+
+@lru_cache(maxsize=None)
+def get_schema() -> graphene.Schema:
+    """Return the schema, built on the first call."""
+    return graphene.Schema(
+        query=get_root_type("Query"),
+        mutation=get_root_type("Mutation"),
+        subscription=get_root_type("Subscription"),
+    )
+
 
-from .core.schema import CoreQueries, CoreMutations
-from .polls.schema import PollsQueries, PollsMutations
-from .users.schema import UsersQueries, UsersMutation
-
-class Query(
-    CoreQueries,
-    PollsQueries,
-    UsersQueries
-):
-    pass
-
-class Mutation(
-    CoreMutations,
-    PollsMutations,
-    UsersMutation
-):
-    pass
-
-schema = graphene.Schema(query=Query, mutation=Mutation)
\ No newline at end of file
+def __getattr__(name):
+    # `schema` and its root types are built on first access
+    if name == "schema":
+        return get_schema()
+    if name in ROOT_TYPES:
+        return get_root_type(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
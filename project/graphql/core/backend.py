@@ -0,0 +1,98 @@
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache, partial
+
+from django.conf import settings
+from graphql.backend.cache import GraphQLCachedBackend
+from graphql.backend.core import GraphQLCoreBackend
+from graphql.execution import ExecutionResult, execute
+from graphql.validation import validate
+
+from .query_cost import QueryCostAnalyzer, validate_query_cost
+
+logger = logging.getLogger(__name__)
+
+
+def execute_with_query_cost(schema, document_ast, *args, **kwargs):
+    """Validate the document, reject it when it's too expensive and execute it.
+
+    The computed cost is reported in the `cost` extension of the result.
+    """
+    if kwargs.pop("validate", True):
+        validation_errors = validate(schema, document_ast)
+        if validation_errors:
+            return ExecutionResult(errors=validation_errors, invalid=True)
+
+    operation_name = kwargs.get("operation_name")
+    analyzer = QueryCostAnalyzer(
+        schema, document_ast, variable_values=kwargs.get("variable_values")
+    )
+    query_cost = analyzer.analyze(operation_name)
+    cost_error = validate_query_cost(query_cost)
+    if cost_error:
+        logger.warning(
+            "Rejected operation %s: %s", operation_name or "<anonymous>", cost_error
+        )
+        return ExecutionResult(errors=[cost_error], invalid=True)
+
+    logger.debug(
+        "Executing operation %s with depth %s and cost %s",
+        operation_name or "<anonymous>",
+        query_cost.depth,
+        query_cost.cost,
+    )
+    result = execute(schema, document_ast, *args, **kwargs)
+    if isinstance(result, ExecutionResult):
+        result.extensions["cost"] = query_cost.as_dict()
+    return result
+
+
+class GraphQLQueryCostBackend(GraphQLCoreBackend):
+    """Backend that runs the query cost analysis before the execution."""
+
+    def document_from_string(self, schema, document_string):
+        document = super().document_from_string(schema, document_string)
+        document.execute = partial(
+            execute_with_query_cost,
+            schema,
+            document.document_ast,
+            **self.execute_params,
+        )
+        return document
+
+
+class GraphQLDocumentCacheBackend(GraphQLCachedBackend):
+    """Backend caching the parsed documents of the last `max_size` distinct
+    operations, the least recently used documents are dropped first."""
+
+    def __init__(self, backend, max_size):
+        super().__init__(backend, cache_map=OrderedDict())
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def document_from_string(self, schema, request_string):
+        key = self.get_key_for_schema_and_document_string(schema, request_string)
+        with self._lock:
+            document = self.cache_map.get(key)
+            if document is not None:
+                self.cache_map.move_to_end(key)
+                return document
+
+        document = self.backend.document_from_string(schema, request_string)
+        with self._lock:
+            self.cache_map[key] = document
+            while len(self.cache_map) > self.max_size:
+                self.cache_map.popitem(last=False)
+        return document
+
+
+@lru_cache(maxsize=None)
+def get_default_backend():
+    """Return the backend shared by the views of the process."""
+    backend = GraphQLQueryCostBackend()
+    if settings.GRAPHQL_DOCUMENT_CACHE_SIZE:
+        backend = GraphQLDocumentCacheBackend(
+            backend, settings.GRAPHQL_DOCUMENT_CACHE_SIZE
+        )
+    return backend
@@ -0,0 +1,74 @@
+import datetime
+import json
+import uuid
+from decimal import Decimal
+from typing import Any
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class StdlibJSONEncoder:
+    """Encode the responses with the `json` module of the standard library."""
+
+    @staticmethod
+    def default(value):
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        raise TypeError(
+            f"Object of type {type(value).__name__} is not JSON serializable"
+        )
+
+    def encode(self, data: Any, pretty: bool = False) -> bytes:
+        if pretty:
+            content = json.dumps(
+                data,
+                sort_keys=True,
+                indent=2,
+                separators=(",", ": "),
+                default=self.default,
+            )
+        else:
+            content = json.dumps(data, separators=(",", ":"), default=self.default)
+        return content.encode()
+
+
+class OrjsonEncoder:
+    """Encode the responses with orjson.
+
+    orjson serializes straight to bytes and converts `uuid.UUID` and
+    `datetime` values natively, without calling back into Python.
+    """
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("OrjsonEncoder requires the orjson package.")
+
+    @staticmethod
+    def default(value):
+        if isinstance(value, Decimal):
+            return str(value)
+        raise TypeError
+
+    def encode(self, data: Any, pretty: bool = False) -> bytes:
+        option = orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS if pretty else None
+        return orjson.dumps(data, default=self.default, option=option)
+
+
+def get_json_encoder():
+    """Return the encoder set in `GRAPHQL_JSON_ENCODER`, by default orjson
+    when it's installed and the standard library otherwise."""
+    if settings.GRAPHQL_JSON_ENCODER:
+        return import_string(settings.GRAPHQL_JSON_ENCODER)()
+    if orjson is not None:
+        return OrjsonEncoder()
+    return StdlibJSONEncoder()
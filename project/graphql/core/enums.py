@@ -2,10 +2,25 @@ import graphene
 
 from ...core.error_codes import UploadErrorCodes
 from ...polls.error_codes import ChoiceErrorCodes, QuestionErrorCodes
+from ...polls.trending import TrendingWindow
 from ...users.error_codes import UserErrorCodes
 
 
+class OrderDirection(graphene.Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+    @property
+    def description(self):
+        if self == OrderDirection.ASC:
+            return "Ascending order, the lowest values first."
+        return "Descending order, the highest values first."
+
+
 UploadErrorCode = graphene.Enum.from_enum(UploadErrorCodes)
 QuestionErrorCode = graphene.Enum.from_enum(QuestionErrorCodes)
 ChoiceErrorCode = graphene.Enum.from_enum(ChoiceErrorCodes)
-UserErrorCode = graphene.Enum.from_enum(UserErrorCodes)
\ No newline at end of file
+UserErrorCode = graphene.Enum.from_enum(UserErrorCodes)
+TrendingWindowEnum = graphene.Enum.from_enum(
+    TrendingWindow, description="Window of the votes of the trending questions."
+)
@@ -0,0 +1,88 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from django.db.models import Model
+
+IDENTITY_MAP_ATTRIBUTE = "identity_map"
+
+
+class IdentityMap:
+    """Keep a single instance per database row for the duration of a request.
+
+    Lookups consult the map before querying the database, `hits` counts the
+    queries saved by the map and `misses` the queries it had to run.
+    """
+
+    def __init__(self):
+        self._instances: Dict[Tuple[str, Any], Model] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(model: Type[Model], pk) -> Tuple[str, Any]:
+        opts = model._meta.concrete_model._meta
+        return opts.label, opts.pk.to_python(pk)
+
+    def get(self, model: Type[Model], pk) -> Optional[Model]:
+        return self._instances.get(self._key(model, pk))
+
+    def add(self, instance: Model) -> Model:
+        """Store the instance, return the one already stored for its row."""
+        key = self._key(type(instance), instance.pk)
+        return self._instances.setdefault(key, instance)
+
+    def add_all(self, instances: Iterable[Model]) -> List[Model]:
+        return [self.add(instance) for instance in instances]
+
+    def remove(self, instance: Model):
+        self._instances.pop(self._key(type(instance), instance.pk), None)
+
+    def clear(self):
+        self._instances.clear()
+
+    def get_or_fetch(self, model: Type[Model], pk) -> Optional[Model]:
+        """Return the instance of the row, query it when it's not stored yet."""
+        instance = self.get(model, pk)
+        if instance is not None:
+            self.hits += 1
+            return instance
+        self.misses += 1
+        instance = model.objects.filter(pk=pk).first()
+        if instance is not None:
+            instance = self.add(instance)
+        return instance
+
+    def get_or_fetch_many(self, model: Type[Model], pks: Iterable) -> List[Model]:
+        """Return the instances of the rows, missing rows are queried at once."""
+        instances, missing_pks = [], []
+        for pk in pks:
+            instance = self.get(model, pk)
+            if instance is not None:
+                instances.append(instance)
+            else:
+                missing_pks.append(pk)
+
+        if not missing_pks:
+            self.hits += 1
+            return instances
+        self.misses += 1
+        fetched = self.add_all(model.objects.filter(pk__in=missing_pks))
+        return instances + fetched
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._instances)}
+
+
+def get_identity_map(context) -> IdentityMap:
+    """Return the identity map of the request, create it on first use.
+
+    The map is stored on the request, so it's discarded with it. Contexts that
+    don't accept attributes get a new map on every call.
+    """
+    identity_map = getattr(context, IDENTITY_MAP_ATTRIBUTE, None)
+    if identity_map is None:
+        identity_map = IdentityMap()
+        try:
+            setattr(context, IDENTITY_MAP_ATTRIBUTE, identity_map)
+        except AttributeError:
+            pass
+    return identity_map
@@ -0,0 +1,103 @@
+import time
+from functools import partial
+
+from django.db.models import QuerySet
+
+from ...core.metrics import (
+    METRICS_OPERATION_ATTRIBUTE,
+    METRICS_SAMPLED_ATTRIBUTE,
+    errors_total,
+    field_duration,
+    get_operation_label,
+)
+from ...core.profiling import PROFILER_ATTRIBUTE
+from .query_tracing import get_current_trace
+
+
+def get_operation_name(info) -> str:
+    operation = info.operation
+    return operation.name.value if operation.name else "anonymous"
+
+
+def record_errors(operation, payload):
+    """Count the errors of the `Error` types returned by a mutation."""
+    for error in getattr(payload, "errors", None) or ():
+        code = getattr(error, "code", None)
+        errors_total.inc(operation, str(getattr(code, "value", code)))
+    return payload
+
+
+def record_exception(operation, error):
+    extensions = getattr(error, "extensions", None) or {}
+    errors_total.inc(operation, extensions.get("code") or type(error).__name__)
+
+
+class MetricsMiddleware:
+    """Measure the resolvers of the requests sampled by the Django
+    `MetricsMiddleware` and count the errors of the root fields."""
+
+    def resolve(self, next, root, info, **kwargs):
+        request = info.context
+        is_root_field = len(info.path) == 1
+        if is_root_field:
+            operation = get_operation_label(get_operation_name(info))
+            setattr(request, METRICS_OPERATION_ATTRIBUTE, operation)
+
+        if getattr(request, METRICS_SAMPLED_ATTRIBUTE, False):
+            started = time.perf_counter()
+            result = next(root, info, **kwargs)
+            field_duration.observe(
+                time.perf_counter() - started,
+                f"{info.parent_type.name}.{info.field_name}",
+            )
+        else:
+            result = next(root, info, **kwargs)
+
+        if is_root_field:
+            # the resolvers are synchronous, the promise is already settled
+            if result.is_rejected:
+                record_exception(operation, result.reason)
+                return result
+            return result.then(partial(record_errors, operation))
+        return result
+
+
+class QueryTracingMiddleware:
+    """Attribute the queries of the traced operations to the resolver that
+    issued them, see `query_tracing.trace_queries`."""
+
+    def resolve(self, next, root, info, **kwargs):
+        trace = get_current_trace()
+        if trace is None:
+            return next(root, info, **kwargs)
+
+        if trace.operation is None:
+            trace.operation = get_operation_name(info)
+        trace.field_stack.append(f"{info.parent_type.name}.{info.field_name}")
+        try:
+            result = next(root, info, **kwargs)
+            # querysets are evaluated when the value of the field is completed,
+            # evaluate them while the resolver is on the stack
+            if result.is_fulfilled and isinstance(result.get(), QuerySet):
+                len(result.get())
+            return result
+        finally:
+            trace.field_stack.pop()
+
+
+class ProfilingMiddleware:
+    """Tell the profiler of the request which resolver is executed.
+
+    The middleware is only added to the profiled requests.
+    """
+
+    def resolve(self, next, root, info, **kwargs):
+        profiler = getattr(info.context, PROFILER_ATTRIBUTE)
+        if profiler.operation is None:
+            profiler.operation = get_operation_name(info)
+        path = ".".join(key for key in info.path if isinstance(key, str))
+        profiler.resolver_paths.append(path)
+        try:
+            return next(root, info, **kwargs)
+        finally:
+            profiler.resolver_paths.pop()
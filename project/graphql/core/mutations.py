@@ -1,9 +1,7 @@
-import os
-import secrets
-
 from itertools import chain
 from typing import Iterable, Tuple, Union
 
+from django.conf import settings
 from django.core.files.storage import default_storage
 from django.core.exceptions import (
     ImproperlyConfigured,
@@ -14,9 +12,18 @@ from django.db.models.fields.files import FileField
 import graphene
 from graphene.types.mutation import MutationOptions
 
+from ...core.error_codes import UploadErrorCodes
 from ...core.exceptions import PermissionDenied
+from ...core.uploads import (
+    ChunkedUpload,
+    get_owned_blob_name,
+    get_upload_name,
+    get_upload_owner,
+    save_content_addressed,
+)
+from .identity_map import get_identity_map
 from .types.errors import UploadError
-from .types import File, Upload
+from .types import BigInt, ChunkedFileUpload, File, Upload
 from .handle_errors import get_error_fields, validation_error_to_error_type
 
 
@@ -77,7 +84,7 @@ class BaseMutation(graphene.Mutation):
 
     @classmethod
     def get_instance_or_error(cls, info, id, model, field):
-        instance = model.objects.filter(pk=id).first()
+        instance = get_identity_map(info.context).get_or_fetch(model, id)
         if not instance:
             raise ValidationError(
                 {
@@ -90,7 +97,7 @@ class BaseMutation(graphene.Mutation):
 
     @classmethod
     def get_instances_or_error(cls, info, ids, model, field):
-        instances = list(model.objects.filter(pk__in=ids))
+        instances = get_identity_map(info.context).get_or_fetch_many(model, ids)
         if not instances:
             raise ValidationError(
                 {
@@ -370,9 +377,18 @@ class ModelMutation(BaseMutation):
         instance = cls.get_instance(info, **data)
         data = data.get("input")
         cleaned_input = cls.clean_input(info, instance, data)
-        instance = cls.construct_instance(instance, cleaned_input)
-        cls.clean_instance(info, instance)
-        cls.save(info, instance, cleaned_input)
+        identity_map = get_identity_map(info.context)
+        try:
+            instance = cls.construct_instance(instance, cleaned_input)
+            cls.clean_instance(info, instance)
+            cls.save(info, instance, cleaned_input)
+        except Exception:
+            # the stored instance was modified in place, the next lookups
+            # of the request reload the row instead of the unsaved values
+            if not instance._state.adding:
+                identity_map.remove(instance)
+            raise
+        identity_map.add(instance)
         cls._save_m2m(info, instance, cleaned_input)
         cls.post_save_action(info, instance, cleaned_input)
         return cls.success_response(instance)
@@ -405,6 +421,8 @@ class ModelDeleteMutation(ModelMutation):
 
         db_id = instance.id
         instance.delete()
+        # the deletion can cascade to other rows, forget every stored instance
+        get_identity_map(info.context).clear()
 
         # After the instance is deleted, set its ID to the original database's
         # ID so that the success response contains ID of the deleted object.
@@ -502,6 +520,7 @@ class BaseBulkMutation(BaseMutation):
         if count:
             qs = instance_model.objects.filter(pk__in=clean_instance_ids)
             cls.bulk_action(info=info, queryset=qs, **data)
+            get_identity_map(info.context).clear()
         return count, errors
 
     @classmethod
@@ -544,14 +563,141 @@ class FileUpload(BaseMutation):
     @classmethod
     def perform_mutation(cls, _root, info, **data):
         file_data = info.context.FILES.get(data["file"])
-
-        # add unique text fragment to the file name to prevent file overriding
-        file_name, format = os.path.splitext(file_data._name)
-        hash = secrets.token_hex(nbytes=4)
-        new_name = f"file_upload/{file_name}_{hash}{format}"
-
-        path = default_storage.save(new_name, file_data.file)
+        if settings.FILE_UPLOAD_CONTENT_ADDRESSED:
+            path = save_content_addressed(file_data, info.context.user)
+        else:
+            new_name = get_upload_name(file_data._name)
+            # files streamed to disk by the upload handlers are moved, not copied
+            path = default_storage.save(new_name, file_data)
 
         return FileUpload(
             uploaded_file=File(url=path, content_type=file_data.content_type)
-        )
\ No newline at end of file
+        )
+
+
+class FileUploadStart(BaseMutation):
+    upload = graphene.Field(ChunkedFileUpload)
+
+    class Arguments:
+        file_name = graphene.String(required=True, description="Name of the file.")
+        size = BigInt(required=True, description="Size of the file in bytes.")
+        content_type = graphene.String(description="Content type of the file.")
+
+    class Meta:
+        description = (
+            "Start a chunked upload of a file. The chunks are sent with "
+            "`fileUploadChunk`, or as the body of a `PATCH /uploads/<id>` request "
+            "with an `Upload-Offset` header, and the upload is completed by "
+            "`fileUploadFinish`. The size of the unfinished uploads of a user is "
+            "limited and they expire some time after their last chunk."
+        )
+        error_type_class = UploadError
+
+    @classmethod
+    def perform_mutation(cls, _root, info, **data):
+        upload = ChunkedUpload.start(
+            get_upload_owner(info.context),
+            data["file_name"],
+            data["size"],
+            data.get("content_type"),
+        )
+        return FileUploadStart(upload=upload)
+
+
+class FileUploadChunk(BaseMutation):
+    upload = graphene.Field(ChunkedFileUpload)
+
+    class Arguments:
+        upload_id = graphene.String(required=True, description="ID of the upload.")
+        offset = BigInt(
+            required=True, description="Offset of the chunk in the file, in bytes."
+        )
+        chunk = Upload(
+            required=True, description="Represents a chunk in a multipart request."
+        )
+
+    class Meta:
+        description = (
+            "Upload a chunk of a file. This mutation must be sent as a `multipart` "
+            "request, `PATCH /uploads/<id>` streams the chunk without copying the "
+            "multipart request. After an interruption, the upload resumes from the "
+            "`offset` returned by the `fileUpload` query."
+        )
+        error_type_class = UploadError
+
+    @classmethod
+    def perform_mutation(cls, _root, info, **data):
+        upload = ChunkedUpload.get(
+            data["upload_id"], get_upload_owner(info.context)
+        )
+        chunk = info.context.FILES.get(data["chunk"])
+        if chunk is None:
+            raise ValidationError(
+                {
+                    "chunk": ValidationError(
+                        "Missing chunk in the multipart request.",
+                        code=UploadErrorCodes.REQUIRED.value,
+                    )
+                }
+            )
+        upload.write_chunk(data["offset"], chunk, chunk.size)
+        return FileUploadChunk(upload=upload)
+
+
+class FileUploadFinish(BaseMutation):
+    uploaded_file = graphene.Field(File)
+
+    class Arguments:
+        upload_id = graphene.String(required=True, description="ID of the upload.")
+
+    class Meta:
+        description = "Complete a chunked upload once all the chunks were received."
+        error_type_class = UploadError
+
+    @classmethod
+    def perform_mutation(cls, _root, info, **data):
+        upload = ChunkedUpload.get(
+            data["upload_id"], get_upload_owner(info.context)
+        )
+        path = upload.finish(info.context.user)
+        return FileUploadFinish(
+            uploaded_file=File(url=path, content_type=upload.content_type)
+        )
+
+
+class FileUploadByDigest(BaseMutation):
+    uploaded_file = graphene.Field(File)
+
+    class Arguments:
+        digest = graphene.String(
+            required=True, description="SHA-256 digest of the file, in hex."
+        )
+        content_type = graphene.String(description="Content type of the file.")
+
+    class Meta:
+        description = (
+            "Upload again a file uploaded before by the user without sending its "
+            "content. Use the `fileBlob` query to check if the content is stored. "
+            "Requires an authenticated user."
+        )
+        error_type_class = UploadError
+
+    @classmethod
+    def check_permissions(cls, context, permissions=None):
+        return context.user.is_authenticated
+
+    @classmethod
+    def perform_mutation(cls, _root, info, **data):
+        path = get_owned_blob_name(data["digest"].lower(), info.context.user)
+        if not path:
+            raise ValidationError(
+                {
+                    "digest": ValidationError(
+                        "File with this digest doesn't exists.",
+                        code=UploadErrorCodes.NOT_FOUND.value,
+                    )
+                }
+            )
+        return FileUploadByDigest(
+            uploaded_file=File(url=path, content_type=data.get("content_type"))
+        )
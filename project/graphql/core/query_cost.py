@@ -0,0 +1,259 @@
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from graphql.error import GraphQLError
+from graphql.language import ast
+from graphql.type.definition import (
+    GraphQLInterfaceType,
+    GraphQLList,
+    GraphQLNonNull,
+    GraphQLObjectType,
+    get_named_type,
+)
+
+from ...core.error_codes import QueryErrorCodes
+from .utils.common import snake_to_camel_case
+
+# Arguments that limit the size of a list field, the first one found in the
+# field arguments is used as the list multiplier.
+PAGINATION_ARGUMENTS = ("first", "last", "limit")
+# List arguments whose length is the size of the list field, e.g. `ids`.
+LIST_SIZE_ARGUMENTS = ("ids",)
+
+# Default weight of a field that returns an object or a list of objects,
+# scalar fields are free unless they declare their own cost.
+DEFAULT_COMPOSITE_FIELD_COST = 1
+DEFAULT_LEAF_FIELD_COST = 0
+
+
+class QueryCost:
+    def __init__(self, depth: int = 0, cost: int = 0):
+        self.depth = depth
+        self.cost = cost
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"depth": self.depth, "cost": self.cost}
+
+
+class QueryCostAnalyzer:
+    """Compute the depth and the cost of an operation from its AST.
+
+    The cost of a field is its weight plus the cost of its selection set. For
+    list fields the cost of the selection set is multiplied by the size of
+    the list, taken from the pagination arguments of the field or from
+    `GRAPHQL_QUERY_DEFAULT_LIST_SIZE` when the list is unbounded.
+    """
+
+    def __init__(
+        self,
+        schema,
+        document_ast: ast.Document,
+        variable_values: Optional[Dict[str, Any]] = None,
+        default_list_size: Optional[int] = None,
+    ):
+        self.schema = schema
+        self.document_ast = document_ast
+        self.variable_values = variable_values or {}
+        if default_list_size is None:
+            default_list_size = settings.GRAPHQL_QUERY_DEFAULT_LIST_SIZE
+        self.default_list_size = default_list_size
+        self.variable_defaults: Dict[str, Any] = {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document_ast.definitions
+            if isinstance(definition, ast.FragmentDefinition)
+        }
+
+    def get_operation(self, operation_name: Optional[str] = None):
+        for definition in self.document_ast.definitions:
+            if not isinstance(definition, ast.OperationDefinition):
+                continue
+            if not operation_name or (
+                definition.name and definition.name.value == operation_name
+            ):
+                return definition
+        return None
+
+    def get_root_type(self, operation):
+        if operation.operation == "mutation":
+            return self.schema.get_mutation_type()
+        if operation.operation == "subscription":
+            return self.schema.get_subscription_type()
+        return self.schema.get_query_type()
+
+    def analyze(self, operation_name: Optional[str] = None) -> QueryCost:
+        operation = self.get_operation(operation_name)
+        if operation is None:
+            return QueryCost()
+        # the variables missing from the request take the default value declared
+        # by the operation
+        self.variable_defaults = {
+            definition.variable.name.value: definition.default_value
+            for definition in operation.variable_definitions or []
+            if definition.default_value is not None
+        }
+        root_type = self.get_root_type(operation)
+        depth, cost = self.analyze_selection_set(
+            root_type, operation.selection_set, set()
+        )
+        return QueryCost(depth=depth, cost=cost)
+
+    def analyze_selection_set(self, parent_type, selection_set, visited_fragments):
+        """Return the depth and the cost of the selection set."""
+        depth, cost = 0, 0
+        if selection_set is None:
+            return depth, cost
+
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                field_depth, field_cost = self.analyze_field(parent_type, selection)
+                depth = max(depth, field_depth + 1)
+                cost += field_cost
+                continue
+
+            if isinstance(selection, ast.FragmentSpread):
+                fragment_name = selection.name.value
+                # fragment cycles are rejected by the validation, the check only
+                # protects the analyzer from unvalidated documents
+                if fragment_name in visited_fragments:
+                    continue
+                fragment = self.fragments.get(fragment_name)
+                if fragment is None:
+                    continue
+                fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                fragment_depth, fragment_cost = self.analyze_selection_set(
+                    fragment_type,
+                    fragment.selection_set,
+                    visited_fragments | {fragment_name},
+                )
+            elif isinstance(selection, ast.InlineFragment):
+                fragment_type = parent_type
+                if selection.type_condition:
+                    fragment_type = self.schema.get_type(
+                        selection.type_condition.name.value
+                    )
+                fragment_depth, fragment_cost = self.analyze_selection_set(
+                    fragment_type, selection.selection_set, visited_fragments
+                )
+            else:
+                continue
+            depth = max(depth, fragment_depth)
+            cost += fragment_cost
+        return depth, cost
+
+    def analyze_field(self, parent_type, field_node: ast.Field):
+        """Return the depth and the cost of the field selection."""
+        field_name = field_node.name.value
+        # introspection is not executed by the resolvers
+        if field_name.startswith("__"):
+            return 0, 0
+
+        if not isinstance(parent_type, (GraphQLObjectType, GraphQLInterfaceType)):
+            return 0, 0
+        field = parent_type.fields.get(field_name)
+        if field is None:
+            return 0, 0
+
+        field_type = get_named_type(field.type)
+        depth, children_cost = self.analyze_selection_set(
+            field_type, field_node.selection_set, set()
+        )
+        weight = self.get_field_weight(parent_type, field_name, field_node)
+        multiplier = 1
+        if self.is_list_type(field.type):
+            multiplier = self.get_list_size(field_node)
+        return depth, weight + multiplier * children_cost
+
+    def get_field_weight(self, parent_type, field_name: str, field_node: ast.Field):
+        graphene_type = getattr(parent_type, "graphene_type", None)
+        field_costs = getattr(getattr(graphene_type, "_meta", None), "field_costs", None)
+        if field_costs:
+            for name, weight in field_costs.items():
+                if snake_to_camel_case(name) == field_name:
+                    return weight
+        if field_node.selection_set is None:
+            return DEFAULT_LEAF_FIELD_COST
+        return DEFAULT_COMPOSITE_FIELD_COST
+
+    def get_list_size(self, field_node: ast.Field) -> int:
+        arguments = {
+            argument.name.value: argument.value for argument in field_node.arguments
+        }
+        for argument_name in PAGINATION_ARGUMENTS:
+            value = self.get_argument_value(arguments.get(argument_name))
+            if value is not None:
+                return max(value, 0)
+        for argument_name in LIST_SIZE_ARGUMENTS:
+            value = self.get_list_argument_length(arguments.get(argument_name))
+            if value is not None:
+                return value
+        return self.default_list_size
+
+    def get_variable_value(self, value_node):
+        """Return the value of the variable or the node of its default value."""
+        name = value_node.name.value
+        if name in self.variable_values:
+            return self.variable_values[name]
+        return self.variable_defaults.get(name)
+
+    def get_list_argument_length(self, value_node) -> Optional[int]:
+        if isinstance(value_node, ast.Variable):
+            value_node = self.get_variable_value(value_node)
+            if isinstance(value_node, (list, tuple)):
+                return len(value_node)
+        if isinstance(value_node, ast.ListValue):
+            return len(value_node.values)
+        return None
+
+    def get_argument_value(self, value_node) -> Optional[int]:
+        value = value_node
+        if isinstance(value_node, ast.Variable):
+            value = self.get_variable_value(value_node)
+        if isinstance(value, ast.IntValue):
+            value = value.value
+        elif isinstance(value, ast.Node):
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def is_list_type(field_type) -> bool:
+        if isinstance(field_type, GraphQLNonNull):
+            field_type = field_type.of_type
+        return isinstance(field_type, GraphQLList)
+
+
+def validate_query_cost(
+    query_cost: QueryCost,
+    max_depth: Optional[int] = None,
+    max_cost: Optional[int] = None,
+) -> Optional[GraphQLError]:
+    """Return an error when the query exceeds the depth or the cost limits."""
+    if max_depth is None:
+        max_depth = settings.GRAPHQL_QUERY_MAX_DEPTH
+    if max_cost is None:
+        max_cost = settings.GRAPHQL_QUERY_MAX_COST
+
+    if max_depth and query_cost.depth > max_depth:
+        return GraphQLError(
+            f"Query depth of {query_cost.depth} exceeds the maximum allowed "
+            f"depth of {max_depth}.",
+            extensions={
+                "code": QueryErrorCodes.QUERY_TOO_DEEP.value,
+                "depth": query_cost.depth,
+                "maxDepth": max_depth,
+            },
+        )
+    if max_cost and query_cost.cost > max_cost:
+        return GraphQLError(
+            f"Query cost of {query_cost.cost} exceeds the maximum allowed "
+            f"cost of {max_cost}.",
+            extensions={
+                "code": QueryErrorCodes.QUERY_TOO_COMPLEX.value,
+                "cost": query_cost.cost,
+                "maxCost": max_cost,
+            },
+        )
+    return None
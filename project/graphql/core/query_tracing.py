@@ -0,0 +1,147 @@
+import logging
+import random
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+# Request attribute holding the trace of the executed operation.
+QUERY_TRACE_ATTRIBUTE = "query_trace"
+# Field the queries issued outside of the resolvers are reported under.
+ROOT_FIELD = "<root>"
+
+SQL_LITERAL_REGEX = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+SQL_PLACEHOLDER_LIST_REGEX = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+WHITESPACE_REGEX = re.compile(r"\s+")
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict tracing mode by operations over their query budget."""
+
+
+def fingerprint_sql(sql: str) -> str:
+    """Return the statement with its literal values and lists of values
+    replaced, so statements that only differ by parameters are equal."""
+    sql = SQL_LITERAL_REGEX.sub("%s", sql)
+    sql = SQL_PLACEHOLDER_LIST_REGEX.sub("(...)", sql)
+    return WHITESPACE_REGEX.sub(" ", sql).strip()
+
+
+class QueryTrace:
+    """Execute wrapper recording the fingerprint of the executed statements
+    with the `Type.field` whose resolver issued them.
+
+    The resolver being executed is maintained by the
+    `QueryTracingMiddleware` of the schema.
+    """
+
+    def __init__(self):
+        self.operation: Optional[str] = None
+        self.field_stack: List[str] = []
+        self.queries: List[tuple] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        field = self.field_stack[-1] if self.field_stack else ROOT_FIELD
+        self.queries.append((field, fingerprint_sql(sql)))
+        return execute(sql, params, many, context)
+
+    @property
+    def query_count(self) -> int:
+        return len(self.queries)
+
+    def get_repeated_queries(self, threshold: Optional[int] = None) -> List[Dict]:
+        """Return the statements issued at least `threshold` times by the
+        same resolver, the usual sign of an N+1 query."""
+        if threshold is None:
+            threshold = settings.GRAPHQL_N_PLUS_ONE_THRESHOLD
+        counts = Counter(self.queries)
+        return [
+            {"field": field, "fingerprint": fingerprint, "count": count}
+            for (field, fingerprint), count in counts.most_common()
+            if count >= threshold
+        ]
+
+    def get_query_budget(self) -> Optional[int]:
+        return settings.GRAPHQL_QUERY_BUDGETS.get(self.operation)
+
+    def check_budget(self, budget: Optional[int] = None):
+        """Raise `QueryBudgetExceeded` when the operation issued more queries
+        than its budget, by default the one declared in `GRAPHQL_QUERY_BUDGETS`.
+        """
+        if budget is None:
+            budget = self.get_query_budget()
+        if budget is not None and self.query_count > budget:
+            raise QueryBudgetExceeded(
+                f"Operation {self.operation} issued {self.query_count} queries, "
+                f"its budget is {budget}. Repeated queries: "
+                f"{self.get_repeated_queries()}"
+            )
+
+    def as_dict(self) -> Dict:
+        return {
+            "operation": self.operation,
+            "queries": self.query_count,
+            "budget": self.get_query_budget(),
+            "repeatedQueries": self.get_repeated_queries(),
+        }
+
+
+def get_current_trace() -> Optional[QueryTrace]:
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def trace_queries(using=DEFAULT_DB_ALIAS):
+    """Trace the queries of the GraphQL operations executed in the block.
+
+    Tests can check the queries of an operation with:
+
+        with trace_queries() as trace:
+            schema.execute(
+                query, context_value=request, middleware=[QueryTracingMiddleware()]
+            )
+        trace.check_budget(2)
+    """
+    trace = QueryTrace()
+    previous = get_current_trace()
+    _local.trace = trace
+    try:
+        with connections[using].execute_wrapper(trace):
+            yield trace
+    finally:
+        _local.trace = previous
+
+
+def should_trace_queries() -> bool:
+    mode = settings.GRAPHQL_QUERY_TRACING
+    if mode == "strict":
+        return True
+    if mode == "sample":
+        return random.random() < settings.GRAPHQL_QUERY_TRACING_SAMPLE_RATE
+    return False
+
+
+def report_query_trace(trace: QueryTrace):
+    """Log the operations with repeated queries or over their budget, in
+    strict mode the operations over their budget raise an error."""
+    repeated_queries = trace.get_repeated_queries()
+    budget = trace.get_query_budget()
+    over_budget = budget is not None and trace.query_count > budget
+    if repeated_queries or over_budget:
+        logger.warning(
+            "Operation %s issued %s queries (budget %s), repeated queries: %s",
+            trace.operation,
+            trace.query_count,
+            budget,
+            repeated_queries,
+        )
+    if settings.GRAPHQL_QUERY_TRACING == "strict":
+        trace.check_budget()
@@ -1,6 +1,16 @@
 import graphene
+from django.core.exceptions import ValidationError
 
-from .mutations import FileUpload
+from ...core.exceptions import PermissionDenied
+from ...core.uploads import ChunkedUpload, get_owned_blob_name, get_upload_owner
+from .mutations import (
+    FileUpload,
+    FileUploadByDigest,
+    FileUploadChunk,
+    FileUploadFinish,
+    FileUploadStart,
+)
+from .types import ChunkedFileUpload, File
 
 
 class CoreQueries(graphene.ObjectType):
@@ -8,9 +18,43 @@ class CoreQueries(graphene.ObjectType):
         description="List of all tax rates available from tax gateway."
     )
 
+    file_upload = graphene.Field(
+        ChunkedFileUpload,
+        id=graphene.String(required=True, description="ID of the upload."),
+        description="Look up a chunked upload to resume it.",
+    )
+
+    file_blob = graphene.Field(
+        File,
+        digest=graphene.String(
+            required=True, description="SHA-256 digest of the file, in hex."
+        ),
+        description=(
+            "Look up a file uploaded before by the user by the digest of its "
+            "content. When it exists, `fileUploadByDigest` uploads it again "
+            "without sending its content. Requires an authenticated user."
+        ),
+    )
+
     def resolve_tax_types(self, info):
         return 0
 
+    def resolve_file_blob(self, info, digest):
+        if not info.context.user.is_authenticated:
+            raise PermissionDenied()
+        name = get_owned_blob_name(digest.lower(), info.context.user)
+        return File(url=name) if name else None
+
+    def resolve_file_upload(self, info, id):
+        try:
+            return ChunkedUpload.get(id, get_upload_owner(info.context))
+        except ValidationError:
+            return None
+
 
 class CoreMutations(graphene.ObjectType):
-    file_upload = FileUpload.Field()
\ No newline at end of file
+    file_upload = FileUpload.Field()
+    file_upload_start = FileUploadStart.Field()
+    file_upload_chunk = FileUploadChunk.Field()
+    file_upload_finish = FileUploadFinish.Field()
+    file_upload_by_digest = FileUploadByDigest.Field()
\ No newline at end of file
@@ -2,6 +2,7 @@
 from urllib.parse import urljoin
 from django.conf import settings
 import graphene
+from graphql.language import ast
 
 
 class Upload(graphene.types.Scalar):
@@ -26,6 +27,28 @@ class Upload(graphene.types.Scalar):
         return value
 
 
+class BigInt(graphene.types.Scalar):
+    class Meta:
+        description = (
+            "Integer that can exceed the 32-bit range of `Int`, e.g. a file size "
+            "in bytes."
+        )
+
+    @staticmethod
+    def serialize(value):
+        return int(value)
+
+    @staticmethod
+    def parse_literal(node):
+        if isinstance(node, ast.IntValue):
+            return int(node.value)
+        return None
+
+    @staticmethod
+    def parse_value(value):
+        return int(value)
+
+
 class File(graphene.ObjectType):
     url = graphene.String(required=True, description="The URL of the file.")
     content_type = graphene.String(
@@ -34,4 +57,35 @@ class File(graphene.ObjectType):
 
     @staticmethod
     def resolve_url(root, info):
-        return info.context.build_absolute_uri(urljoin(settings.MEDIA_URL, root.url))
\ No newline at end of file
+        return info.context.build_absolute_uri(urljoin(settings.MEDIA_URL, root.url))
+
+
+class ChunkedFileUpload(graphene.ObjectType):
+    id = graphene.String(required=True, description="ID of the upload.")
+    size = BigInt(required=True, description="Size of the file in bytes.")
+    offset = BigInt(
+        required=True,
+        description="Number of bytes received, offset of the next chunk.",
+    )
+    completed = graphene.Boolean(
+        required=True, description="Whether all the bytes of the file were received."
+    )
+
+
+class PageInfo(graphene.ObjectType):
+    has_next_page = graphene.Boolean(
+        required=True, description="Whether more results follow the page."
+    )
+    end_cursor = graphene.String(
+        description="Cursor of the last result, the `after` of the next page."
+    )
+
+
+class DateTimeRangeInput(graphene.InputObjectType):
+    gte = graphene.DateTime(description="Start of the range, included.")
+    lte = graphene.DateTime(description="End of the range, included.")
+
+
+class IntRangeInput(graphene.InputObjectType):
+    gte = graphene.Int(description="Minimum value, included.")
+    lte = graphene.Int(description="Maximum value, included.")
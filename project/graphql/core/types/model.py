@@ -1,9 +1,14 @@
+import graphene
 from django.db.models import Model
 from graphene.types.objecttype import ObjectType, ObjectTypeOptions
+from graphql_relay import to_global_id
+
+from ..identity_map import get_identity_map
 
 
 class ModelObjectOptions(ObjectTypeOptions):
     model = None
+    field_costs = None
 
 
 class ModelObjectType(ObjectType):
@@ -13,12 +18,17 @@ class ModelObjectType(ObjectType):
         interfaces=(),
         possible_types=(),
         default_resolver=None,
+        field_costs=None,
         _meta=None,
         **options,
     ):
         if not _meta:
             _meta = ModelObjectOptions(cls)
 
+        # Cost weights of the fields used by the query cost analysis, fields
+        # that are not declared here get the default weight.
+        _meta.field_costs = field_costs or {}
+
         if not getattr(_meta, "model", None):
             if not options.get("model"):
                 raise ValueError(
@@ -42,13 +52,31 @@ class ModelObjectType(ObjectType):
         )
 
     @classmethod
-    def get_instance(cls, _, id):
-        model = cls._meta.model
-        try:
-            return model.objects.get(pk=id)
-        except model.DoesNotExist:
-            return None
+    def get_instance(cls, info, id):
+        return get_identity_map(info.context).get_or_fetch(cls._meta.model, id)
+
+    @classmethod
+    def is_visible(cls, instance, info):
+        """Determine whether the requester can fetch the instance by its ID."""
+        return True
 
     @classmethod
     def get_model(cls):
-        return cls._meta.model
\ No newline at end of file
+        return cls._meta.model
+
+
+def resolve_global_id(root, info):
+    return to_global_id(info.parent_type.name, root.pk)
+
+
+def global_id_field():
+    """Return the field of the global ID of the objects fetched by the `node`
+    and `nodes` queries."""
+    return graphene.Field(
+        graphene.ID,
+        required=True,
+        description=(
+            "Global ID of the object, to look it up with `node` and `nodes`."
+        ),
+        resolver=resolve_global_id,
+    )
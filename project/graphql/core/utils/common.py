@@ -1,7 +1,33 @@
+import base64
+import json
+
+from graphql.error import GraphQLError
+
+from ....core.error_codes import QueryErrorCodes
+
+
 
 def snake_to_camel_case(name):
     """Convert snake_case variable name to camelCase."""
     if isinstance(name, str):
         split_name = name.split("_")
         return split_name[0] + "".join(map(str.capitalize, split_name[1:]))
-    return name
\ No newline at end of file
+    return name
+
+
+def encode_cursor(values: list) -> str:
+    """Return the opaque cursor of a position in paginated results."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError):
+        values = None
+    if not isinstance(values, list):
+        raise GraphQLError(
+            f"Invalid cursor: {cursor}.",
+            extensions={"code": QueryErrorCodes.INVALID_CURSOR.value},
+        )
+    return values
@@ -0,0 +1,101 @@
+from collections import defaultdict
+
+import graphene
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from graphql.error import GraphQLError
+from graphql_relay import from_global_id
+
+from ...core.error_codes import QueryErrorCodes
+from ..core.identity_map import get_identity_map
+from ..polls.types import ChoiceType, QuestionType
+from ..users.types import UserType
+
+NODE_TYPES = (QuestionType, ChoiceType, UserType)
+
+
+class Node(graphene.Union):
+    class Meta:
+        description = "An object that can be fetched by its global ID."
+        types = NODE_TYPES
+
+    @classmethod
+    def resolve_type(cls, instance, info):
+        for node_type in cls._meta.types:
+            if isinstance(instance, node_type.get_model()):
+                return node_type
+        return None
+
+
+def parse_node_id(global_id):
+    """Return the type and the primary key encoded in the global ID."""
+    node_types = {node_type._meta.name: node_type for node_type in NODE_TYPES}
+    try:
+        type_name, pk = from_global_id(global_id)
+        node_type = node_types[type_name]
+        pk = node_type.get_model()._meta.pk.to_python(pk)
+    except (ValueError, KeyError, ValidationError):
+        raise GraphQLError(f"Invalid node ID: {global_id}.")
+    return node_type, pk
+
+
+def resolve_nodes(info, global_ids):
+    """Resolve the global IDs with a single query per model.
+
+    Nodes are returned in the order of the IDs, missing nodes and nodes the
+    requester isn't allowed to see are null.
+    """
+    ids_by_type = defaultdict(list)
+    parsed_ids = []
+    for global_id in global_ids:
+        node_type, pk = parse_node_id(global_id)
+        ids_by_type[node_type].append(pk)
+        parsed_ids.append((node_type, pk))
+
+    identity_map = get_identity_map(info.context)
+    instances = {}
+    for node_type, pks in ids_by_type.items():
+        for instance in identity_map.get_or_fetch_many(node_type.get_model(), pks):
+            if node_type.is_visible(instance, info):
+                instances[node_type, instance.pk] = instance
+    return [instances.get(parsed_id) for parsed_id in parsed_ids]
+
+
+class NodeQueries(graphene.ObjectType):
+    node = graphene.Field(
+        Node,
+        id=graphene.ID(required=True, description="Global ID of the object."),
+        description=(
+            "Look up an object by its global ID, the `globalId` field of the "
+            "objects, the base64 encoding of `<type name>:<id>`, e.g. "
+            "`QuestionType:<id>`."
+        ),
+    )
+    nodes = graphene.List(
+        Node,
+        required=True,
+        ids=graphene.List(
+            graphene.NonNull(graphene.ID),
+            required=True,
+            description="Global IDs of the objects.",
+        ),
+        description=(
+            "Look up objects by their global IDs. Objects are returned in the "
+            "order of the IDs, with null for the IDs that don't match any object."
+        ),
+    )
+
+    def resolve_node(self, info, id):
+        return resolve_nodes(info, [id])[0]
+
+    def resolve_nodes(self, info, ids):
+        max_batch_size = settings.GRAPHQL_NODES_MAX_BATCH_SIZE
+        if len(ids) > max_batch_size:
+            raise GraphQLError(
+                f"Can't look up more than {max_batch_size} nodes at once.",
+                extensions={
+                    "code": QueryErrorCodes.BATCH_TOO_LARGE.value,
+                    "maxBatchSize": max_batch_size,
+                },
+            )
+        return resolve_nodes(info, ids)
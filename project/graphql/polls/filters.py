@@ -0,0 +1,101 @@
+import uuid
+from datetime import timedelta
+from typing import List, Tuple
+
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from ...polls.models import Choice, Question
+from ..core.enums import OrderDirection
+from .input import ChoiceOrderField, QuestionOrderField
+
+
+def filter_range(queryset: QuerySet, field: str, value_range) -> QuerySet:
+    if not value_range:
+        return queryset
+    lookups = {
+        f"{field}__{lookup}": value_range[lookup]
+        for lookup in ("gte", "lte")
+        if value_range.get(lookup) is not None
+    }
+    return queryset.filter(**lookups)
+
+
+def order_by_field(queryset: QuerySet, field: str, direction: str) -> QuerySet:
+    """Order by the field then by ID, the order of the indexes of the
+    orderings."""
+    if direction == OrderDirection.DESC.value:
+        return queryset.order_by(f"-{field}", "-id")
+    return queryset.order_by(field, "id")
+
+
+def filter_questions(queryset: QuerySet, filter) -> QuerySet:
+    if not filter:
+        return queryset
+    if filter.get("ids") is not None:
+        queryset = queryset.filter(pk__in=filter["ids"])
+    if filter.get("text_prefix"):
+        queryset = queryset.filter(question_text__startswith=filter["text_prefix"])
+    queryset = filter_range(queryset, "created", filter.get("created"))
+    return filter_range(queryset, "total_votes", filter.get("total_votes"))
+
+
+def order_questions(queryset: QuerySet, order_by) -> QuerySet:
+    # the fields of `QuestionOrderField` are the indexed fields of `Question`
+    if not order_by:
+        return queryset
+    return order_by_field(queryset, order_by["field"], order_by["direction"])
+
+
+def filter_choices(queryset: QuerySet, filter) -> QuerySet:
+    if not filter:
+        return queryset
+    if filter.get("text_prefix"):
+        queryset = queryset.filter(choice_text__startswith=filter["text_prefix"])
+    queryset = filter_range(queryset, "created", filter.get("created"))
+    return filter_range(queryset, "votes", filter.get("votes"))
+
+
+def order_choices(queryset: QuerySet, order_by) -> QuerySet:
+    # the choices of a question are ordered by the indexes of `Choice`
+    # starting with the question
+    if not order_by:
+        return queryset
+    return order_by_field(queryset, order_by["field"], order_by["direction"])
+
+
+def get_query_plan_checks() -> List[Tuple[str, QuerySet]]:
+    """Return the queries of every allowed ordering, filtered by a range of
+    the ordered field. Their plans shouldn't sort the rows."""
+    now = timezone.now()
+    ranges = {
+        "created": {"gte": now - timedelta(days=30), "lte": now},
+        "total_votes": {"gte": 10},
+        "votes": {"gte": 10},
+    }
+    checks = []
+    for direction in OrderDirection._meta.enum:
+        for field in QuestionOrderField._meta.enum:
+            questions = filter_questions(
+                Question.objects.all(), {field.value: ranges[field.value]}
+            )
+            order_by = {"field": field.value, "direction": direction.value}
+            checks.append(
+                (
+                    f"questions by {field.name} {direction.name}",
+                    order_questions(questions, order_by),
+                )
+            )
+        for field in ChoiceOrderField._meta.enum:
+            choices = filter_choices(
+                Choice.objects.filter(question_id=uuid.uuid4()),
+                {field.value: ranges[field.value]},
+            )
+            order_by = {"field": field.value, "direction": direction.value}
+            checks.append(
+                (
+                    f"choices of a question by {field.name} {direction.name}",
+                    order_choices(choices, order_by),
+                )
+            )
+    return checks
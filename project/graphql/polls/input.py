@@ -1,5 +1,8 @@
 import graphene
 
+from ..core.enums import OrderDirection
+from ..core.types import DateTimeRangeInput, IntRangeInput
+
 
 class QuestionInput(graphene.InputObjectType):
     question_text = graphene.String(
@@ -17,4 +20,39 @@ class ChoiceCreateInput(graphene.InputObjectType):
 
 class ChoiceUpdateInput(ChoiceCreateInput):
     question = graphene.UUID()
-    choice_text = graphene.String()
\ No newline at end of file
+    choice_text = graphene.String()
+
+
+class QuestionFilterInput(graphene.InputObjectType):
+    ids = graphene.List(
+        graphene.NonNull(graphene.UUID), description="IDs of the questions."
+    )
+    created = DateTimeRangeInput(description="Range of the creation dates.")
+    text_prefix = graphene.String(description="Start of the text of the question.")
+    total_votes = IntRangeInput(description="Range of the votes of the choices.")
+
+
+class QuestionOrderField(graphene.Enum):
+    CREATED = "created"
+    TOTAL_VOTES = "total_votes"
+
+
+class QuestionOrderInput(graphene.InputObjectType):
+    field = QuestionOrderField(required=True)
+    direction = OrderDirection(default_value=OrderDirection.DESC.value)
+
+
+class ChoiceFilterInput(graphene.InputObjectType):
+    created = DateTimeRangeInput(description="Range of the creation dates.")
+    text_prefix = graphene.String(description="Start of the text of the choice.")
+    votes = IntRangeInput(description="Range of the votes.")
+
+
+class ChoiceOrderField(graphene.Enum):
+    CREATED = "created"
+    VOTES = "votes"
+
+
+class ChoiceOrderInput(graphene.InputObjectType):
+    field = ChoiceOrderField(required=True)
+    direction = OrderDirection(default_value=OrderDirection.DESC.value)
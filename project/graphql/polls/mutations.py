@@ -2,7 +2,9 @@ import graphene
 
 from ...core.permissions import ChoicePermissions, QuestionPermissions
 from ...polls import models
+from ...polls.totals import QUESTION_TOTALS_FIELDS
 from ..core.types.errors import ChoiceError, QuestionError
+from ..core.identity_map import get_identity_map
 from ..core.mutations import ModelMutation, ModelDeleteMutation
 from .types import ChoiceType, QuestionType
 from .input import ChoiceCreateInput, ChoiceUpdateInput, QuestionInput
@@ -81,6 +83,21 @@ class ChoiceUpdate(ModelMutation):
         permissions = (ChoicePermissions.MANAGE_CHOICES,)
         error_type_class = ChoiceError
 
+    @classmethod
+    def save(cls, info, instance, cleaned_input):
+        previous_question_id = getattr(instance, "_loaded_values", {}).get(
+            "question_id"
+        )
+        super().save(info, instance, cleaned_input)
+        # the signals reload the totals of the question of the choice, the
+        # question it was moved from is reloaded when the request holds it
+        if previous_question_id not in (None, instance.question_id):
+            question = get_identity_map(info.context).get(
+                models.Question, previous_question_id
+            )
+            if question is not None:
+                question.refresh_from_db(fields=QUESTION_TOTALS_FIELDS)
+
 
 class ChoiceDelete(ModelDeleteMutation):
     class Arguments:
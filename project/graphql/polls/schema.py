@@ -1,7 +1,28 @@
 import graphene
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection
+from graphql.error import GraphQLError
 
+from ...core.error_codes import QueryErrorCodes
 from ...polls.models import Question
-from ..polls.types import QuestionType
+from ...polls.search import get_search_backend
+from ...polls.signals import get_question_channel
+from ...polls.totals import get_poll_results
+from ...polls.trending import TrendingWindow, get_leaderboard
+from ..core.enums import TrendingWindowEnum
+from ..core.identity_map import get_identity_map
+from ..core.types import PageInfo
+from ..core.utils.common import decode_cursor, encode_cursor
+from ..polls.types import (
+    PollResultsType,
+    QuestionSearchEdgeType,
+    QuestionSearchResultsType,
+    QuestionType,
+    TrendingQuestionType,
+)
+from .filters import filter_questions, order_questions
+from .input import QuestionFilterInput, QuestionOrderInput
 from .mutations import (
     QuestionCreate, 
     QuestionUpdate, 
@@ -13,14 +34,161 @@ from .mutations import (
 
 
 
+def parse_search_cursor(cursor):
+    """Return the relevance and the question ID of a search cursor."""
+    values = decode_cursor(cursor)
+    try:
+        relevance, question_id = values
+        return float(relevance), Question._meta.pk.to_python(question_id)
+    except (TypeError, ValueError, ValidationError):
+        raise GraphQLError(
+            f"Invalid cursor: {cursor}.",
+            extensions={"code": QueryErrorCodes.INVALID_CURSOR.value},
+        )
+
+
 class PollsQueries(graphene.ObjectType):
     questions = graphene.List(
         QuestionType,
+        filter=QuestionFilterInput(description="Filters of the questions."),
+        order_by=QuestionOrderInput(
+            description="Ordering of the questions, by an indexed field."
+        ),
         description="List of all tax rates available from tax gateway."
     )
 
-    def resolve_questions(self, info):
-        return Question.objects.all()
+    poll_results = graphene.Field(
+        PollResultsType,
+        question_id=graphene.Argument(graphene.UUID, required=True),
+        description="Totals and shares of the votes of a question.",
+    )
+    poll_results_bulk = graphene.List(
+        PollResultsType,
+        required=True,
+        ids=graphene.List(
+            graphene.NonNull(graphene.UUID),
+            required=True,
+            description="IDs of the questions.",
+        ),
+        description=(
+            "Results of several questions, in the order of the IDs, with null "
+            "for the IDs that don't match any question."
+        ),
+    )
+    trending_questions = graphene.List(
+        graphene.NonNull(TrendingQuestionType),
+        required=True,
+        window=graphene.Argument(
+            TrendingWindowEnum, default_value=TrendingWindow.HOUR.value
+        ),
+        first=graphene.Argument(graphene.Int, default_value=10),
+        description="Questions with the most new votes in the window.",
+    )
+    search_questions = graphene.Field(
+        QuestionSearchResultsType,
+        required=True,
+        text=graphene.String(required=True, description="Searched words."),
+        first=graphene.Argument(graphene.Int, default_value=20),
+        after=graphene.String(description="Cursor of the previous page."),
+        description=(
+            "Questions whose text or choices contain all the words, the most "
+            "relevant first. The last word matches as a prefix."
+        ),
+    )
+
+    def resolve_questions(self, info, filter=None, order_by=None):
+        questions = filter_questions(Question.objects.all(), filter)
+        questions = order_questions(questions, order_by)
+        return get_identity_map(info.context).add_all(questions)
+
+    def resolve_poll_results(self, info, question_id):
+        return get_poll_results([question_id]).get(question_id)
+
+    def resolve_poll_results_bulk(self, info, ids):
+        max_batch_size = settings.GRAPHQL_POLL_RESULTS_MAX_BATCH_SIZE
+        if len(ids) > max_batch_size:
+            raise GraphQLError(
+                f"Can't look up the results of more than {max_batch_size} "
+                "questions at once.",
+                extensions={
+                    "code": QueryErrorCodes.BATCH_TOO_LARGE.value,
+                    "maxBatchSize": max_batch_size,
+                },
+            )
+        results = get_poll_results(ids)
+        return [results.get(question_id) for question_id in ids]
+
+    def resolve_trending_questions(self, info, window, first):
+        max_first = settings.GRAPHQL_TRENDING_MAX_FIRST
+        if not 0 <= first <= max_first:
+            raise GraphQLError(
+                f"The number of trending questions should be between 0 and "
+                f"{max_first}.",
+                extensions={
+                    "code": QueryErrorCodes.BATCH_TOO_LARGE.value,
+                    "maxBatchSize": max_first,
+                },
+            )
+        ranking = get_leaderboard().top(TrendingWindow(window), first)
+        questions = {
+            str(question.pk): question
+            for question in get_identity_map(info.context).get_or_fetch_many(
+                Question, [question_id for question_id, _ in ranking]
+            )
+        }
+        # the deleted questions are skipped until they leave the window
+        return [
+            TrendingQuestionType(question=questions[question_id], votes=votes)
+            for question_id, votes in ranking
+            if question_id in questions
+        ]
+
+
+    def resolve_search_questions(self, info, text, first, after=None):
+        max_first = settings.GRAPHQL_SEARCH_MAX_FIRST
+        if not 0 <= first <= max_first:
+            raise GraphQLError(
+                f"The number of searched questions should be between 0 and "
+                f"{max_first}.",
+                extensions={
+                    "code": QueryErrorCodes.BATCH_TOO_LARGE.value,
+                    "maxBatchSize": max_first,
+                },
+            )
+        backend = get_search_backend()
+        if not backend.supported:
+            raise GraphQLError(
+                f"Full-text search isn't supported on {connection.vendor}.",
+                extensions={"code": QueryErrorCodes.SEARCH_NOT_SUPPORTED.value},
+            )
+        if after is not None:
+            after = parse_search_cursor(after)
+        # one more result tells whether a next page follows
+        matches = backend.search(text, first + 1, after)
+        has_next_page = len(matches) > first
+        matches = matches[:first]
+        questions = {
+            question.pk: question
+            for question in get_identity_map(info.context).get_or_fetch_many(
+                Question, [question_id for question_id, _ in matches]
+            )
+        }
+        edges = [
+            QuestionSearchEdgeType(
+                node=questions[question_id],
+                cursor=encode_cursor([relevance, str(question_id)]),
+                relevance=relevance,
+            )
+            for question_id, relevance in matches
+            if question_id in questions
+        ]
+        return QuestionSearchResultsType(
+            edges=edges,
+            page_info=PageInfo(
+                has_next_page=has_next_page,
+                end_cursor=edges[-1].cursor if edges else None,
+            ),
+        )
 
 
 class PollsMutations(graphene.ObjectType):
@@ -29,4 +197,23 @@ class PollsMutations(graphene.ObjectType):
     question_delete = QuestionDelete.Field()
     choice_create = ChoiceCreate.Field()
     choice_update = ChoiceUpdate.Field()
-    choice_delete = ChoiceDelete.Field()
\ No newline at end of file
+    choice_delete = ChoiceDelete.Field()
+
+
+class PollsSubscriptions(graphene.ObjectType):
+    choice_votes_changed = graphene.Field(
+        QuestionType,
+        question_id=graphene.Argument(graphene.UUID, required=True),
+        description=(
+            "Question whose choices changed, the changes are sent at most "
+            "once per subscription interval."
+        ),
+    )
+
+    def resolve_choice_votes_changed(self, info, question_id):
+        return info.context.listen(
+            get_question_channel(question_id),
+            lambda: Question.objects.prefetch_related("choices")
+            .filter(pk=question_id)
+            .first(),
+        )
@@ -1,30 +1,49 @@
 import graphene
 
 from ...polls import models
-from ..core.types.model import ModelObjectType
+from ..core.identity_map import get_identity_map
+from ..core.types import PageInfo
+from ..core.types.model import ModelObjectType, global_id_field
+from .filters import filter_choices, order_choices
+from .input import ChoiceFilterInput, ChoiceOrderInput
 
 
 class QuestionType(ModelObjectType):
     id = graphene.UUID(required=True)
+    global_id = global_id_field()
     question_text = graphene.String()
     choices = graphene.List(
         lambda: ChoiceType, 
-        required=True
+        required=True,
+        filter=ChoiceFilterInput(description="Filters of the choices."),
+        order_by=ChoiceOrderInput(
+            description="Ordering of the choices, by an indexed field."
+        ),
     )
     created = graphene.DateTime()
+    choice_count = graphene.Int(
+        required=True, description="Number of choices of the question."
+    )
+    total_votes = graphene.Int(
+        required=True, description="Sum of the votes of the choices."
+    )
 
     class Meta:
         description = "Represents an question."
         model = models.Question
+        field_costs = {"choices": 10}
 
-    def resolve_choices(self, info, **kwargs):
+    def resolve_choices(self, info, filter=None, order_by=None, **kwargs):
         if hasattr(self, 'choices'):
-            return self.choices.all()
+            # the prefetched choices are used when there's no argument
+            choices = filter_choices(self.choices.all(), filter)
+            return order_choices(choices, order_by)
         return []
 
 
 class ChoiceType(ModelObjectType):
     id = graphene.UUID(required=True)
+    global_id = global_id_field()
     question = graphene.Field(
         QuestionType,
         required=True,
@@ -36,4 +55,67 @@ class ChoiceType(ModelObjectType):
 
     class Meta:
         description = "Represents an choice."
-        model = models.Choice
\ No newline at end of file
+        model = models.Choice
+
+    def resolve_question(self, info, **kwargs):
+        if models.Choice.question.is_cached(self):
+            return self.question
+        return get_identity_map(info.context).get_or_fetch(
+            models.Question, self.question_id
+        )
+
+
+class ChoiceResultType(graphene.ObjectType):
+    id = graphene.UUID(required=True)
+    choice_text = graphene.String()
+    votes = graphene.Int(required=True)
+    share = graphene.Float(
+        required=True,
+        description="Share of the votes of the question, between 0 and 1.",
+    )
+
+    class Meta:
+        description = "Votes of a choice in the results of a question."
+
+
+class PollResultsType(graphene.ObjectType):
+    question_id = graphene.UUID(required=True)
+    total_votes = graphene.Int(required=True)
+    choice_count = graphene.Int(required=True)
+    choices = graphene.List(
+        graphene.NonNull(ChoiceResultType),
+        required=True,
+        description="Choices of the question, the most voted first.",
+    )
+
+    class Meta:
+        description = "Totals and shares of the votes of a question."
+
+
+class TrendingQuestionType(graphene.ObjectType):
+    question = graphene.Field(QuestionType, required=True)
+    votes = graphene.Int(
+        required=True, description="Votes of the question in the window."
+    )
+
+    class Meta:
+        description = "A question of the trending leaderboard."
+
+
+class QuestionSearchEdgeType(graphene.ObjectType):
+    node = graphene.Field(QuestionType, required=True)
+    cursor = graphene.String(required=True)
+    relevance = graphene.Float(
+        required=True, description="Relevance of the question, the highest first."
+    )
+
+    class Meta:
+        description = "A question matching the searched text."
+
+
+class QuestionSearchResultsType(graphene.ObjectType):
+    edges = graphene.List(graphene.NonNull(QuestionSearchEdgeType), required=True)
+    page_info = graphene.Field(PageInfo, required=True)
+
+    class Meta:
+        description = "A page of the questions matching the searched text."
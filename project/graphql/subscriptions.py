@@ -0,0 +1,391 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from graphql.execution import ExecutionResult
+from rx import Observable
+
+from ..core.pubsub import get_pubsub
+from .api import get_schema
+from .core.backend import get_default_backend
+from .core.encoders import get_json_encoder
+from .views import GraphQLView
+
+logger = logging.getLogger(__name__)
+
+# WebSocket subprotocol of the subscriptions-transport-ws clients.
+GRAPHQL_WS_PROTOCOL = "graphql-ws"
+
+
+class SubscriptionContext:
+    """Context of the execution of the subscriptions.
+
+    The subscription resolvers call `listen` with the pub/sub channel of
+    their events and a function returning their root value. When an
+    operation is subscribed the channels are collected, on the events of the
+    channels the root value is resolved.
+    """
+
+    def __init__(self, subscribing: bool):
+        self.subscribing = subscribing
+        self.channels: Set[str] = set()
+        self.user = AnonymousUser()
+
+    def listen(self, channel: str, get_root: Callable[[], Any]) -> Observable:
+        if self.subscribing:
+            self.channels.add(channel)
+            return Observable.empty()
+        return Observable.just(get_root())
+
+
+def format_result(result: ExecutionResult) -> dict:
+    response = {}
+    if result.errors:
+        response["errors"] = [GraphQLView.format_error(e) for e in result.errors]
+    if not result.invalid:
+        response["data"] = result.data
+    return response
+
+
+class SubscriptionGroup:
+    """Subscribers of the same operation with the same variables.
+
+    The operation is executed and encoded once for all of them, their
+    messages only differ by the operation `id` set by every client.
+    """
+
+    def __init__(self, key: str, document, variables, operation_name):
+        self.key = key
+        self.document = document
+        self.variables = variables
+        self.operation_name = operation_name
+        self.channels: Set[str] = set()
+        # prefix of the messages and send function of every subscriber
+        self.subscribers: Dict[Tuple[Any, str], Tuple[str, Callable]] = {}
+
+    def execute(self, context: SubscriptionContext) -> List[ExecutionResult]:
+        result = self.document.execute(
+            context_value=context,
+            variable_values=self.variables,
+            operation_name=self.operation_name,
+            allow_subscriptions=True,
+        )
+        if isinstance(result, ExecutionResult):
+            return [result]
+        # the resolvers are synchronous, the results are already emitted
+        results = []
+        result.subscribe(results.append)
+        return results
+
+    def subscribe(self) -> Optional[dict]:
+        """Collect the channels of the operation, return its errors."""
+        context = SubscriptionContext(subscribing=True)
+        results = self.execute(context)
+        if results:
+            return format_result(results[0])
+        if not context.channels:
+            return {"errors": [{"message": "The subscription has no events."}]}
+        self.channels = context.channels
+        return None
+
+    def get_payload(self, json_encoder) -> Optional[str]:
+        results = self.execute(SubscriptionContext(subscribing=False))
+        if not results:
+            return None
+        return json_encoder.encode(format_result(results[-1])).decode()
+
+
+class SubscriptionBroadcaster:
+    """Send the events of the pub/sub to the subscribers of the process.
+
+    The channels of the events are flushed every `interval` seconds, the
+    events of a channel in between are coalesced in one message. On a flush
+    every operation is executed and encoded once, whatever the number of its
+    subscribers, and its messages are queued by the connections of the
+    subscribers, which send them concurrently.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.json_encoder = get_json_encoder()
+        self.groups: Dict[str, SubscriptionGroup] = {}
+        self.channel_groups: Dict[str, Set[SubscriptionGroup]] = defaultdict(set)
+        self.subscriptions: Dict[Tuple[Any, str], SubscriptionGroup] = {}
+        self.pending: Set[str] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self.loop = asyncio.get_running_loop()
+            self._task = self.loop.create_task(self.run())
+
+    async def subscribe(
+        self, key: Tuple[Any, str], send: Callable, data: dict
+    ) -> Optional[dict]:
+        """Add the operation of `data` sent by a client, identified by
+        `key`, return its errors."""
+        query = data.get("query")
+        variables = data.get("variables") or {}
+        operation_name = data.get("operationName")
+        group_key = json.dumps([query, variables, operation_name], sort_keys=True)
+        group = self.groups.get(group_key)
+        if group is None:
+            try:
+                document = get_default_backend().document_from_string(
+                    get_schema(), query
+                )
+            except Exception as e:
+                return {"errors": [GraphQLView.format_error(e)]}
+            if document.get_operation_type(operation_name) != "subscription":
+                return {
+                    "errors": [
+                        {"message": "Only subscriptions are executed by WebSocket."}
+                    ]
+                }
+            group = SubscriptionGroup(group_key, document, variables, operation_name)
+            errors = await sync_to_async(group.subscribe)()
+            if errors:
+                return errors
+            # another client may have subscribed the operation meanwhile
+            group = self.groups.setdefault(group_key, group)
+            for channel in group.channels:
+                if not self.channel_groups[channel]:
+                    get_pubsub().subscribe(channel, self.on_event)
+                self.channel_groups[channel].add(group)
+
+        _, id = key
+        group.subscribers[key] = (f'{{"type":"data","id":{json.dumps(id)},', send)
+        self.subscriptions[key] = group
+        return None
+
+    def unsubscribe(self, key: Tuple[Any, str]):
+        group = self.subscriptions.pop(key, None)
+        if group is None:
+            return
+        group.subscribers.pop(key, None)
+        if group.subscribers:
+            return
+        del self.groups[group.key]
+        for channel in group.channels:
+            groups = self.channel_groups[channel]
+            groups.discard(group)
+            if not groups:
+                del self.channel_groups[channel]
+                get_pubsub().unsubscribe(channel, self.on_event)
+
+    def on_event(self, channel: str, message: str):
+        # called by the thread of the publisher or of the pub/sub bridge
+        self.loop.call_soon_threadsafe(self.pending.add, channel)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.pending:
+                continue
+            channels, self.pending = self.pending, set()
+            try:
+                await self.flush(channels)
+            except Exception:
+                logger.exception("Flush of the subscriptions failed")
+
+    async def flush(self, channels: Set[str]):
+        groups = {
+            group
+            for channel in channels
+            for group in self.channel_groups.get(channel, ())
+        }
+        for group in groups:
+            payload = await sync_to_async(group.get_payload)(self.json_encoder)
+            if payload is None:
+                continue
+            message_end = f'"payload":{payload}}}'
+            for prefix, send in list(group.subscribers.values()):
+                send(prefix + message_end)
+
+
+@lru_cache(maxsize=None)
+def get_broadcaster() -> SubscriptionBroadcaster:
+    return SubscriptionBroadcaster(settings.GRAPHQL_SUBSCRIPTION_INTERVAL / 1000)
+
+
+class SubscriptionConnection:
+    """WebSocket connection of a client of the subscriptions-transport-ws
+    protocol.
+
+    The messages are queued and sent in order by a task of the connection, the
+    broadcaster never waits for a client. A client with
+    `GRAPHQL_SUBSCRIPTION_QUEUE_SIZE` messages waiting, or not receiving a
+    message within `GRAPHQL_SUBSCRIPTION_SEND_TIMEOUT` milliseconds, is too
+    slow: it's dropped, its operations are stopped and its connection closed.
+    """
+
+    def __init__(self, send: Callable, broadcaster: SubscriptionBroadcaster):
+        self.send = send
+        self.broadcaster = broadcaster
+        self.operation_ids: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(
+            maxsize=settings.GRAPHQL_SUBSCRIPTION_QUEUE_SIZE
+        )
+        self.closing = False
+        self.dropped = False
+        self._sender: Optional[asyncio.Task] = None
+
+    def start_sending(self):
+        self._sender = asyncio.get_running_loop().create_task(self.send_queued())
+
+    async def send_with_timeout(self, message: dict):
+        timeout = settings.GRAPHQL_SUBSCRIPTION_SEND_TIMEOUT / 1000
+        await asyncio.wait_for(self.send(message), timeout)
+
+    async def send_queued(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                await self.send_with_timeout(message)
+            except asyncio.TimeoutError:
+                self.drop()
+                return
+            except Exception:
+                # the connection is closed, it unsubscribes on disconnect
+                continue
+            if message["type"] == "websocket.close":
+                return
+
+    def queue_message(self, message: dict):
+        if self.closing:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.drop()
+
+    def send_text(self, text: str):
+        self.queue_message({"type": "websocket.send", "text": text})
+
+    def send_message(self, type: str, id: Optional[str] = None, payload=None):
+        message = {"type": type}
+        if id is not None:
+            message["id"] = id
+        if payload is not None:
+            message["payload"] = payload
+        self.send_text(json.dumps(message))
+
+    async def close_connection(self, code: int):
+        """Send the queued messages, then close the connection."""
+        self.stop_all()
+        if self._sender is None:
+            await self.send({"type": "websocket.close", "code": code})
+            return
+        self.queue_message({"type": "websocket.close", "code": code})
+        self.closing = True
+        await asyncio.wait({self._sender})
+
+    def drop(self):
+        """Stop the operations of the slow client and close its connection,
+        the queued messages are dropped."""
+        if self.dropped:
+            return
+        logger.warning(
+            "Dropped a slow subscriptions client with %s queued messages",
+            self.queue.qsize(),
+        )
+        self.dropped = self.closing = True
+        self.close()
+        asyncio.get_running_loop().create_task(self.send_close())
+
+    async def send_close(self):
+        try:
+            await self.send_with_timeout({"type": "websocket.close", "code": 1013})
+        except Exception:
+            pass
+
+    async def handle(self, message: dict) -> bool:
+        """Handle a message of the client, return whether the connection is
+        kept open."""
+        type = message.get("type")
+        id = message.get("id")
+        if type == "connection_init":
+            self.send_message("connection_ack")
+        elif type == "start":
+            await self.start(id, message.get("payload") or {})
+        elif type == "stop":
+            self.stop(id)
+            self.send_message("complete", id)
+        elif type == "connection_terminate":
+            return False
+        else:
+            self.send_message(
+                "error", id, {"message": f"Unsupported message type: {type}."}
+            )
+        return True
+
+    async def start(self, id: str, payload: dict):
+        self.stop(id)
+        errors = await self.broadcaster.subscribe((self, id), self.send_text, payload)
+        if errors:
+            self.send_message("data", id, errors)
+            self.send_message("complete", id)
+            return
+        if self.closing:
+            # closed while the operation was subscribed
+            self.broadcaster.unsubscribe((self, id))
+            return
+        self.operation_ids.add(id)
+
+    def stop(self, id: str):
+        if id in self.operation_ids:
+            self.operation_ids.discard(id)
+            self.broadcaster.unsubscribe((self, id))
+
+    def stop_all(self):
+        for id in list(self.operation_ids):
+            self.stop(id)
+
+    def close(self):
+        self.stop_all()
+        if self._sender is not None:
+            self._sender.cancel()
+
+
+async def subscriptions_application(scope, receive, send):
+    """ASGI application of the GraphQL subscriptions over WebSocket."""
+    broadcaster = get_broadcaster()
+    broadcaster.start()
+    connection = SubscriptionConnection(send, broadcaster)
+    try:
+        while True:
+            event = await receive()
+            if event["type"] == "websocket.connect":
+                if GRAPHQL_WS_PROTOCOL not in scope.get("subprotocols", ()):
+                    await send({"type": "websocket.close", "code": 1002})
+                    return
+                await send(
+                    {"type": "websocket.accept", "subprotocol": GRAPHQL_WS_PROTOCOL}
+                )
+                connection.start_sending()
+            elif event["type"] == "websocket.receive":
+                if connection.closing:
+                    continue
+                try:
+                    message = json.loads(event.get("text") or event.get("bytes"))
+                except (TypeError, ValueError):
+                    connection.send_message(
+                        "error", payload={"message": "Messages should be JSON."}
+                    )
+                    continue
+                if not isinstance(message, dict) or not await connection.handle(
+                    message
+                ):
+                    await connection.close_connection(1000)
+                    return
+            elif event["type"] == "websocket.disconnect":
+                return
+    finally:
+        connection.close()
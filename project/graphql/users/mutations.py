@@ -1,12 +1,14 @@
 from typing import Optional
 
+from django.conf import settings
 from django.contrib.auth import password_validation
 from django.forms import ValidationError
-from django.utils import timezone
 import graphene
 
 from ...core.jwt import JWT_REFRESH_TYPE, create_access_token, create_refresh_token, get_payload, get_user_from_payload
+from ...core.rate_limit import get_client_ip, get_rate_limiter
 from ...users import models
+from ...users.last_login import update_last_login
 from ...users.error_codes import UserErrorCodes 
 from ..core.mutations import BaseMutation, ModelMutation
 from ..core.types.errors import UserError
@@ -30,15 +32,56 @@ class TokenCreate(BaseMutation):
         permissions = ()
         error_type_class = UserError
 
+    @classmethod
+    def get_rate_limits(cls, info, data):
+        """Return the name, the key and the rate of the limits of the attempt."""
+        return (
+            ("login-ip", get_client_ip(info.context), settings.LOGIN_RATE_LIMIT_PER_IP),
+            (
+                "login-email",
+                models.User.objects.normalize_email(data["email"]),
+                settings.LOGIN_RATE_LIMIT_PER_EMAIL,
+            ),
+        )
+
+    @classmethod
+    def check_rate_limits(cls, info, data):
+        """Reject the attempt before checking the credentials when the client IP
+        or the email are over the login limits.
+        """
+        period = settings.LOGIN_RATE_LIMIT_PERIOD
+        for name, key, rate in cls.get_rate_limits(info, data):
+            if not rate or not key:
+                continue
+            if not get_rate_limiter(name, rate, period).hit(key):
+                raise ValidationError(
+                    {
+                        "email": ValidationError(
+                            "Too many login attempts, try again later.",
+                            code=UserErrorCodes.TOO_MANY_REQUESTS.value,
+                        )
+                    }
+                )
+
+    @classmethod
+    def reset_email_rate_limit(cls, data):
+        rate = settings.LOGIN_RATE_LIMIT_PER_EMAIL
+        if rate:
+            limiter = get_rate_limiter(
+                "login-email", rate, settings.LOGIN_RATE_LIMIT_PERIOD
+            )
+            limiter.reset(models.User.objects.normalize_email(data["email"]))
+
     @classmethod
     def _retrieve_user_from_credentials(cls, email, password) -> Optional[models.User]:
-        user = models.User.objects.filter(email=email).first()
+        user = models.User.objects.get_by_email(email)
         if user and user.check_password(password):
             return user
         return None
 
     @classmethod
-    def get_user(cls, _info, data):
+    def get_user(cls, info, data):
+        cls.check_rate_limits(info, data)
         user = cls._retrieve_user_from_credentials(data["email"], data["password"])
         if not user:
             raise ValidationError(
@@ -64,10 +107,10 @@ class TokenCreate(BaseMutation):
     @classmethod
     def perform_mutation(cls, _, info, **data):
         user = cls.get_user(info, data)
+        cls.reset_email_rate_limit(data)
         access_token = create_access_token(user)
         refresh_token = create_refresh_token(user)
-        user.last_login = timezone.now()
-        user.save(update_fields=["last_login", "modified"])
+        update_last_login(user)
 
         return cls(
             errors=[],
@@ -160,7 +203,7 @@ class AccountRegister(ModelMutation):
     @classmethod
     def clean_input(cls, info, instance, data, input_cls=None):
         password = data["password"]
-        data['email'] = data.get("email").lower()
+        data['email'] = models.User.objects.normalize_email(data.get("email"))
         
         try:
             password_validation.validate_password(password, instance)
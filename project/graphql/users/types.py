@@ -1,11 +1,12 @@
 import graphene
 
 from ...users import models
-from ..core.types.model import ModelObjectType
+from ..core.types.model import ModelObjectType, global_id_field
 
 
 class UserType(ModelObjectType):
     id = graphene.UUID(required=True)
+    global_id = global_id_field()
     first_name = graphene.String()
     last_name = graphene.String()
     email = graphene.String()
@@ -14,3 +15,10 @@ class UserType(ModelObjectType):
     class Meta:
         description = "Represents an user."
         model = models.User
+
+    @classmethod
+    def is_visible(cls, instance, info):
+        requester = getattr(info.context, "user", None)
+        if not requester:
+            return False
+        return requester.is_staff or requester.pk == instance.pk
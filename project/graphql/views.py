@@ -0,0 +1,380 @@
+import copy
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponseBadRequest
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView as BaseGraphQLView
+from graphene_django.views import HttpError
+from graphql.error import GraphQLError
+
+from ..core.error_codes import QueryErrorCodes
+from ..core.metrics import METRICS_OPERATION_ATTRIBUTE
+from ..core.profiling import (
+    PROFILER_ATTRIBUTE,
+    SamplingProfiler,
+    should_profile,
+)
+from .core.backend import get_default_backend
+from .core.encoders import get_json_encoder
+from .core.identity_map import IDENTITY_MAP_ATTRIBUTE, IdentityMap
+from .core.middleware import ProfilingMiddleware
+from .core.query_cost import QueryCostAnalyzer
+from .core.query_tracing import (
+    QUERY_TRACE_ATTRIBUTE,
+    report_query_trace,
+    should_trace_queries,
+    trace_queries,
+)
+
+logger = logging.getLogger(__name__)
+
+# Operation name of the metrics of the batch requests.
+BATCH_OPERATION_NAME = "batch"
+# Request attribute holding whether the operations of the batch are profiled
+# and traced.
+BATCH_INSTRUMENTATION_ATTRIBUTE = "graphql_batch_instrumentation"
+
+
+@lru_cache(maxsize=None)
+def get_batch_executor() -> ThreadPoolExecutor:
+    """Return the threads of the process executing the queries of batches."""
+    return ThreadPoolExecutor(
+        max_workers=settings.GRAPHQL_BATCH_PARALLEL_WORKERS,
+        thread_name_prefix="graphql-batch",
+    )
+
+
+def prepare_batch_connections():
+    """Close the connections of the batch thread that can't be reused.
+
+    The threads of the batches aren't request threads, their connections
+    aren't closed at the end of the requests and are kept for their next
+    operations unless an error made them unusable.
+    """
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        if connection.in_atomic_block or (
+            connection.errors_occurred and not connection.is_usable()
+        ):
+            connection.close()
+        else:
+            connection.errors_occurred = False
+
+
+class GraphQLView(BaseGraphQLView):
+    """GraphQL view that rejects too expensive queries before executing them.
+
+    The computed cost of the executed operation is returned in the
+    `extensions` key of the response, along with the identity map counters
+    and the query trace in debug mode.
+
+    Requests with a valid `X-GraphQL-Profile` header, or sampled with
+    `GRAPHQL_PROFILING_SAMPLE_RATE`, are profiled and their collapsed stacks
+    are written in `GRAPHQL_PROFILING_DIRECTORY`.
+
+    Responses are serialized to bytes by the `json_encoder`, see
+    `encoders.get_json_encoder`.
+
+    A JSON list of up to `GRAPHQL_BATCH_MAX_SIZE` operations is executed as
+    a batch, see `get_batch_response`.
+    """
+
+    json_encoder = None
+
+    def __init__(self, backend=None, json_encoder=None, **kwargs):
+        if backend is None:
+            backend = get_default_backend()
+        super().__init__(backend=backend, **kwargs)
+        self.json_encoder = json_encoder or self.json_encoder or get_json_encoder()
+
+    def json_encode(self, request, d, pretty=False):
+        return self.json_encoder.encode(d, pretty=pretty)
+
+    def get_middleware(self, request):
+        middleware = super().get_middleware(request)
+        if getattr(request, PROFILER_ATTRIBUTE, None) is None:
+            return middleware
+        return [*(middleware or []), ProfilingMiddleware()]
+
+    def execute_graphql_request(self, request, *args, **kwargs):
+        # the operations of a batch share the request, the profiler and the
+        # query trace are set again for every operation
+        setattr(request, PROFILER_ATTRIBUTE, None)
+        setattr(request, QUERY_TRACE_ATTRIBUTE, None)
+        instrumentation = getattr(request, BATCH_INSTRUMENTATION_ATTRIBUTE, None)
+        if instrumentation is None:
+            instrumentation = should_profile(request), should_trace_queries()
+        profiled, traced = instrumentation
+        if not profiled:
+            return self.execute_traced_graphql_request(
+                request, traced, *args, **kwargs
+            )
+
+        profiler = SamplingProfiler()
+        setattr(request, PROFILER_ATTRIBUTE, profiler)
+        profiler.start()
+        try:
+            return self.execute_traced_graphql_request(
+                request, traced, *args, **kwargs
+            )
+        finally:
+            profiler.stop()
+            profiler.path = profiler.write()
+            logger.info(
+                "Profile of operation %s written to %s",
+                profiler.operation,
+                profiler.path,
+            )
+
+    def execute_traced_graphql_request(self, request, traced, *args, **kwargs):
+        if not traced:
+            return super().execute_graphql_request(request, *args, **kwargs)
+
+        with trace_queries() as trace:
+            result = super().execute_graphql_request(request, *args, **kwargs)
+        setattr(request, QUERY_TRACE_ATTRIBUTE, trace)
+        report_query_trace(trace)
+        return result
+
+    def parse_body(self, request):
+        if self.get_content_type(request) != "application/json":
+            return super().parse_body(request)
+
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            raise HttpError(HttpResponseBadRequest("POST body sent invalid JSON."))
+        if isinstance(data, list):
+            self.validate_batch(data)
+        elif not isinstance(data, dict):
+            raise HttpError(
+                HttpResponseBadRequest("The received data is not a valid JSON query.")
+            )
+        return data
+
+    @staticmethod
+    def validate_batch(batch: list):
+        max_size = settings.GRAPHQL_BATCH_MAX_SIZE
+        if not max_size:
+            raise HttpError(HttpResponseBadRequest("Batch requests are disabled."))
+        if not batch:
+            raise HttpError(
+                HttpResponseBadRequest("Received an empty list in the batch request.")
+            )
+        if len(batch) > max_size:
+            raise HttpError(
+                HttpResponseBadRequest(
+                    f"Batch requests are limited to {max_size} operations."
+                )
+            )
+        if not all(isinstance(data, dict) for data in batch):
+            raise HttpError(
+                HttpResponseBadRequest(
+                    "Every operation of a batch should be a JSON object."
+                )
+            )
+
+    def get_response(self, request, data, show_graphiql=False):
+        if isinstance(data, list):
+            return self.get_batch_response(request, data)
+
+        response, status_code = self.get_operation_response(
+            request, data, show_graphiql
+        )
+        if response is None:
+            return None, status_code
+        result = self.json_encode(request, response, pretty=show_graphiql)
+        return result, status_code
+
+    def get_batch_response(self, request, batch: List[dict]):
+        """Execute the operations of the batch and return their results.
+
+        The sum of the costs of the operations is limited by
+        `GRAPHQL_BATCH_MAX_COST`, none of the operations of a too expensive
+        batch is executed. The operations are executed in order with the same
+        request as context, so the authenticated user and the identity map are
+        shared by them. With `GRAPHQL_BATCH_PARALLEL_WORKERS`, consecutive
+        queries are executed in parallel, each with its own identity map,
+        mutations always run alone. Whether the operations are profiled and
+        traced is decided once for the batch, the instrumented batches aren't
+        executed in parallel.
+        """
+        cost_error = self.get_batch_cost_error(request, batch)
+        if cost_error is not None:
+            setattr(request, METRICS_OPERATION_ATTRIBUTE, BATCH_OPERATION_NAME)
+            responses = [
+                self.get_rejected_operation_response(request, data, cost_error)
+                for data in batch
+            ]
+            return self.json_encode(request, responses), 200
+
+        profiled, traced = should_profile(request), should_trace_queries()
+        setattr(request, BATCH_INSTRUMENTATION_ATTRIBUTE, (profiled, traced))
+        # the extensions of debug and instrumented requests are read from the
+        # request, they would be shared by the parallel operations
+        parallel = (
+            settings.GRAPHQL_BATCH_PARALLEL_WORKERS > 0
+            and not settings.DEBUG
+            and not profiled
+            and not traced
+        )
+        responses = [None] * len(batch)
+        for indexes, parallel in self.get_batch_groups(request, batch, parallel):
+            if parallel:
+                executor = get_batch_executor()
+                futures = [
+                    executor.submit(self.get_parallel_response, request, batch[index])
+                    for index in indexes
+                ]
+                for index, future in zip(indexes, futures):
+                    responses[index] = future.result()
+            else:
+                for index in indexes:
+                    responses[index] = self.get_batch_operation_response(
+                        request, batch[index]
+                    )
+        setattr(request, METRICS_OPERATION_ATTRIBUTE, BATCH_OPERATION_NAME)
+
+        # the status of every operation is in its result, a failed operation
+        # doesn't fail the batch
+        result = self.json_encode(request, [response for response, _ in responses])
+        return result, 200
+
+    def get_batch_cost_error(
+        self, request, batch: List[dict]
+    ) -> Optional[GraphQLError]:
+        max_cost = settings.GRAPHQL_BATCH_MAX_COST
+        if not max_cost:
+            return None
+        cost = sum(self.get_operation_cost(request, data) for data in batch)
+        if cost <= max_cost:
+            return None
+        return GraphQLError(
+            f"Batch cost of {cost} exceeds the maximum allowed cost of {max_cost}.",
+            extensions={
+                "code": QueryErrorCodes.QUERY_TOO_COMPLEX.value,
+                "cost": cost,
+                "maxCost": max_cost,
+            },
+        )
+
+    def get_operation_cost(self, request, data) -> int:
+        """Return the cost of the operation, the invalid operations are free
+        since they fail without being executed."""
+        try:
+            query, variables, operation_name, _ = self.get_graphql_params(
+                request, data
+            )
+            document = self.get_backend(request).document_from_string(
+                self.schema, query
+            )
+        except Exception:
+            return 0
+        analyzer = QueryCostAnalyzer(
+            self.schema, document.document_ast, variable_values=variables
+        )
+        return analyzer.analyze(operation_name).cost
+
+    def get_rejected_operation_response(self, request, data, error) -> dict:
+        id = request.GET.get("id") or data.get("id")
+        return {"errors": [self.format_error(error)], "id": id, "status": 400}
+
+    def get_batch_groups(self, request, batch: List[dict], parallel: bool):
+        """Yield the indexes of the consecutive operations of the batch that
+        can be executed together, and whether they are executed in parallel."""
+        queries: List[int] = []
+        for index, data in enumerate(batch):
+            if parallel and self.is_query(request, data):
+                queries.append(index)
+                continue
+            if queries:
+                yield queries, len(queries) > 1
+                queries = []
+            yield [index], False
+        if queries:
+            yield queries, len(queries) > 1
+
+    def is_query(self, request, data) -> bool:
+        query, _, operation_name, _ = self.get_graphql_params(request, data)
+        try:
+            document = self.get_backend(request).document_from_string(
+                self.schema, query
+            )
+        except Exception:
+            return False
+        return document.get_operation_type(operation_name) == "query"
+
+    def get_parallel_response(self, request, data) -> Tuple[dict, int]:
+        # the operation gets a copy of the request, the attributes set while
+        # executing it and its identity map aren't shared with the others
+        request = copy.copy(request)
+        setattr(request, IDENTITY_MAP_ATTRIBUTE, IdentityMap())
+        prepare_batch_connections()
+        return self.get_batch_operation_response(request, data)
+
+    def get_batch_operation_response(self, request, data) -> Tuple[dict, int]:
+        """Return the result of an operation of a batch, the request errors
+        only fail their operation."""
+        try:
+            return self.get_operation_response(request, data, batch=True)
+        except HttpError as e:
+            status_code = e.response.status_code
+            _, _, _, id = self.get_graphql_params(request, data)
+            response = {"errors": [self.format_error(e)]}
+            return {**response, "id": id, "status": status_code}, status_code
+
+    def get_operation_response(
+        self, request, data, show_graphiql=False, batch=False
+    ) -> Tuple[dict, int]:
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if not execution_result:
+            return None, status_code
+
+        response = {}
+        if execution_result.errors:
+            set_rollback()
+            response["errors"] = [
+                self.format_error(e) for e in execution_result.errors
+            ]
+
+        if execution_result.invalid:
+            status_code = 400
+        else:
+            response["data"] = execution_result.data
+
+        extensions = dict(execution_result.extensions or {})
+        identity_map = getattr(request, IDENTITY_MAP_ATTRIBUTE, None)
+        if settings.DEBUG and identity_map is not None:
+            extensions["identityMap"] = identity_map.stats()
+        query_trace = getattr(request, QUERY_TRACE_ATTRIBUTE, None)
+        if settings.DEBUG and query_trace is not None:
+            extensions["queryTrace"] = query_trace.as_dict()
+        profiler = getattr(request, PROFILER_ATTRIBUTE, None)
+        if profiler is not None:
+            extensions["profile"] = os.path.basename(profiler.path)
+        if extensions:
+            response["extensions"] = extensions
+
+        if batch:
+            response["id"] = id
+            response["status"] = status_code
+
+        return response, status_code
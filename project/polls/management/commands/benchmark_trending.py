@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+import uuid
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...trending import BUCKET_SECONDS, Leaderboard, TrendingWindow, get_bucket
+
+
+def get_brute_force_top(events, window: TrendingWindow, first: int, now: float):
+    """Return the top questions of the window summed from all the events."""
+    votes = Counter()
+    for question_id, count, timestamp in events:
+        if get_bucket(timestamp) + BUCKET_SECONDS > now - window.value:
+            votes[question_id] += count
+    ranking = sorted(
+        (-count, question_id) for question_id, count in votes.items() if count
+    )
+    return [(question_id, -count) for count, question_id in ranking[:first]]
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay random votes over two simulated days in the trending "
+        "leaderboard, compare its top questions with a brute-force count of "
+        "the votes and measure the time of the votes and of the reads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=2_000)
+        parser.add_argument("--votes", type=int, default=200_000)
+        parser.add_argument("--first", type=int, default=10)
+        parser.add_argument(
+            "--checks",
+            type=int,
+            default=50,
+            help="Number of comparisons with the brute-force count.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        question_ids = [
+            str(uuid.UUID(int=rng.getrandbits(128)))
+            for _ in range(options["questions"])
+        ]
+        duration = 2 * TrendingWindow.DAY.value
+        start = 1_700_000_000.0
+        step = duration / options["votes"]
+        check_every = max(options["votes"] // options["checks"], 1)
+
+        leaderboard = Leaderboard()
+        events = []
+        record_times, top_times = [], []
+        checks = 0
+        for index in range(options["votes"]):
+            now = start + index * step
+            # a few questions get most of the votes, the trending ones change
+            # every hour
+            hot = int(now // TrendingWindow.HOUR.value)
+            question_id = question_ids[
+                int(rng.paretovariate(1.2) * (hot + 1)) % len(question_ids)
+            ]
+            count = rng.randint(1, 3)
+            events.append((question_id, count, now))
+
+            started = time.perf_counter()
+            leaderboard.record(question_id, count, now=now)
+            record_times.append(time.perf_counter() - started)
+
+            if index % check_every:
+                continue
+            for window in TrendingWindow:
+                started = time.perf_counter()
+                top = leaderboard.top(window, options["first"], now=now)
+                top_times.append(time.perf_counter() - started)
+                expected = get_brute_force_top(events, window, options["first"], now)
+                if top != expected:
+                    raise CommandError(
+                        f"The {window.name} leaderboard at {now - start:.0f} s is "
+                        f"{top}, the brute-force count is {expected}."
+                    )
+                checks += 1
+            # the events of the brute-force count older than the windows
+            # can't be counted anymore
+            oldest = now - TrendingWindow.DAY.value - BUCKET_SECONDS
+            events = [event for event in events if event[2] >= oldest]
+
+        self.stdout.write(
+            f"{checks} leaderboards matched the brute-force count, "
+            f"{len(leaderboard.buckets)} buckets kept."
+        )
+        for name, times in (("record", record_times), ("top", top_times)):
+            self.stdout.write(
+                f"{name:<8}{statistics.mean(times) * 1e6:>10.1f} µs mean "
+                f"{sorted(times)[int(len(times) * 0.99)] * 1e6:>10.1f} µs p99"
+            )
@@ -0,0 +1,87 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...transfer import (
+    WRITERS,
+    get_format,
+    iter_question_batches,
+    load_checkpoint,
+    save_checkpoint,
+    write_csv_header,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the questions with their choices as JSON lines or CSV, at "
+        "constant memory. An interrupted export resumes from its checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Path of the exported file.")
+        parser.add_argument(
+            "--format",
+            choices=sorted(WRITERS),
+            help="Format of the file, from its extension by default.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--checkpoint",
+            help=(
+                "Path of the checkpoint, the output path with `.checkpoint` by "
+                "default."
+            ),
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the checkpoint and export from the first question.",
+        )
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        format = get_format(output, options["format"])
+        write = WRITERS[format]
+        checkpoint_path = options["checkpoint"] or f"{output}.checkpoint"
+        checkpoint = None
+        if not options["restart"] and os.path.exists(output):
+            checkpoint = load_checkpoint(checkpoint_path)
+
+        started = time.perf_counter()
+        exported = 0
+        mode = "r+b" if checkpoint else "wb"
+        with open(output, mode) as output_file:
+            if checkpoint:
+                # the questions written after the checkpoint are written again
+                output_file.truncate(checkpoint["offset"])
+                output_file.seek(checkpoint["offset"])
+                exported = checkpoint["questions"]
+                self.stderr.write(f"Resuming after {exported} questions.")
+            elif format == "csv":
+                write_csv_header(output_file)
+
+            after = checkpoint["last_id"] if checkpoint else None
+            for batch in iter_question_batches(after, options["batch_size"]):
+                for question in batch:
+                    write(output_file, question)
+                output_file.flush()
+                os.fsync(output_file.fileno())
+                exported += len(batch)
+                save_checkpoint(
+                    checkpoint_path,
+                    {
+                        "last_id": batch[-1]["id"],
+                        "offset": output_file.tell(),
+                        "questions": exported,
+                    },
+                )
+                self.stderr.write(
+                    f"Exported {exported} questions "
+                    f"({time.perf_counter() - started:.1f} s)."
+                )
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(f"Exported {exported} questions to {output}.")
@@ -0,0 +1,98 @@
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from ...transfer import (
+    READERS,
+    clean_question,
+    get_format,
+    import_questions,
+    load_checkpoint,
+    save_checkpoint,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the questions with their choices of a JSON lines or CSV file "
+        "of `export_polls`. The file is parsed lazily and the questions are "
+        "created by batches, each in its own transaction. An interrupted "
+        "import resumes from its checkpoint, the existing questions are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="Path of the imported file.")
+        parser.add_argument(
+            "--format",
+            choices=sorted(READERS),
+            help="Format of the file, from its extension by default.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--checkpoint",
+            help=(
+                "Path of the checkpoint, the input path with `.checkpoint` by "
+                "default."
+            ),
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the checkpoint and import from the first question.",
+        )
+        parser.add_argument(
+            "--skip-invalid",
+            action="store_true",
+            help="Report the invalid questions and import the others.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["input"]
+        read = READERS[get_format(path, options["format"])]
+        checkpoint_path = options["checkpoint"] or f"{path}.checkpoint"
+        checkpoint = None if options["restart"] else load_checkpoint(checkpoint_path)
+        totals = {"questions": 0, "choices": 0, "skipped": 0, "invalid": 0}
+        offset = 0
+        if checkpoint:
+            offset = checkpoint["offset"]
+            totals.update(checkpoint["totals"])
+            self.stderr.write(f"Resuming at byte {offset}.")
+
+        started = time.perf_counter()
+        with open(path, "rb") as input_file:
+            batch = []
+            for data, end in read(input_file, offset):
+                try:
+                    batch.append(clean_question(data))
+                except ValidationError as error:
+                    if not options["skip_invalid"]:
+                        raise CommandError(
+                            f"Invalid question before byte {end}: {error.messages}"
+                        )
+                    totals["invalid"] += 1
+                    self.stderr.write(f"Skipped an invalid question before byte {end}.")
+                if len(batch) == options["batch_size"]:
+                    self.import_batch(batch, totals, checkpoint_path, end, started)
+                    batch = []
+                offset = end
+            if batch:
+                self.import_batch(batch, totals, checkpoint_path, offset, started)
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(
+            f"Imported {totals['questions']} questions and {totals['choices']} "
+            f"choices, skipped {totals['skipped']} existing and "
+            f"{totals['invalid']} invalid questions."
+        )
+
+    def import_batch(self, batch, totals, checkpoint_path, offset, started):
+        for name, count in import_questions(batch).items():
+            totals[name] += count
+        save_checkpoint(checkpoint_path, {"offset": offset, "totals": totals})
+        self.stderr.write(
+            f"Imported {totals['questions']} questions "
+            f"({time.perf_counter() - started:.1f} s)."
+        )
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ...search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Index again all the questions in the search index, e.g. after a "
+        "backfill or a bulk import of questions and choices."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        if not backend.supported:
+            raise CommandError(
+                f"Full-text search isn't supported on {connection.vendor}."
+            )
+        started = time.perf_counter()
+        indexed = backend.rebuild(options["batch_size"])
+        self.stdout.write(
+            f"Indexed {indexed} questions in {time.perf_counter() - started:.2f} s."
+        )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from ...totals import get_drifted_question_ids, refresh_question_totals
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the totals of the questions with their choices and compute "
+        "again the totals that drifted, e.g. after a bulk update of the choices."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the questions whose totals drifted.",
+        )
+
+    def handle(self, *args, **options):
+        question_ids = get_drifted_question_ids()
+        if options["dry_run"]:
+            for question_id in question_ids:
+                self.stdout.write(str(question_id))
+            self.stdout.write(f"{len(question_ids)} questions have drifted totals.")
+            return
+
+        for start in range(0, len(question_ids), BATCH_SIZE):
+            refresh_question_totals(question_ids[start : start + BATCH_SIZE])
+        self.stdout.write(f"Reconciled the totals of {len(question_ids)} questions.")
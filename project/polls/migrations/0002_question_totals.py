@@ -0,0 +1,40 @@
+# Generated by Django 3.2.12 on 2026-10-19 09:55
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def compute_question_totals(apps, schema_editor):
+    Question = apps.get_model("polls", "Question")
+    Choice = apps.get_model("polls", "Choice")
+    choices = Choice.objects.filter(question=OuterRef("pk")).order_by().values("question")
+    Question.objects.update(
+        choice_count=Coalesce(
+            Subquery(choices.annotate(count=Count("pk")).values("count")), 0
+        ),
+        total_votes=Coalesce(
+            Subquery(choices.annotate(total=Sum("votes")).values("total")), 0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='choice_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='total_votes',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(compute_question_totals, migrations.RunPython.noop),
+    ]
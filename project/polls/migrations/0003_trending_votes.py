@@ -0,0 +1,28 @@
+# Generated by Django 3.2.12 on 2026-10-19 09:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0002_question_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingVotes',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('bucket', models.DateTimeField(db_index=True)),
+                ('votes', models.IntegerField(default=0)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='polls.question')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='trendingvotes',
+            constraint=models.UniqueConstraint(fields=('question', 'bucket'), name='trending_votes_question_bucket'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 3.2.12 on 2026-10-19 10:20
+
+from django.db import migrations
+
+# Statements creating and dropping the search index, by database vendor.
+SEARCH_INDEX_SQL = {
+    "sqlite": (
+        [
+            """
+            CREATE TABLE polls_question_search (
+                id integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+                question_id char(32) NOT NULL UNIQUE,
+                question_text text NOT NULL,
+                choices_text text NOT NULL
+            )
+            """,
+            """
+            CREATE VIRTUAL TABLE polls_question_search_fts USING fts5(
+                question_text,
+                choices_text,
+                content='polls_question_search',
+                content_rowid='id',
+                tokenize='porter unicode61 remove_diacritics 2'
+            )
+            """,
+            """
+            CREATE TRIGGER polls_question_search_insert
+            AFTER INSERT ON polls_question_search BEGIN
+                INSERT INTO polls_question_search_fts(rowid, question_text, choices_text)
+                VALUES (new.id, new.question_text, new.choices_text);
+            END
+            """,
+            """
+            CREATE TRIGGER polls_question_search_delete
+            AFTER DELETE ON polls_question_search BEGIN
+                INSERT INTO polls_question_search_fts(
+                    polls_question_search_fts, rowid, question_text, choices_text
+                )
+                VALUES ('delete', old.id, old.question_text, old.choices_text);
+            END
+            """,
+        ],
+        [
+            "DROP TRIGGER polls_question_search_delete",
+            "DROP TRIGGER polls_question_search_insert",
+            "DROP TABLE polls_question_search_fts",
+            "DROP TABLE polls_question_search",
+        ],
+    ),
+    "postgresql": (
+        [
+            """
+            CREATE TABLE polls_question_search (
+                question_id uuid NOT NULL PRIMARY KEY
+                    REFERENCES polls_question (id) ON DELETE CASCADE,
+                document tsvector NOT NULL
+            )
+            """,
+            """
+            CREATE INDEX polls_question_search_document
+            ON polls_question_search USING gin (document)
+            """,
+        ],
+        ["DROP TABLE polls_question_search"],
+    ),
+}
+
+
+def create_search_index(apps, schema_editor):
+    statements, _ = SEARCH_INDEX_SQL.get(schema_editor.connection.vendor, ([], []))
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    _, statements = SEARCH_INDEX_SQL.get(schema_editor.connection.vendor, ([], []))
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_trending_votes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,13 +1,33 @@
 from django.db import models
+from django.db.models import Count, Sum
+from django.dispatch import Signal
 
 from ..core.permissions import ChoicePermissions, QuestionPermissions
-from ..core.models import SimpleModel
+from ..core.models import BaseModel, SimpleModel
+
+
+# Sent after choices are deleted by `Choice.delete` or `Choice.objects.delete`,
+# with `changes`, the number of deleted choices and their votes by question ID,
+# and `instances`, the deleted instances. The choices deleted with their
+# question don't send it, so they're deleted by a single query.
+choices_deleted = Signal()
 
 
 class Question(SimpleModel):
     question_text = models.CharField(max_length=200)
+    # totals of the choices, maintained by the signals of `polls.signals` and
+    # computed again by `totals.refresh_question_totals`
+    choice_count = models.PositiveIntegerField(default=0)
+    total_votes = models.BigIntegerField(default=0)
 
     class Meta:
+        # indexes of the orderings of the `questions` query
+        indexes = (
+            models.Index(fields=("-created", "-id"), name="question_created_idx"),
+            models.Index(
+                fields=("-total_votes", "-id"), name="question_total_votes_idx"
+            ),
+        )
         permissions = (
             (
                 QuestionPermissions.MANAGE_QUESTIONS.codename,
@@ -16,6 +36,22 @@ class Question(SimpleModel):
         )
 
 
+class ChoiceQuerySet(models.QuerySet):
+    def delete(self):
+        changes = {
+            row["question_id"]: (row["count"], row["votes"] or 0)
+            for row in self.order_by()
+            .values("question_id")
+            .annotate(count=Count("pk"), votes=Sum("votes"))
+        }
+        deleted = super().delete()
+        choices_deleted.send(sender=self.model, changes=changes, instances=[])
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Choice(SimpleModel):
     question = models.ForeignKey(
         Question,
@@ -25,10 +61,63 @@ class Choice(SimpleModel):
     choice_text = models.CharField(max_length=200)
     votes = models.IntegerField(default=0)
 
+    objects = ChoiceQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # the saved values, the totals of the question are only updated when
+        # they change
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def delete(self, *args, **kwargs):
+        loaded = getattr(self, "_loaded_values", {})
+        changes = {
+            loaded.get("question_id", self.question_id): (
+                1,
+                loaded.get("votes", self.votes),
+            )
+        }
+        deleted = super().delete(*args, **kwargs)
+        choices_deleted.send(sender=type(self), changes=changes, instances=[self])
+        return deleted
+
     class Meta:
+        # indexes of the orderings of the choices of a question
+        indexes = (
+            models.Index(
+                fields=("question", "-created", "-id"),
+                name="choice_question_created_idx",
+            ),
+            models.Index(
+                fields=("question", "-votes", "-id"), name="choice_question_votes_idx"
+            ),
+        )
         permissions = (
             (
                 ChoicePermissions.MANAGE_CHOICES.codename,
                 "Manage choices.",
             ),
-        )
\ No newline at end of file
+        )
+
+
+class TrendingVotes(BaseModel):
+    """
+    Checkpoint of the votes of a question in a bucket of the trending
+    leaderboard, the bucket is the start of its minute.
+    """
+    question = models.ForeignKey(
+        Question,
+        related_name="+",
+        on_delete=models.CASCADE
+    )
+    bucket = models.DateTimeField(db_index=True)
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=("question", "bucket"), name="trending_votes_question_bucket"
+            ),
+        )
@@ -0,0 +1,231 @@
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import connection, transaction
+
+from .models import Choice, Question
+
+# Table of the indexed documents of the questions, created by the
+# `0004_question_search` migration.
+SEARCH_TABLE = "polls_question_search"
+# FTS5 index of the documents on SQLite, maintained by triggers of the table.
+SQLITE_FTS_TABLE = "polls_question_search_fts"
+# Words of the searched text, the operators of the query syntaxes are ignored.
+WORD_RE = re.compile(r"\w+")
+
+# Relevance and ID of the last result of a page, the next page starts after it.
+SearchCursor = Tuple[float, str]
+
+
+def get_words(text: str) -> List[str]:
+    return WORD_RE.findall(text.lower())
+
+
+def get_documents(question_ids: Iterable) -> List[Tuple[object, str, str]]:
+    """Return the ID, the text and the text of the choices of the questions."""
+    choices = defaultdict(list)
+    for question_id, choice_text in (
+        Choice.objects.filter(question_id__in=question_ids)
+        .order_by("question_id", "created")
+        .values_list("question_id", "choice_text")
+    ):
+        choices[question_id].append(choice_text)
+    return [
+        (question_id, question_text, "\n".join(choices[question_id]))
+        for question_id, question_text in Question.objects.filter(
+            pk__in=question_ids
+        ).values_list("pk", "question_text")
+    ]
+
+
+class SearchBackend:
+    """Inverted index of the texts of the questions and of their choices.
+
+    Every question is a document of the index, its text is more relevant
+    than the texts of its choices. The results are ranked by relevance, then
+    by ID, and paginated by the cursor of the last result of a page.
+    """
+
+    # whether the questions can be searched on the database
+    supported = True
+    # SQL inserting a document, with the ID, the text and the choices text
+    insert_sql = ""
+    # SQL selecting the IDs and the relevance of the documents matching the
+    # query, aliased as `question_id` and `relevance`
+    match_sql = ""
+
+    def get_query(self, words: List[str]) -> str:
+        raise NotImplementedError
+
+    def to_db_id(self, question_id):
+        return Question._meta.pk.get_db_prep_value(question_id, connection)
+
+    def index_questions(self, question_ids: Iterable):
+        """Index again the questions, deleted questions are removed."""
+        question_ids = list(question_ids)
+        if not question_ids:
+            return
+        documents = get_documents(question_ids)
+        with transaction.atomic(), connection.cursor() as cursor:
+            self.delete(cursor, question_ids)
+            cursor.executemany(
+                self.insert_sql,
+                [
+                    (self.to_db_id(question_id), question_text, choices_text)
+                    for question_id, question_text, choices_text in documents
+                ],
+            )
+
+    def remove_questions(self, question_ids: Iterable):
+        with connection.cursor() as cursor:
+            self.delete(cursor, list(question_ids))
+
+    def delete(self, cursor, question_ids: List):
+        placeholders = ", ".join(["%s"] * len(question_ids))
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE question_id IN ({placeholders})",
+            [self.to_db_id(question_id) for question_id in question_ids],
+        )
+
+    def rebuild(self, batch_size: int) -> int:
+        """Index again all the questions and remove the documents of the
+        deleted questions, return the number of indexed questions.
+
+        The documents are replaced batch by batch, the index is searchable
+        during the rebuild.
+        """
+        question_ids = Question.objects.order_by("pk").values_list("pk", flat=True)
+        indexed = 0
+        last_id = None
+        while True:
+            batch = question_ids
+            if last_id is not None:
+                batch = batch.filter(pk__gt=last_id)
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            self.index_questions(batch)
+            indexed += len(batch)
+            last_id = batch[-1]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE question_id NOT IN "
+                f"(SELECT id FROM {Question._meta.db_table})"
+            )
+        self.optimize()
+        return indexed
+
+    def optimize(self):
+        """Merge the structures of the index after many changes."""
+
+    def search(
+        self, text: str, first: int, after: Optional[SearchCursor] = None
+    ) -> List[Tuple[object, float]]:
+        """Return the IDs and the relevance of the `first` questions matching
+        all the words of the text, after the cursor."""
+        words = get_words(text)
+        if not words or first <= 0:
+            return []
+        sql = f"SELECT question_id, relevance FROM ({self.match_sql}) matches"
+        params = [self.get_query(words)]
+        if after is not None:
+            relevance, question_id = after
+            sql += (
+                " WHERE relevance < %s OR (relevance = %s AND question_id > %s)"
+            )
+            params += [relevance, relevance, self.to_db_id(question_id)]
+        sql += " ORDER BY relevance DESC, question_id LIMIT %s"
+        params.append(first)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return [
+            (Question._meta.pk.to_python(question_id), relevance)
+            for question_id, relevance in rows
+        ]
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 index with the documents table as external content, ranked by
+    BM25."""
+
+    insert_sql = (
+        f"INSERT INTO {SEARCH_TABLE} (question_id, question_text, choices_text) "
+        "VALUES (%s, %s, %s)"
+    )
+    # the weights of the columns are the text and the choices text, BM25 is
+    # lower for the most relevant documents
+    match_sql = (
+        f"SELECT documents.question_id, -bm25({SQLITE_FTS_TABLE}, 2.0, 1.0) "
+        f"AS relevance FROM {SQLITE_FTS_TABLE} "
+        f"JOIN {SEARCH_TABLE} documents ON documents.id = {SQLITE_FTS_TABLE}.rowid "
+        f"WHERE {SQLITE_FTS_TABLE} MATCH %s"
+    )
+
+    def optimize(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('optimize')"
+            )
+
+    def get_query(self, words: List[str]) -> str:
+        # the last word is a prefix, the results follow the typing
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += "*"
+        return " ".join(terms)
+
+
+class PostgresSearchBackend(SearchBackend):
+    """`tsvector` index with a GIN index, ranked by `ts_rank`."""
+
+    insert_sql = (
+        f"INSERT INTO {SEARCH_TABLE} (question_id, document) VALUES (%s, "
+        "setweight(to_tsvector('english', %s), 'A') || "
+        "setweight(to_tsvector('english', %s), 'B'))"
+    )
+    match_sql = (
+        "SELECT question_id, ts_rank(document, query) AS relevance "
+        f"FROM {SEARCH_TABLE}, to_tsquery('english', %s) query "
+        "WHERE document @@ query"
+    )
+
+    def get_query(self, words: List[str]) -> str:
+        terms = list(words)
+        terms[-1] += ":*"
+        return " & ".join(terms)
+
+
+class NullSearchBackend(SearchBackend):
+    """Backend of the databases without full-text search, the questions
+    aren't indexed and can't be searched."""
+
+    supported = False
+
+    def index_questions(self, question_ids: Iterable):
+        pass
+
+    def remove_questions(self, question_ids: Iterable):
+        pass
+
+    def rebuild(self, batch_size: int) -> int:
+        return 0
+
+    def search(
+        self, text: str, first: int, after: Optional[SearchCursor] = None
+    ) -> List[Tuple[object, float]]:
+        return []
+
+
+SEARCH_BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def get_search_backend() -> SearchBackend:
+    """Return the search backend of the database, the questions aren't
+    indexed on the databases without full-text search."""
+    return SEARCH_BACKENDS.get(connection.vendor, NullSearchBackend)()
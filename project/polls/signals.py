@@ -0,0 +1,172 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ..core.pubsub import get_pubsub
+from .models import Choice, Question, choices_deleted
+from .search import get_search_backend
+from .totals import refresh_question_totals, update_question_totals
+from .trending import publish_votes
+
+# Fields of a choice counted in the totals of its question.
+TOTALS_FIELDS = ("question_id", "votes")
+# Fields of a choice indexed in the search document of its question.
+SEARCH_FIELDS = ("question_id", "choice_text")
+
+# Question IDs collected by `collect_on_commit` in the current transaction.
+_collected = threading.local()
+
+
+def get_cached_questions(choice: Choice):
+    """Return the loaded question of the choice, its totals are updated with
+    the totals of the row."""
+    return [choice.question] if Choice.question.is_cached(choice) else []
+
+
+def get_question_channel(question_id) -> str:
+    return f"polls.question.{question_id}"
+
+
+def collect_on_commit(handler, question_ids):
+    """Collect the question IDs until the transaction commits, then call the
+    handler once with all of them.
+
+    The collected IDs are tied to the commit hooks of the transaction, the
+    hooks and the IDs are discarded together by a rollback.
+    """
+    connection = transaction.get_connection()
+    question_ids = {question_id for question_id in question_ids if question_id}
+    if not question_ids:
+        return
+    if not connection.in_atomic_block:
+        handler(question_ids)
+        return
+    collected = getattr(_collected, "hooks", None)
+    if collected is None or collected[0] is not connection.run_on_commit:
+        collected = _collected.hooks = (connection.run_on_commit, {})
+    pending = collected[1].get(handler)
+    if pending is None:
+        pending = collected[1][handler] = set()
+        transaction.on_commit(lambda: handler(pending))
+    pending.update(question_ids)
+
+
+def publish_questions(question_ids):
+    pubsub = get_pubsub()
+    for question_id in question_ids:
+        pubsub.publish(get_question_channel(question_id))
+
+
+def index_questions(question_ids):
+    get_search_backend().index_questions(question_ids)
+
+
+def remove_questions(question_ids):
+    get_search_backend().remove_questions(question_ids)
+
+
+@receiver(post_save, sender=Choice)
+def publish_choice_changed(sender, instance, **kwargs):
+    """Tell the subscriptions that the choices of the question changed, once
+    the change is committed."""
+    collect_on_commit(publish_questions, [instance.question_id])
+
+
+@receiver(post_save, sender=Choice)
+def publish_votes_on_save(sender, instance, created, **kwargs):
+    """Count the new votes of the choice in the trending leaderboard, once
+    they're committed. It's run before `update_totals_on_save`, which resets
+    the loaded values."""
+    loaded = getattr(instance, "_loaded_values", None)
+    if created:
+        votes = instance.votes
+    elif loaded is not None and loaded.get("question_id") == instance.question_id:
+        votes = instance.votes - loaded.get("votes", instance.votes)
+    else:
+        # the votes moved to another question aren't new votes
+        votes = 0
+    if votes > 0:
+        question_id = instance.question_id
+        transaction.on_commit(lambda: publish_votes(question_id, votes))
+
+
+@receiver(post_save, sender=Question)
+def index_question_on_save(sender, instance, **kwargs):
+    collect_on_commit(index_questions, [instance.pk])
+
+
+@receiver(post_delete, sender=Question)
+def remove_question_on_delete(sender, instance, **kwargs):
+    """Remove the deleted questions from the search index, at once when the
+    deletion is committed. Their choices are deleted with them without
+    signals."""
+    collect_on_commit(remove_questions, [instance.pk])
+
+
+@receiver(post_save, sender=Choice)
+def index_choice_on_save(sender, instance, created, **kwargs):
+    """Index again the questions of the choice when its text or its question
+    changed. It's run before `update_totals_on_save`, which resets the loaded
+    values."""
+    loaded = getattr(instance, "_loaded_values", None)
+    if created or loaded is None:
+        collect_on_commit(index_questions, [instance.question_id])
+    elif any(
+        field not in loaded or loaded[field] != getattr(instance, field)
+        for field in SEARCH_FIELDS
+    ):
+        collect_on_commit(
+            index_questions, [instance.question_id, loaded.get("question_id")]
+        )
+
+
+@receiver(post_save, sender=Choice)
+def update_totals_on_save(sender, instance, created, **kwargs):
+    """Add the changes of the choice to the totals of its questions."""
+    loaded = getattr(instance, "_loaded_values", None)
+    questions = get_cached_questions(instance)
+    if created:
+        update_question_totals({instance.question_id: (1, instance.votes)}, questions)
+    elif loaded is None or any(field not in loaded for field in TOTALS_FIELDS):
+        # the saved values are unknown, the totals are computed again
+        question_ids = {instance.question_id, (loaded or {}).get("question_id")}
+        question_ids.discard(None)
+        refresh_question_totals(question_ids, questions)
+    elif loaded["question_id"] == instance.question_id:
+        update_question_totals(
+            {instance.question_id: (0, instance.votes - loaded["votes"])}, questions
+        )
+    else:
+        update_question_totals(
+            {
+                loaded["question_id"]: (-1, -loaded["votes"]),
+                instance.question_id: (1, instance.votes),
+            },
+            questions,
+        )
+    instance._loaded_values = {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+    }
+
+
+@receiver(choices_deleted, sender=Choice)
+def update_on_choices_deleted(sender, changes, instances, **kwargs):
+    """Remove the deleted choices from the totals, the search index and tell
+    the subscriptions."""
+    questions = [
+        question
+        for instance in instances
+        for question in get_cached_questions(instance)
+    ]
+    update_question_totals(
+        {
+            question_id: (-choice_count, -votes)
+            for question_id, (choice_count, votes) in changes.items()
+        },
+        questions,
+    )
+    collect_on_commit(index_questions, changes)
+    collect_on_commit(publish_questions, changes)
@@ -1,3 +1,1028 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import graphene
+from asgiref.sync import async_to_sync
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from graphql import parse
+
+from ..core.error_codes import QueryErrorCodes
+from ..core.pubsub import get_pubsub
+from ..core.query_plans import PLAN_PATTERNS, explain, get_plan_problems
+from ..graphql.api import schema
+from ..graphql.core.backend import GraphQLQueryCostBackend
+from ..graphql.core.identity_map import get_identity_map
+from ..graphql.core.middleware import QueryTracingMiddleware
+from ..graphql.core.query_cost import QueryCostAnalyzer
+from ..graphql.core.query_tracing import QueryBudgetExceeded, trace_queries
+from ..graphql.polls.filters import get_query_plan_checks
+from ..graphql.subscriptions import (
+    SubscriptionBroadcaster,
+    SubscriptionGroup,
+    subscriptions_application,
+)
+from ..graphql.views import GraphQLView
+from ..users.models import User
+from .management.commands.benchmark_trending import get_brute_force_top
+from . import trending
+from .models import Choice, Question, TrendingVotes
+from .search import SEARCH_BACKENDS, get_search_backend
+from .signals import get_question_channel
+from .totals import get_drifted_question_ids, refresh_question_totals
+from .transfer import clean_question, import_questions
+from .trending import Leaderboard, TrendingWindow, get_bucket, reset_leaderboard
+
+
+class GraphQLTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            email="admin@example.com", password="password"
+        )
+
+    def execute(self, query, variables=None, request=None, **kwargs):
+        if request is None:
+            request = RequestFactory().post("/graphql/")
+        request.user = self.user
+        result = schema.execute(
+            query, context_value=request, variable_values=variables, **kwargs
+        )
+        self.assertIsNone(result.errors)
+        return result.data
+
+    @staticmethod
+    def create_questions(count, choices_per_question=2):
+        questions = Question.objects.bulk_create(
+            [Question(question_text=f"Question {i}") for i in range(count)]
+        )
+        Choice.objects.bulk_create(
+            [
+                Choice(question=question, choice_text=f"Choice {i}", votes=i)
+                for question in questions
+                for i in range(choices_per_question)
+            ]
+        )
+        return questions
+
+
+class IdentityMapMutationTests(GraphQLTestCase):
+    def test_failed_update_doesnt_leave_its_values_in_the_identity_map(self):
+        question = Question.objects.create(question_text="Original")
+        request = RequestFactory().post("/graphql/")
+        data = self.execute(
+            """
+            mutation($id: UUID!, $text: String!) {
+                failed: questionUpdate(id: $id, input: {questionText: $text}) {
+                    errors { field }
+                }
+                created: choiceCreate(input: {question: $id, choiceText: "Yes"}) {
+                    choice { question { questionText } }
+                }
+            }
+            """,
+            {"id": str(question.pk), "text": "x" * 201},
+            request=request,
+        )
+
+        self.assertEqual(data["failed"]["errors"], [{"field": "questionText"}])
+        self.assertEqual(
+            data["created"]["choice"]["question"]["questionText"], "Original"
+        )
+        cached = get_identity_map(request).get(Question, question.pk)
+        self.assertEqual(cached.question_text, "Original")
+
+    def test_choice_mutations_return_the_refreshed_totals_of_the_questions(self):
+        first, second = Question.objects.bulk_create(
+            [Question(question_text="First"), Question(question_text="Second")]
+        )
+        data = self.execute(
+            """
+            mutation($first: UUID!, $second: UUID!) {
+                loaded: questionUpdate(id: $second, input: {questionText: "Second"}) {
+                    question { totalVotes choiceCount }
+                }
+                created: choiceCreate(
+                    input: {question: $first, choiceText: "Yes", votes: 3}
+                ) {
+                    choice { id question { totalVotes choiceCount } }
+                }
+                added: choiceCreate(
+                    input: {question: $second, choiceText: "No", votes: 5}
+                ) {
+                    choice { id question { totalVotes choiceCount } }
+                }
+            }
+            """,
+            {"first": str(first.pk), "second": str(second.pk)},
+        )
+        totals = {"totalVotes": 3, "choiceCount": 1}
+        self.assertEqual(data["created"]["choice"]["question"], totals)
+        totals = {"totalVotes": 5, "choiceCount": 1}
+        self.assertEqual(data["added"]["choice"]["question"], totals)
+
+        data = self.execute(
+            """
+            mutation($id: UUID!, $first: UUID!, $second: UUID!) {
+                loaded: questionUpdate(id: $second, input: {questionText: "Second"}) {
+                    question { totalVotes }
+                }
+                moved: choiceUpdate(id: $id, input: {question: $first}) {
+                    choice { question { totalVotes choiceCount } }
+                }
+                previous: questionUpdate(id: $second, input: {questionText: "Second"}) {
+                    question { totalVotes choiceCount }
+                }
+            }
+            """,
+            {
+                "id": data["added"]["choice"]["id"],
+                "first": str(first.pk),
+                "second": str(second.pk),
+            },
+        )
+        totals = {"totalVotes": 8, "choiceCount": 2}
+        self.assertEqual(data["moved"]["choice"]["question"], totals)
+        totals = {"totalVotes": 0, "choiceCount": 0}
+        self.assertEqual(data["previous"]["question"], totals)
+
+
+class QuestionDeletionTests(TestCase):
+    def test_choices_are_deleted_with_their_question_by_a_single_query(self):
+        (question,) = GraphQLTestCase.create_questions(1, choices_per_question=3)
+
+        # the choices, the trending votes and the question
+        with self.assertNumQueries(3):
+            question.delete()
+        self.assertFalse(Choice.objects.exists())
+
+    def test_deleted_questions_are_removed_from_the_index_at_once(self):
+        questions = GraphQLTestCase.create_questions(3)
+
+        remove_patch = mock.patch("project.polls.signals.remove_questions")
+        index_patch = mock.patch("project.polls.signals.index_questions")
+        with remove_patch as remove, index_patch as index:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                Question.objects.all().delete()
+                Choice.objects.all().delete()
+
+        self.assertEqual(len(callbacks), 1)
+        remove.assert_called_once_with({question.pk for question in questions})
+        index.assert_not_called()
+
+
+class QuestionTotalsTests(TestCase):
+    def assertTotals(self, question, choice_count, total_votes):
+        question.refresh_from_db()
+        self.assertEqual(
+            (question.choice_count, question.total_votes), (choice_count, total_votes)
+        )
+
+    def test_totals_follow_the_changes_of_the_choices(self):
+        first, second = Question.objects.bulk_create(
+            [Question(question_text="First"), Question(question_text="Second")]
+        )
+        choice = Choice.objects.create(question=first, choice_text="Yes", votes=3)
+        Choice.objects.create(question=first, choice_text="No", votes=1)
+        self.assertTotals(first, 2, 4)
+
+        choice.votes = 5
+        choice.save()
+        self.assertTotals(first, 2, 6)
+
+        choice.question = second
+        choice.save()
+        self.assertTotals(first, 1, 1)
+        self.assertTotals(second, 1, 5)
+
+        choice.delete()
+        self.assertTotals(second, 0, 0)
+        Choice.objects.filter(question=first).delete()
+        self.assertTotals(first, 0, 0)
+
+    def test_reconcile_computes_the_drifted_totals_again(self):
+        # created without signals, the totals drift
+        drifted, exact = GraphQLTestCase.create_questions(2, choices_per_question=3)
+        Question.objects.filter(pk=exact.pk).update(choice_count=3, total_votes=3)
+
+        output = io.StringIO()
+        call_command("reconcile_poll_totals", dry_run=True, stdout=output)
+        self.assertIn(str(drifted.pk), output.getvalue())
+        self.assertNotIn(str(exact.pk), output.getvalue())
+        self.assertTotals(drifted, 0, 0)
+
+        call_command("reconcile_poll_totals", stdout=io.StringIO())
+        self.assertTotals(drifted, 3, 3)
+        self.assertEqual(get_drifted_question_ids(), [])
+
+
+class PollResultsTests(GraphQLTestCase):
+    POLL_RESULTS_QUERY = """
+        query($id: UUID!) {
+            pollResults(questionId: $id) {
+                totalVotes choiceCount choices { choiceText votes share }
+            }
+        }
+    """
+    POLL_RESULTS_BULK_QUERY = """
+        query($ids: [UUID!]!) { pollResultsBulk(ids: $ids) { questionId totalVotes } }
+    """
+
+    def test_results_have_the_shares_of_the_most_voted_choices_first(self):
+        question = Question.objects.create(question_text="Question")
+        for text, votes in [("Maybe", 0), ("Yes", 3), ("No", 1)]:
+            Choice.objects.create(question=question, choice_text=text, votes=votes)
+
+        data = self.execute(self.POLL_RESULTS_QUERY, {"id": str(question.pk)})
+
+        self.assertEqual(
+            data["pollResults"],
+            {
+                "totalVotes": 4,
+                "choiceCount": 3,
+                "choices": [
+                    {"choiceText": "Yes", "votes": 3, "share": 0.75},
+                    {"choiceText": "No", "votes": 1, "share": 0.25},
+                    {"choiceText": "Maybe", "votes": 0, "share": 0.0},
+                ],
+            },
+        )
+
+    def test_bulk_results_follow_the_ids_with_null_for_missing_questions(self):
+        questions = self.create_questions(2)
+        missing = uuid.uuid4()
+        ids = [str(questions[1].pk), str(missing), str(questions[0].pk)]
+
+        data = self.execute(self.POLL_RESULTS_BULK_QUERY, {"ids": ids})
+
+        self.assertEqual(
+            data["pollResultsBulk"],
+            [
+                {"questionId": ids[0], "totalVotes": 1},
+                None,
+                {"questionId": ids[2], "totalVotes": 1},
+            ],
+        )
+
+    @override_settings(GRAPHQL_POLL_RESULTS_MAX_BATCH_SIZE=1)
+    def test_bulk_results_reject_too_many_ids(self):
+        request = RequestFactory().post("/graphql/")
+        request.user = self.user
+        result = schema.execute(
+            self.POLL_RESULTS_BULK_QUERY,
+            context_value=request,
+            variable_values={"ids": [str(uuid.uuid4()), str(uuid.uuid4())]},
+        )
+        self.assertEqual(
+            result.errors[0].extensions["code"],
+            QueryErrorCodes.BATCH_TOO_LARGE.value,
+        )
+
+
+class NodeTests(GraphQLTestCase):
+    def test_node_is_fetched_by_the_global_id_of_the_object(self):
+        question = Question.objects.create(question_text="Question")
+        data = self.execute("{ questions { id globalId } }")
+        global_id = data["questions"][0]["globalId"]
+
+        data = self.execute(
+            "query($id: ID!) { node(id: $id) { ... on QuestionType { id } } }",
+            {"id": global_id},
+        )
+        self.assertEqual(data["node"], {"id": str(question.pk)})
+
+
+class QueryBudgetTests(GraphQLTestCase):
+    def test_operations_dont_query_once_per_result(self):
+        questions = self.create_questions(5)
+        ids = [str(question.pk) for question in questions]
+
+        with self.assertNumQueries(1):
+            self.execute("{ questions { id questionText totalVotes } }")
+        with self.assertNumQueries(1):
+            self.execute(
+                """
+                query($ids: [UUID!]!) {
+                    pollResultsBulk(ids: $ids) { questionId choices { votes } }
+                }
+                """,
+                {"ids": ids},
+            )
+
+    def test_repeated_queries_of_a_resolver_are_reported(self):
+        self.create_questions(5)
+
+        with trace_queries() as trace:
+            self.execute(
+                "query Questions { questions { choices { id } } }",
+                middleware=[QueryTracingMiddleware()],
+            )
+
+        self.assertEqual(trace.operation, "Questions")
+        repeated = trace.get_repeated_queries(threshold=5)
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0]["field"], "QuestionType.choices")
+        self.assertEqual(repeated[0]["count"], 5)
+        with self.assertRaises(QueryBudgetExceeded):
+            trace.check_budget(1)
+
+    @override_settings(GRAPHQL_QUERY_BUDGETS={"Questions": 1})
+    def test_operation_is_checked_against_its_declared_budget(self):
+        self.create_questions(5)
+
+        with trace_queries() as trace:
+            self.execute(
+                "query Questions { questions { id } }",
+                middleware=[QueryTracingMiddleware()],
+            )
+
+        self.assertEqual(trace.get_query_budget(), 1)
+        trace.check_budget()
+
+
+class CostItemType(graphene.ObjectType):
+    name = graphene.String()
+    items = graphene.List(
+        lambda: CostItemType,
+        first=graphene.Int(),
+        last=graphene.Int(),
+        limit=graphene.Int(),
+        ids=graphene.List(graphene.ID),
+    )
+
+
+class CostQuery(graphene.ObjectType):
+    items = graphene.Field(CostItemType)
+
+
+cost_schema = graphene.Schema(query=CostQuery)
+
+
+class QueryCostTests(SimpleTestCase):
+    def analyze(self, query, variables=None, schema=cost_schema):
+        analyzer = QueryCostAnalyzer(
+            schema, parse(query), variable_values=variables, default_list_size=100
+        )
+        return analyzer.analyze().as_dict()
+
+    def test_lists_are_multiplied_by_their_pagination_arguments(self):
+        for query, cost in [
+            ("{ items { items(first: 5) { items { name } } } }", 2 + 5),
+            ("{ items { items(last: 3) { items { name } } } }", 2 + 3),
+            ("{ items { items(limit: 7) { items { name } } } }", 2 + 7),
+            ('{ items { items(ids: ["1", "2"]) { items { name } } } }', 2 + 2),
+            ("{ items { items { items { name } } } }", 2 + 100),
+        ]:
+            with self.subTest(query):
+                self.assertEqual(self.analyze(query), {"depth": 4, "cost": cost})
+
+    def test_variables_and_their_default_values_are_used_as_multipliers(self):
+        query = """
+            query($first: Int = 4, $ids: [ID] = ["1", "2", "3"]) {
+                items {
+                    paginated: items(first: $first) { items { name } }
+                    selected: items(ids: $ids) { items { name } }
+                }
+            }
+        """
+        self.assertEqual(self.analyze(query)["cost"], 1 + (1 + 4) + (1 + 3))
+        cost = self.analyze(query, {"first": 2, "ids": ["1"]})["cost"]
+        self.assertEqual(cost, 1 + (1 + 2) + (1 + 1))
+
+    def test_fragments_are_counted_where_they_are_spread(self):
+        query = """
+            query {
+                items { ...Children ... on CostItemType { other: items(first: 2) {
+                    name
+                } } }
+            }
+            fragment Children on CostItemType { items(first: 5) { items { name } } }
+        """
+        self.assertEqual(self.analyze(query), {"depth": 4, "cost": 1 + (1 + 5) + 1})
+
+    def test_fields_are_weighted_by_their_declared_cost(self):
+        # `QuestionType.choices` declares a cost of 10
+        self.assertEqual(
+            self.analyze("{ questions { id } }", schema=schema),
+            {"depth": 2, "cost": 1},
+        )
+        self.assertEqual(
+            self.analyze("{ questions { choices { id } } }", schema=schema),
+            {"depth": 3, "cost": 1 + 100 * 10},
+        )
+
+    @override_settings(GRAPHQL_QUERY_MAX_DEPTH=3, GRAPHQL_QUERY_MAX_COST=0)
+    def test_too_deep_operations_are_rejected(self):
+        with self.assertLogs("project.graphql.core.backend", "WARNING"):
+            result = schema.execute(
+                "{ questions { choices { question { id } } } }",
+                backend=GraphQLQueryCostBackend(),
+            )
+        self.assertEqual(
+            result.errors[0].extensions,
+            {"code": "query_too_deep", "depth": 4, "maxDepth": 3},
+        )
+
+    @override_settings(GRAPHQL_QUERY_MAX_DEPTH=0, GRAPHQL_QUERY_MAX_COST=1000)
+    def test_too_complex_operations_are_rejected(self):
+        with self.assertLogs("project.graphql.core.backend", "WARNING"):
+            result = schema.execute(
+                "{ questions { choices { id } } }", backend=GraphQLQueryCostBackend()
+            )
+        self.assertEqual(
+            result.errors[0].extensions,
+            {"code": "query_too_complex", "cost": 1001, "maxCost": 1000},
+        )
+
+
+class LeaderboardTests(SimpleTestCase):
+    def test_top_questions_match_a_brute_force_count_of_the_votes(self):
+        rng = random.Random(0)
+        question_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(50)]
+        start = 1_700_000_000.0
+        leaderboard = Leaderboard()
+        events = []
+        # two days of votes, the windows expire buckets all along
+        for index in range(3000):
+            now = start + index * 60
+            question_id = question_ids[int(rng.paretovariate(1.2)) % 50]
+            votes = rng.randint(1, 3)
+            events.append((question_id, votes, now))
+            leaderboard.record(question_id, votes, now=now)
+            if index % 97:
+                continue
+            for window in TrendingWindow:
+                self.assertEqual(
+                    leaderboard.top(window, 10, now=now),
+                    get_brute_force_top(events, window, 10, now),
+                )
+
+    def test_late_votes_are_counted_in_their_bucket(self):
+        start = get_bucket(1_700_000_000.0)
+        leaderboard = Leaderboard()
+        leaderboard.record("late", 2, now=start + 120)
+        leaderboard.record("early", 1, now=start)
+        leaderboard.record("late", 1, now=start + 60)
+
+        self.assertEqual(
+            leaderboard.top(TrendingWindow.HOUR, 2, now=start + 120),
+            [("late", 3), ("early", 1)],
+        )
+        self.assertEqual(
+            leaderboard.top(TrendingWindow.HOUR, 2, now=start + 3720),
+            [("late", 2)],
+        )
+
+
+class LeaderboardCheckpointTests(TestCase):
+    def test_new_leaderboard_loads_the_checkpointed_votes(self):
+        questions = Question.objects.bulk_create(
+            [Question(question_text=f"Question {i}") for i in range(5)]
+        )
+        leaderboard = Leaderboard()
+        for votes, question in enumerate(questions, start=1):
+            leaderboard.add_pending(str(question.pk), votes)
+            leaderboard.record(str(question.pk), votes)
+        leaderboard.checkpoint()
+
+        loaded = Leaderboard()
+        loaded.load()
+
+        for window in TrendingWindow:
+            self.assertEqual(loaded.top(window, 3), leaderboard.top(window, 3))
+        self.assertEqual(
+            loaded.top(TrendingWindow.HOUR, 1), [(str(questions[-1].pk), 5)]
+        )
+
+    @override_settings(TRENDING_CHECKPOINT_INTERVAL=30)
+    def test_pending_votes_are_checkpointed_by_a_timer(self):
+        leaderboard = Leaderboard()
+        self.addCleanup(leaderboard.stop)
+
+        with mock.patch.object(leaderboard, "checkpoint") as checkpoint:
+            leaderboard.add_pending("question", 1)
+            timer = leaderboard._timer
+            leaderboard.add_pending("question", 2)
+            checkpoint.assert_not_called()
+            self.assertIs(leaderboard._timer, timer)
+            self.assertTrue(timer.is_alive())
+            self.assertEqual(timer.interval, 30)
+
+            # the timer thread closes its own connections
+            with mock.patch.object(trending, "connections"):
+                timer.function()
+        checkpoint.assert_called_once_with()
+        self.assertIsNone(leaderboard._timer)
+
+    def test_reset_checkpoints_the_pending_votes_and_drops_the_leaderboard(self):
+        question = Question.objects.create(question_text="Question")
+        leaderboard = Leaderboard()
+        leaderboard.add_pending(str(question.pk), 3)
+
+        with mock.patch.multiple(
+            trending, _leaderboard=leaderboard, _leaderboard_pid=os.getpid()
+        ):
+            reset_leaderboard()
+            self.assertIsNone(trending._leaderboard)
+
+        self.assertIsNone(leaderboard._timer)
+        self.assertEqual(
+            list(TrendingVotes.objects.values_list("question_id", "votes")),
+            [(question.pk, 3)],
+        )
+
+
+class UnsupportedSearchTests(GraphQLTestCase):
+    def setUp(self):
+        backends_patch = mock.patch.dict(SEARCH_BACKENDS, clear=True)
+        backends_patch.start()
+        self.addCleanup(backends_patch.stop)
+        get_search_backend.cache_clear()
+        self.addCleanup(get_search_backend.cache_clear)
+
+    def test_questions_are_saved_without_search_and_cant_be_searched(self):
+        question = Question.objects.create(question_text="Unindexed")
+        with self.captureOnCommitCallbacks(execute=True):
+            Choice.objects.create(question=question, choice_text="Yes")
+
+        request = RequestFactory().post("/graphql/")
+        request.user = self.user
+        result = schema.execute(
+            '{ searchQuestions(text: "unindexed") { edges { relevance } } }',
+            context_value=request,
+        )
+        self.assertEqual(
+            result.errors[0].extensions["code"], "search_not_supported"
+        )
+
+
+@skipUnless(connection.vendor in PLAN_PATTERNS, "The plans aren't checked.")
+class QueryPlanTests(TestCase):
+    def test_filtered_orderings_seek_their_index(self):
+        for name, queryset in get_query_plan_checks():
+            with self.subTest(name):
+                plan = explain(queryset)
+                self.assertEqual(get_plan_problems(plan), [], plan)
+
+
+@override_settings(GRAPHQL_BATCH_PARALLEL_WORKERS=2, DEBUG=False)
+class BatchRequestTests(TestCase):
+    def post_batch(self, *queries):
+        response = self.client.post(
+            "/graphql/",
+            json.dumps([{"query": query} for query in queries]),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_parallel_operations_get_their_own_request_and_identity_map(self):
+        contexts = []
+
+        def get_operation_response(view, request, data, **kwargs):
+            contexts.append(request)
+            return {"data": {}}, 200
+
+        with mock.patch.object(
+            GraphQLView, "get_operation_response", get_operation_response
+        ):
+            self.post_batch("{ questions { id } }", "{ questions { id } }")
+
+        self.assertEqual(len(contexts), 2)
+        first, second = contexts
+        self.assertIsNot(first, second)
+        self.assertIsNot(get_identity_map(first), get_identity_map(second))
+
+    @override_settings(GRAPHQL_QUERY_TRACING="strict")
+    def test_traced_batches_arent_executed_in_parallel(self):
+        with mock.patch.object(GraphQLView, "get_parallel_response") as parallel:
+            results = self.post_batch("{ questions { id } }", "{ questions { id } }")
+
+        parallel.assert_not_called()
+        self.assertEqual(
+            [result["data"] for result in results], [{"questions": []}] * 2
+        )
+
+    @override_settings(GRAPHQL_QUERY_MAX_COST=1001, GRAPHQL_BATCH_MAX_COST=1500)
+    def test_the_costs_of_the_operations_share_the_budget_of_the_batch(self):
+        query = "{ questions { choices { id } } }"
+        self.assertEqual(self.post_batch(query)[0]["data"], {"questions": []})
+
+        with mock.patch.object(GraphQLView, "get_operation_response") as execute:
+            results = self.post_batch(query, query)
+
+        execute.assert_not_called()
+        for result in results:
+            self.assertEqual(result["status"], 400)
+            self.assertEqual(
+                result["errors"][0]["extensions"],
+                {"code": "query_too_complex", "cost": 2002, "maxCost": 1500},
+            )
+
+    def test_parallel_operations_reuse_the_connections_of_their_thread(self):
+        threads = set()
+        get_batch_operation_response = GraphQLView.get_batch_operation_response
+
+        def get_operation_response(view, request, data):
+            threads.add(threading.get_ident())
+            return get_batch_operation_response(view, request, data)
+
+        with mock.patch.object(
+            GraphQLView, "get_batch_operation_response", get_operation_response
+        ), mock.patch.object(
+            type(connections["default"]), "close", autospec=True
+        ) as close:
+            for _ in range(3):
+                self.post_batch("{ questions { id } }", "{ questions { id } }")
+
+        self.assertNotIn(threading.get_ident(), threads)
+        close.assert_not_called()
+
+
+class WebSocketClient:
+    """Client of `subscriptions_application`, the ASGI events are exchanged
+    through queues. The client stops receiving the messages once blocked."""
+
+    def __init__(self, subprotocols=("graphql-ws",)):
+        self.scope = {
+            "type": "websocket",
+            "path": "/graphql/",
+            "subprotocols": list(subprotocols),
+        }
+        self.events = asyncio.Queue()
+        self.messages = asyncio.Queue()
+        self.blocked = False
+
+    def connect(self):
+        self.application = asyncio.get_running_loop().create_task(
+            subscriptions_application(self.scope, self.events.get, self.send)
+        )
+        self.events.put_nowait({"type": "websocket.connect"})
+
+    async def send(self, message):
+        if self.blocked and message["type"] == "websocket.send":
+            await asyncio.Event().wait()
+        self.messages.put_nowait(message)
+
+    def send_json(self, message):
+        text = json.dumps(message)
+        self.events.put_nowait({"type": "websocket.receive", "text": text})
+
+    async def disconnect(self):
+        self.events.put_nowait({"type": "websocket.disconnect"})
+        await self.application
+
+    async def receive(self):
+        return await asyncio.wait_for(self.messages.get(), 1)
+
+    async def receive_json(self):
+        return json.loads((await self.receive())["text"])
+
+    async def subscribe(self, id, query, variables=None):
+        """Start the operation, return the messages received once it's
+        subscribed."""
+        self.send_json(
+            {
+                "type": "start",
+                "id": id,
+                "payload": {"query": query, "variables": variables},
+            }
+        )
+        # the messages are handled in order
+        self.send_json({"type": "connection_init"})
+        messages = []
+        while True:
+            message = await self.receive_json()
+            if message["type"] == "connection_ack":
+                return messages
+            messages.append(message)
+
+
+@override_settings(
+    GRAPHQL_SUBSCRIPTION_QUEUE_SIZE=3, GRAPHQL_SUBSCRIPTION_SEND_TIMEOUT=1000
+)
+class SubscriptionTests(TestCase):
+    subscription = """
+        subscription($id: UUID!) {
+            choiceVotesChanged(questionId: $id) { totalVotes }
+        }
+    """
+
+    def setUp(self):
+        self.question = Question.objects.create(question_text="Subscribed")
+        self.variables = {"id": str(self.question.pk)}
+
+    def run_clients(self, scenario):
+        async def run():
+            broadcaster = SubscriptionBroadcaster(interval=3600)
+            with mock.patch(
+                "project.graphql.subscriptions.get_broadcaster",
+                return_value=broadcaster,
+            ):
+                try:
+                    await scenario(broadcaster)
+                finally:
+                    broadcaster._task.cancel()
+
+        async_to_sync(run)()
+
+    async def publish(self, broadcaster, count=1):
+        """Publish events of the question and flush them."""
+        for _ in range(count):
+            get_pubsub().publish(get_question_channel(self.question.pk))
+        # the events are added to the pending channels by the event loop
+        await asyncio.sleep(0)
+        channels, broadcaster.pending = broadcaster.pending, set()
+        await broadcaster.flush(channels)
+
+    def assert_unsubscribed(self, broadcaster):
+        self.assertEqual(broadcaster.groups, {})
+        self.assertEqual(broadcaster.channel_groups, {})
+        self.assertEqual(broadcaster.subscriptions, {})
+        channel = get_question_channel(self.question.pk)
+        self.assertNotIn(channel, get_pubsub()._subscribers)
+
+    def test_operations_follow_the_subscriptions_transport_ws_protocol(self):
+        async def scenario(broadcaster):
+            rejected = WebSocketClient(subprotocols=())
+            rejected.connect()
+            self.assertEqual(
+                await rejected.receive(), {"type": "websocket.close", "code": 1002}
+            )
+
+            client = WebSocketClient()
+            client.connect()
+            self.assertEqual(
+                await client.receive(),
+                {"type": "websocket.accept", "subprotocol": "graphql-ws"},
+            )
+            client.send_json({"type": "connection_init"})
+            self.assertEqual(await client.receive_json(), {"type": "connection_ack"})
+            client.events.put_nowait({"type": "websocket.receive", "text": "{"})
+            self.assertEqual((await client.receive_json())["type"], "error")
+            client.send_json({"type": "unknown"})
+            self.assertEqual((await client.receive_json())["type"], "error")
+
+            messages = await client.subscribe("query", "{ questions { id } }")
+            error = {"message": "Only subscriptions are executed by WebSocket."}
+            self.assertEqual(
+                messages,
+                [
+                    {"type": "data", "id": "query", "payload": {"errors": [error]}},
+                    {"type": "complete", "id": "query"},
+                ],
+            )
+
+            messages = await client.subscribe(
+                "votes", self.subscription, self.variables
+            )
+            self.assertEqual(messages, [])
+            await self.publish(broadcaster)
+            self.assertEqual(
+                await client.receive_json(),
+                {
+                    "type": "data",
+                    "id": "votes",
+                    "payload": {"data": {"choiceVotesChanged": {"totalVotes": 0}}},
+                },
+            )
+            client.send_json({"type": "stop", "id": "votes"})
+            self.assertEqual(
+                await client.receive_json(), {"type": "complete", "id": "votes"}
+            )
+            self.assert_unsubscribed(broadcaster)
+
+            client.send_json({"type": "connection_terminate"})
+            self.assertEqual(
+                await client.receive(), {"type": "websocket.close", "code": 1000}
+            )
+            await client.application
+
+        self.run_clients(scenario)
+
+    def test_events_are_coalesced_and_executed_once_per_operation(self):
+        async def scenario(broadcaster):
+            clients = [WebSocketClient(), WebSocketClient()]
+            for id, client in zip("ab", clients):
+                client.connect()
+                await client.receive()
+                await client.subscribe(id, self.subscription, self.variables)
+            self.assertEqual(len(broadcaster.groups), 1)
+
+            with mock.patch.object(
+                SubscriptionGroup,
+                "get_payload",
+                autospec=True,
+                side_effect=SubscriptionGroup.get_payload,
+            ) as get_payload:
+                await self.publish(broadcaster, count=3)
+
+            get_payload.assert_called_once()
+            for id, client in zip("ab", clients):
+                message = await client.receive_json()
+                self.assertEqual(message["id"], id)
+                self.assertTrue(client.messages.empty())
+
+            for client in clients:
+                await client.disconnect()
+            self.assert_unsubscribed(broadcaster)
+
+        self.run_clients(scenario)
+
+    def test_slow_clients_are_dropped_without_delaying_the_others(self):
+        async def scenario(broadcaster):
+            slow, fast = WebSocketClient(), WebSocketClient()
+            for id, client in (("slow", slow), ("fast", fast)):
+                client.connect()
+                await client.receive()
+                await client.subscribe(id, self.subscription, self.variables)
+            slow.blocked = True
+
+            # one message is being sent, the next ones fill the queue
+            for _ in range(5):
+                await self.publish(broadcaster)
+                self.assertEqual((await fast.receive_json())["id"], "fast")
+
+            self.assertEqual(
+                await slow.receive(), {"type": "websocket.close", "code": 1013}
+            )
+            self.assertEqual(list(broadcaster.subscriptions), [(mock.ANY, "fast")])
+            await slow.disconnect()
+            await fast.disconnect()
+            self.assert_unsubscribed(broadcaster)
+
+        with self.assertLogs("project.graphql.subscriptions", "WARNING"):
+            self.run_clients(scenario)
+
+    @override_settings(GRAPHQL_SUBSCRIPTION_SEND_TIMEOUT=10)
+    def test_clients_not_receiving_their_messages_in_time_are_dropped(self):
+        async def scenario(broadcaster):
+            client = WebSocketClient()
+            client.connect()
+            await client.receive()
+            await client.subscribe("votes", self.subscription, self.variables)
+            client.blocked = True
+
+            await self.publish(broadcaster)
+
+            self.assertEqual(
+                await client.receive(), {"type": "websocket.close", "code": 1013}
+            )
+            await client.disconnect()
+            self.assert_unsubscribed(broadcaster)
+
+        with self.assertLogs("project.graphql.subscriptions", "WARNING"):
+            self.run_clients(scenario)
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.directory = directory
+        created = timezone.now() - timedelta(days=30)
+        for index, question in enumerate(GraphQLTestCase.create_questions(5, 3)):
+            question.created = created + timedelta(days=index)
+            question.save(update_fields=["created"])
+            question.choices.update(created=created)
+        Question.objects.create(question_text="Without choices")
+        refresh_question_totals(Question.objects.values_list("pk", flat=True))
+
+    def get_path(self, name):
+        return os.path.join(self.directory, name)
+
+    @staticmethod
+    def get_polls():
+        return {
+            question.pk: (
+                question.question_text,
+                question.created,
+                question.choice_count,
+                question.total_votes,
+                sorted(
+                    (choice.pk, choice.choice_text, choice.votes, choice.created)
+                    for choice in question.choices.all()
+                ),
+            )
+            for question in Question.objects.prefetch_related("choices")
+        }
+
+    def import_polls(self, path, *args):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command("import_polls", path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue()
+
+    def test_jsonl_and_csv_exports_import_the_same_polls(self):
+        polls = self.get_polls()
+        for name in ("polls.jsonl", "polls.csv"):
+            call_command(
+                "export_polls",
+                self.get_path(name),
+                "--batch-size",
+                "2",
+                stdout=io.StringIO(),
+                stderr=io.StringIO(),
+            )
+
+        for name in ("polls.jsonl", "polls.csv"):
+            with self.subTest(name):
+                Question.objects.all().delete()
+                output = self.import_polls(self.get_path(name))
+                self.assertIn("Imported 6 questions and 15 choices", output)
+                self.assertEqual(self.get_polls(), polls)
+                self.assertEqual(get_drifted_question_ids(), [])
+
+    def test_interrupted_import_resumes_from_its_checkpoint(self):
+        polls = self.get_polls()
+        path = self.get_path("polls.jsonl")
+        call_command("export_polls", path, stdout=io.StringIO(), stderr=io.StringIO())
+        Question.objects.all().delete()
+
+        imported_batches = []
+
+        def import_batch(batch):
+            if len(imported_batches) == 2:
+                raise KeyboardInterrupt
+            imported_batches.append(batch)
+            return import_questions(batch)
+
+        with mock.patch(
+            "project.polls.management.commands.import_polls.import_questions",
+            import_batch,
+        ), self.assertRaises(KeyboardInterrupt):
+            self.import_polls(path, "--batch-size", "2")
+        self.assertEqual(Question.objects.count(), 4)
+        self.assertTrue(os.path.exists(f"{path}.checkpoint"))
+
+        output = self.import_polls(path, "--batch-size", "2")
+
+        self.assertIn("Imported 6 questions and 15 choices, skipped 0", output)
+        self.assertEqual(self.get_polls(), polls)
+        self.assertFalse(os.path.exists(f"{path}.checkpoint"))
+
+    def test_invalid_questions_are_reported_and_skipped_on_demand(self):
+        path = self.get_path("polls.jsonl")
+        with open(path, "w") as file:
+            file.write(json.dumps({"question_text": "Valid", "choices": []}) + "\n")
+            file.write("not json\n")
+            file.write(json.dumps({"question_text": "x" * 201}) + "\n")
+
+        with self.assertRaises(CommandError):
+            self.import_polls(path)
+        output = self.import_polls(path, "--skip-invalid", "--restart")
+
+        self.assertIn("Imported 1 questions and 0 choices", output)
+        self.assertIn("2 invalid questions", output)
+        self.assertTrue(Question.objects.filter(question_text="Valid").exists())
+
+    def test_imported_rows_keep_their_dates_without_being_updated(self):
+        created = "2020-01-01T00:00:00+00:00"
+        choices = [{"choice_text": "Yes", "created": created}]
+        batch = [
+            clean_question(
+                {"question_text": text, "created": created, "choices": choices}
+            )
+            for text in ("Imported 1", "Imported 2", "Imported 3")
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            import_questions(batch)
+
+        statements = [query["sql"].split()[0] for query in queries]
+        self.assertEqual(statements.count("INSERT"), 2)
+        self.assertNotIn("UPDATE", statements)
+        imported = Question.objects.filter(question_text__startswith="Imported")
+        self.assertEqual(
+            {question.created.isoformat() for question in imported}, {created}
+        )
+        choices = Choice.objects.filter(question__in=imported)
+        self.assertEqual({choice.created.isoformat() for choice in choices}, {created})
+
+    def test_totals_count_the_created_choices_only(self):
+        existing = Choice.objects.first()
+        path = self.get_path("polls.jsonl")
+        choices = [
+            {"id": str(existing.pk), "choice_text": "Existing", "votes": 10},
+            {"choice_text": "New", "votes": 2},
+        ]
+        with open(path, "w") as file:
+            file.write(json.dumps({"question_text": "Q", "choices": choices}))
+
+        output = self.import_polls(path)
+
+        self.assertIn("Imported 1 questions and 1 choices", output)
+        question = Question.objects.get(question_text="Q")
+        self.assertEqual((question.choice_count, question.total_votes), (1, 2))
+        self.assertEqual(get_drifted_question_ids(), [])
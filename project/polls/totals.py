@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import transaction
+from django.db.models import (
+    BigIntegerField,
+    Case,
+    Count,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import Coalesce
+
+from .models import Choice, Question
+
+# Fields of a question maintained from its choices.
+QUESTION_TOTALS_FIELDS = ("choice_count", "total_votes")
+# Number of questions whose totals are changed by a single UPDATE.
+UPDATE_BATCH_SIZE = 500
+
+
+def get_totals_expressions(choice_model=Choice) -> Dict[str, Coalesce]:
+    """Return the expressions of the totals of a question computed from its
+    choices."""
+    choices = (
+        choice_model.objects.filter(question=OuterRef("pk"))
+        .order_by()
+        .values("question")
+    )
+    return {
+        "choice_count": Coalesce(
+            Subquery(choices.annotate(count=Count("pk")).values("count")), 0
+        ),
+        "total_votes": Coalesce(
+            Subquery(choices.annotate(total=Sum("votes")).values("total")), 0
+        ),
+    }
+
+
+def refresh_question_totals(question_ids: Iterable, questions: Iterable = ()):
+    """Compute again the totals of the questions from their choices, then
+    reload them in the given instances of the questions.
+
+    The rows of the questions are locked first, so the totals are computed
+    after the concurrent changes of their choices are committed and can't
+    drift.
+    """
+    question_ids = sorted(question_ids)
+    with transaction.atomic():
+        # locked in the order of the IDs, the concurrent refreshes of several
+        # questions can't deadlock
+        list(
+            Question.objects.select_for_update()
+            .filter(pk__in=question_ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        Question.objects.filter(pk__in=question_ids).update(
+            **get_totals_expressions()
+        )
+    for question in questions:
+        question.refresh_from_db(fields=QUESTION_TOTALS_FIELDS)
+
+
+def get_change_expression(field: str, changes: Dict):
+    if len(changes) == 1:
+        (change,) = changes.values()
+        return F(field) + change
+    return F(field) + Case(
+        *[
+            When(pk=question_id, then=Value(change))
+            for question_id, change in changes.items()
+        ],
+        output_field=BigIntegerField(),
+    )
+
+
+def update_question_totals(
+    changes: Dict[object, Tuple[int, int]], questions: Iterable = ()
+):
+    """Add the changes of the number of choices and of the votes, by question
+    ID, to the totals of the questions and of their given instances.
+
+    The totals are incremented in place, the rows of the questions are only
+    locked by the UPDATE.
+    """
+    changes = {
+        question_id: change
+        for question_id, change in changes.items()
+        if question_id is not None and any(change)
+    }
+    # updated in the order of the IDs, concurrent updates can't deadlock
+    question_ids = sorted(changes)
+    for start in range(0, len(question_ids), UPDATE_BATCH_SIZE):
+        batch = question_ids[start : start + UPDATE_BATCH_SIZE]
+        Question.objects.filter(pk__in=batch).update(
+            choice_count=get_change_expression(
+                "choice_count", {pk: changes[pk][0] for pk in batch}
+            ),
+            total_votes=get_change_expression(
+                "total_votes", {pk: changes[pk][1] for pk in batch}
+            ),
+        )
+    for question in questions:
+        choice_count, votes = changes.get(question.pk, (0, 0))
+        question.choice_count += choice_count
+        question.total_votes += votes
+
+
+def get_drifted_question_ids() -> List:
+    """Return the IDs of the questions whose totals don't match their
+    choices."""
+    expressions = get_totals_expressions()
+    return list(
+        Question.objects.annotate(
+            actual_choice_count=expressions["choice_count"],
+            actual_total_votes=expressions["total_votes"],
+        )
+        .exclude(
+            choice_count=F("actual_choice_count"),
+            total_votes=F("actual_total_votes"),
+        )
+        .values_list("pk", flat=True)
+    )
+
+
+def get_poll_results(question_ids: Iterable) -> Dict:
+    """Return the results of the questions by ID, their totals and the share
+    of the votes of every choice.
+
+    The results are aggregated by a single query with window functions, the
+    choices aren't instantiated. Missing questions aren't returned.
+    """
+    rows = (
+        Question.objects.filter(pk__in=question_ids)
+        .values("pk", "choices__pk", "choices__choice_text", "choices__votes")
+        .annotate(
+            total_votes=Window(Sum("choices__votes"), partition_by=[F("pk")]),
+            choice_count=Window(Count("choices__pk"), partition_by=[F("pk")]),
+        )
+        .order_by("pk", "-choices__votes", "choices__choice_text")
+    )
+    results = OrderedDict()
+    for row in rows:
+        result = results.get(row["pk"])
+        total_votes = row["total_votes"] or 0
+        if result is None:
+            result = results[row["pk"]] = {
+                "question_id": row["pk"],
+                "total_votes": total_votes,
+                "choice_count": row["choice_count"],
+                "choices": [],
+            }
+        if row["choices__pk"] is None:
+            continue
+        votes = row["choices__votes"]
+        result["choices"].append(
+            {
+                "id": row["choices__pk"],
+                "choice_text": row["choices__choice_text"],
+                "votes": votes,
+                "share": votes / total_votes if total_votes else 0.0,
+            }
+        )
+    return results
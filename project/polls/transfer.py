@@ -0,0 +1,285 @@
+import csv
+import io
+import json
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Choice, Question
+from .search import get_search_backend
+
+# Formats of the exported polls, by file extension.
+TRANSFER_FORMATS = {".jsonl": "jsonl", ".csv": "csv"}
+# Columns of the CSV files, one row per choice, a question without choices
+# has one row with empty choice columns.
+CSV_COLUMNS = (
+    "question_id",
+    "question_text",
+    "question_created",
+    "choice_id",
+    "choice_text",
+    "choice_votes",
+    "choice_created",
+)
+
+
+def get_format(path: str, format: Optional[str] = None) -> str:
+    if format:
+        return format
+    return TRANSFER_FORMATS.get(os.path.splitext(path)[1].lower(), "jsonl")
+
+
+def load_checkpoint(path: str) -> Optional[dict]:
+    try:
+        with open(path) as checkpoint_file:
+            return json.load(checkpoint_file)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    """Replace the checkpoint atomically, an interruption keeps the previous
+    one."""
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.replace(temporary_path, path)
+
+
+def format_datetime(value) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def iter_question_batches(after=None, batch_size: int = 1000) -> Iterator[List[dict]]:
+    """Return the batches of the questions and their choices ordered by ID,
+    after the ID `after`.
+
+    The questions are read with `iterator`, by a server-side cursor on
+    PostgreSQL, and the choices of every batch by one query, so the memory
+    doesn't grow with the number of questions.
+    """
+    questions = Question.objects.order_by("pk").values_list(
+        "pk", "question_text", "created"
+    )
+    if after is not None:
+        questions = questions.filter(pk__gt=after)
+    batch = []
+    for question_id, question_text, created in questions.iterator(batch_size):
+        batch.append(
+            OrderedDict(
+                id=str(question_id),
+                question_text=question_text,
+                created=format_datetime(created),
+                choices=[],
+            )
+        )
+        if len(batch) == batch_size:
+            yield add_choices(batch)
+            batch = []
+    if batch:
+        yield add_choices(batch)
+
+
+def add_choices(questions: List[dict]) -> List[dict]:
+    questions_by_id = {question["id"]: question for question in questions}
+    choices = (
+        Choice.objects.filter(question_id__in=list(questions_by_id))
+        .order_by("question_id", "created", "pk")
+        .values_list("question_id", "pk", "choice_text", "votes", "created")
+    )
+    for question_id, choice_id, choice_text, votes, created in choices:
+        questions_by_id[str(question_id)]["choices"].append(
+            OrderedDict(
+                id=str(choice_id),
+                choice_text=choice_text,
+                votes=votes,
+                created=format_datetime(created),
+            )
+        )
+    return questions
+
+
+def write_jsonl(file: BinaryIO, question: dict):
+    file.write(json.dumps(question, separators=(",", ":")).encode() + b"\n")
+
+
+def write_csv_header(file: BinaryIO):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(CSV_COLUMNS)
+    file.write(buffer.getvalue().encode())
+
+
+def write_csv(file: BinaryIO, question: dict):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    question_columns = [question["id"], question["question_text"], question["created"]]
+    for choice in question["choices"] or [None]:
+        choice_columns = ["", "", "", ""]
+        if choice is not None:
+            choice_columns = [
+                choice["id"],
+                choice["choice_text"],
+                choice["votes"],
+                choice["created"],
+            ]
+        writer.writerow(question_columns + choice_columns)
+    file.write(buffer.getvalue().encode())
+
+
+def read_jsonl(file: BinaryIO, offset: int = 0) -> Iterator[Tuple[dict, int]]:
+    """Return the questions of the file from the offset, with the offset of
+    the next question."""
+    file.seek(offset)
+    for line in iter(file.readline, b""):
+        offset += len(line)
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            # rejected by the validation of the question
+            data = None
+        yield data, offset
+
+
+def read_csv(file: BinaryIO, offset: int = 0) -> Iterator[Tuple[dict, int]]:
+    """Return the questions of the rows of the file from the offset, with
+    the offset of the next question. The rows of a question are
+    consecutive."""
+    file.seek(0)
+    header = next(csv.reader([file.readline().decode()]))
+    file.seek(max(offset, file.tell()))
+    consumed = file.tell()
+
+    def read_lines():
+        nonlocal consumed
+        for line in iter(file.readline, b""):
+            consumed += len(line)
+            yield line.decode()
+
+    question, question_end = None, consumed
+    for row in csv.DictReader(read_lines(), fieldnames=header):
+        if question is not None and row["question_id"] != question["id"]:
+            yield question, question_end
+            question = None
+        if question is None:
+            question = {
+                "id": row["question_id"],
+                "question_text": row["question_text"],
+                "created": row["question_created"] or None,
+                "choices": [],
+            }
+        if row["choice_id"]:
+            question["choices"].append(
+                {
+                    "id": row["choice_id"],
+                    "choice_text": row["choice_text"],
+                    "votes": row["choice_votes"],
+                    "created": row["choice_created"] or None,
+                }
+            )
+        question_end = consumed
+    if question is not None:
+        yield question, question_end
+
+
+READERS = {"jsonl": read_jsonl, "csv": read_csv}
+WRITERS = {"jsonl": write_jsonl, "csv": write_csv}
+
+
+def build_instance(model, data: dict, fields: Tuple[str, ...], **values):
+    for field in fields:
+        if data.get(field) is not None:
+            values[field] = data[field]
+    return model(**values)
+
+
+def clean_question(data: dict) -> Tuple[Question, List[Choice]]:
+    """Return the validated question and choices of an imported record.
+
+    They're validated by the model validation of
+    `ModelMutation.clean_instance`. The uniqueness of the IDs is checked once
+    per batch, and the questions of the choices are created with them, their
+    totals are computed from the created choices.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("choices", []), list):
+        raise ValidationError("A question should be an object with a list of choices.")
+    question = build_instance(Question, data, ("id", "question_text", "created"))
+    question.full_clean(validate_unique=False)
+    choices = []
+    for choice_data in data.get("choices", []):
+        if not isinstance(choice_data, dict):
+            raise ValidationError("A choice should be an object.")
+        choice = build_instance(
+            Choice,
+            choice_data,
+            ("id", "choice_text", "votes", "created"),
+            question=question,
+        )
+        choice.full_clean(exclude=["question"], validate_unique=False)
+        choices.append(choice)
+    return question, choices
+
+
+@contextmanager
+def keep_created_dates(*models):
+    """Create the rows with their `created` dates, which `auto_now_add`
+    overwrites otherwise. The management commands importing the rows are
+    the only users of the models in their process."""
+    fields = [model._meta.get_field("created") for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def import_questions(cleaned: List[Tuple[Question, List[Choice]]]) -> Dict[str, int]:
+    """Create the questions and their choices in a transaction, the questions
+    and the choices whose IDs already exist are skipped. Return the numbers
+    of created and skipped rows."""
+    existing_questions = set(
+        Question.objects.filter(
+            pk__in=[question.pk for question, _ in cleaned]
+        ).values_list("pk", flat=True)
+    )
+    questions, choices = {}, {}
+    for question, question_choices in cleaned:
+        if question.pk in existing_questions or question.pk in questions:
+            continue
+        questions[question.pk] = question
+        for choice in question_choices:
+            choices.setdefault(choice.pk, choice)
+    existing_choices = set(
+        Choice.objects.filter(pk__in=list(choices)).values_list("pk", flat=True)
+    )
+    choices = [choice for pk, choice in choices.items() if pk not in existing_choices]
+
+    now = timezone.now()
+    for question in questions.values():
+        question.choice_count = question.total_votes = 0
+        question.created = question.created or now
+    for choice in choices:
+        choice.question.choice_count += 1
+        choice.question.total_votes += choice.votes
+        choice.created = choice.created or now
+
+    with transaction.atomic(), keep_created_dates(Question, Choice):
+        Question.objects.bulk_create(questions.values())
+        Choice.objects.bulk_create(choices)
+        # bulk_create doesn't send the signals indexing the questions
+        get_search_backend().index_questions(list(questions))
+    return {
+        "questions": len(questions),
+        "choices": len(choices),
+        "skipped": len(cleaned) - len(questions),
+    }
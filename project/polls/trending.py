@@ -0,0 +1,263 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, deque
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Deque, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+
+from ..core.pubsub import get_pubsub
+from .models import Question, TrendingVotes
+
+logger = logging.getLogger(__name__)
+
+# Pub/sub channel of the votes, the messages are "<question id> <votes>".
+VOTES_CHANNEL = "polls.votes"
+# Seconds of the buckets counting the votes.
+BUCKET_SECONDS = 60
+
+
+class TrendingWindow(Enum):
+    HOUR = 3600
+    DAY = 86400
+
+
+def get_bucket(timestamp: float) -> int:
+    return int(timestamp // BUCKET_SECONDS) * BUCKET_SECONDS
+
+
+class WindowRanking:
+    """Votes of the questions in a sliding window, kept sorted so the top
+    questions are read without sorting."""
+
+    def __init__(self, seconds: int):
+        self.seconds = seconds
+        self.votes: Dict[str, int] = {}
+        # (-votes, question id) of the questions with votes, sorted
+        self.ranking: List[Tuple[int, str]] = []
+        # starts of the buckets counted in the window, sorted, the buckets
+        # are appended and expired at the ends
+        self.buckets: Deque[int] = deque()
+
+    def add(self, question_id: str, votes: int):
+        old_votes = self.votes.get(question_id, 0)
+        new_votes = old_votes + votes
+        if old_votes:
+            del self.ranking[bisect_left(self.ranking, (-old_votes, question_id))]
+        if new_votes:
+            insort(self.ranking, (-new_votes, question_id))
+            self.votes[question_id] = new_votes
+        else:
+            self.votes.pop(question_id, None)
+
+    def contains(self, bucket: int, now: float) -> bool:
+        return bucket + BUCKET_SECONDS > now - self.seconds
+
+    def top(self, first: int) -> List[Tuple[str, int]]:
+        return [
+            (question_id, -votes)
+            for votes, question_id in self.ranking[:first]
+            if votes < 0
+        ]
+
+
+class Leaderboard:
+    """Questions with the most votes in the last hour and the last day.
+
+    The votes are counted in buckets of `BUCKET_SECONDS`, every vote updates
+    the sorted ranking of the windows and the buckets leaving a window are
+    subtracted from its ranking, so `top` is O(first).
+
+    The votes are received from the pub/sub, and so from the other processes
+    of the host with its bridge. The votes published by the process are
+    checkpointed in the `TrendingVotes` table by a timer, at the latest
+    `TRENDING_CHECKPOINT_INTERVAL` seconds after they're published, a new
+    leaderboard starts from the table.
+    """
+
+    def __init__(self, windows=tuple(TrendingWindow)):
+        self.rankings = {window: WindowRanking(window.value) for window in windows}
+        self.buckets: Dict[int, Counter] = {}
+        # votes published by the process, not checkpointed yet
+        self.pending: Counter = Counter()
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def record(self, question_id: str, votes: int, now: Optional[float] = None):
+        if now is None:
+            now = time.time()
+        bucket = get_bucket(now)
+        with self._lock:
+            self.expire(now)
+            self.buckets.setdefault(bucket, Counter())[question_id] += votes
+            for ranking in self.rankings.values():
+                if not ranking.buckets or ranking.buckets[-1] < bucket:
+                    ranking.buckets.append(bucket)
+                else:
+                    # a late vote of a counted bucket
+                    index = bisect_left(ranking.buckets, bucket)
+                    if ranking.buckets[index] != bucket:
+                        ranking.buckets.insert(index, bucket)
+                ranking.add(question_id, votes)
+
+    def expire(self, now: float):
+        longest = max(self.rankings.values(), key=lambda ranking: ranking.seconds)
+        for ranking in self.rankings.values():
+            while ranking.buckets and not ranking.contains(ranking.buckets[0], now):
+                bucket = ranking.buckets.popleft()
+                for question_id, votes in self.buckets[bucket].items():
+                    ranking.add(question_id, -votes)
+                if ranking is longest:
+                    # the bucket left all the windows
+                    del self.buckets[bucket]
+
+    def top(
+        self, window: TrendingWindow, first: int, now: Optional[float] = None
+    ) -> List[Tuple[str, int]]:
+        """Return the IDs and the votes of the `first` questions with the
+        most votes in the window."""
+        with self._lock:
+            self.expire(time.time() if now is None else now)
+            return self.rankings[window].top(first)
+
+    def on_votes(self, channel: str, message: str):
+        question_id, votes = message.split()
+        self.record(question_id, int(votes))
+
+    def load(self):
+        """Count the checkpointed votes of the windows."""
+        now = time.time()
+        oldest = get_bucket(now - max(window.value for window in self.rankings))
+        rows = TrendingVotes.objects.filter(
+            bucket__gte=datetime.fromtimestamp(oldest, timezone.utc)
+        ).values_list("question_id", "bucket", "votes").order_by("bucket")
+        for question_id, bucket, votes in rows.iterator():
+            # the buckets are recorded at their start
+            self.record(str(question_id), votes, now=bucket.timestamp())
+        with self._lock:
+            self.expire(now)
+
+    def add_pending(self, question_id: str, votes: int):
+        with self._lock:
+            self.pending[question_id, get_bucket(time.time())] += votes
+            self._start_timer()
+
+    def stop(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _start_timer(self):
+        # the threads don't survive a fork, a timer started in the parent
+        # isn't alive in the workers
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(
+            settings.TRENDING_CHECKPOINT_INTERVAL, self._checkpoint_on_timer
+        )
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _checkpoint_on_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.checkpoint()
+        except Exception:
+            logger.exception("Checkpoint of the trending votes failed")
+        finally:
+            # the connections of the timer thread aren't reused
+            connections.close_all()
+
+    def checkpoint(self):
+        """Add the pending votes to the table and delete the buckets older
+        than the windows."""
+        with self._lock:
+            pending, self.pending = self.pending, Counter()
+        if pending:
+            question_ids = {question_id for question_id, _ in pending}
+            existing = {
+                str(pk)
+                for pk in Question.objects.filter(pk__in=question_ids).values_list(
+                    "pk", flat=True
+                )
+            }
+            for (question_id, bucket), votes in pending.items():
+                if question_id in existing:
+                    add_bucket_votes(
+                        question_id, datetime.fromtimestamp(bucket, timezone.utc), votes
+                    )
+        oldest = get_bucket(time.time() - max(w.value for w in self.rankings))
+        TrendingVotes.objects.filter(
+            bucket__lt=datetime.fromtimestamp(oldest, timezone.utc)
+        ).delete()
+
+
+def add_bucket_votes(question_id: str, bucket: datetime, votes: int):
+    rows = TrendingVotes.objects.filter(question_id=question_id, bucket=bucket)
+    if rows.update(votes=F("votes") + votes):
+        return
+    try:
+        with transaction.atomic():
+            TrendingVotes.objects.create(
+                question_id=question_id, bucket=bucket, votes=votes
+            )
+    except IntegrityError:
+        # created by another process meanwhile
+        rows.update(votes=F("votes") + votes)
+
+
+_leaderboard: Optional[Leaderboard] = None
+_leaderboard_pid: Optional[int] = None
+_leaderboard_lock = threading.Lock()
+
+
+def get_leaderboard() -> Leaderboard:
+    """Return the leaderboard of the process, loaded from the checkpoints
+    on first use."""
+    global _leaderboard, _leaderboard_pid
+    with _leaderboard_lock:
+        if _leaderboard is None or _leaderboard_pid != os.getpid():
+            leaderboard = Leaderboard()
+            get_pubsub().subscribe(VOTES_CHANNEL, leaderboard.on_votes)
+            leaderboard.load()
+            _leaderboard, _leaderboard_pid = leaderboard, os.getpid()
+    return _leaderboard
+
+
+def publish_votes(question_id, votes: int):
+    """Count the votes of a question in the leaderboards of the host."""
+    leaderboard = get_leaderboard()
+    leaderboard.add_pending(str(question_id), votes)
+    get_pubsub().publish(VOTES_CHANNEL, f"{question_id} {votes}")
+
+
+def reset_leaderboard():
+    """Checkpoint the pending votes of the leaderboard of the process and
+    drop it, the next `get_leaderboard` loads a new one.
+
+    It's run at exit, and before the database of the leaderboard is dropped,
+    e.g. by the benchmarks tearing their test database down.
+    """
+    global _leaderboard
+    with _leaderboard_lock:
+        leaderboard, _leaderboard = _leaderboard, None
+    if leaderboard is None or _leaderboard_pid != os.getpid():
+        return
+    get_pubsub().unsubscribe(VOTES_CHANNEL, leaderboard.on_votes)
+    leaderboard.stop()
+    try:
+        leaderboard.checkpoint()
+    except Exception:
+        logger.exception("Checkpoint of the trending votes failed")
+
+
+atexit.register(reset_leaderboard)
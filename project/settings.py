@@ -39,11 +39,13 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     "graphene_django",
+    "project.core",
     "project.polls",
     "project.users",
 ]
 
 MIDDLEWARE = [
+    'project.core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -118,11 +120,49 @@ USE_L10N = True
 USE_TZ = True
 
 
+# Warm the application up when the WSGI or ASGI application is loaded, see
+# project.core.warmup. With a pre-forking server loading the application
+# before forking (e.g. gunicorn --preload), the workers share the memory
+# of the warmed up master. Disabled by default, as it slows down the start of
+# the development server and of the one-off processes loading the application.
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "false").lower() == "true"
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
 
 STATIC_URL = '/static/'
 
+# Media files (uploads)
+
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", BASE_DIR / "media")
+MEDIA_URL = "/media/"
+
+# When enabled, uploaded files are stored once under the digest of their
+# content, see project.core.uploads.save_content_addressed.
+FILE_UPLOAD_CONTENT_ADDRESSED = (
+    os.environ.get("FILE_UPLOAD_CONTENT_ADDRESSED", "false").lower() == "true"
+)
+# Big uploads are streamed to a temporary file in MEDIA_ROOT, which is then
+# moved to its final location. Their content is hashed while streamed only for
+# the content addressed storage.
+FILE_UPLOAD_HANDLERS = [
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "project.core.uploads.HashingMediaFileUploadHandler"
+    if FILE_UPLOAD_CONTENT_ADDRESSED
+    else "project.core.uploads.MediaFileUploadHandler",
+]
+# Maximum size in bytes of a file uploaded in chunks.
+FILE_UPLOAD_MAX_SIZE = int(os.environ.get("FILE_UPLOAD_MAX_SIZE", 5 * 1024 ** 3))
+# Maximum number of bytes reserved by the unfinished chunked uploads of a user,
+# or of the anonymous requests of an IP address.
+FILE_UPLOAD_QUOTA = int(os.environ.get("FILE_UPLOAD_QUOTA", 10 * 1024 ** 3))
+# Seconds after its last chunk an unfinished chunked upload expires, the
+# `clear_expired_uploads` command deletes the expired uploads and their files.
+FILE_UPLOAD_SESSION_TTL = int(
+    os.environ.get("FILE_UPLOAD_SESSION_TTL", 24 * 60 * 60)
+)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -136,9 +176,124 @@ GRAPHENE = {
     "SCHEMA": "project.graphql.api.schema",
     "MIDDLEWARE": [
         "graphql_jwt.middleware.JSONWebTokenMiddleware",
+        "project.graphql.core.middleware.QueryTracingMiddleware",
+        "project.graphql.core.middleware.MetricsMiddleware",
     ],
 }
 
+# Query cost analysis, operations deeper or more expensive than the limits are
+# rejected before the execution. Set a limit to 0 to disable it. The default
+# cost allows two nested unbounded lists, `questions { choices { question { id }
+# } }` costs 11001 with the default list size and the weight of the choices.
+GRAPHQL_QUERY_MAX_DEPTH = int(os.environ.get("GRAPHQL_QUERY_MAX_DEPTH", 10))
+GRAPHQL_QUERY_MAX_COST = int(os.environ.get("GRAPHQL_QUERY_MAX_COST", 50000))
+# Size assumed for the list fields without pagination arguments.
+GRAPHQL_QUERY_DEFAULT_LIST_SIZE = int(
+    os.environ.get("GRAPHQL_QUERY_DEFAULT_LIST_SIZE", 100)
+)
+# Query tracing records which resolvers issued the SQL queries of an operation
+# to find the N+1 queries: "off", "sample" to trace and log a share of the
+# operations, or "strict" to trace every operation and raise an error when an
+# operation exceeds its query budget (for tests and development).
+GRAPHQL_QUERY_TRACING = os.environ.get("GRAPHQL_QUERY_TRACING", "off")
+GRAPHQL_QUERY_TRACING_SAMPLE_RATE = float(
+    os.environ.get("GRAPHQL_QUERY_TRACING_SAMPLE_RATE", 0.01)
+)
+# Number of times a resolver issues the same statement to be reported.
+GRAPHQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get("GRAPHQL_N_PLUS_ONE_THRESHOLD", 5))
+# Maximum number of queries of the operations, by operation name.
+GRAPHQL_QUERY_BUDGETS = {}
+# Directory of the profiles of the GraphQL requests, profiling is disabled
+# when it's not set. Requests are profiled when they have a
+# `X-GraphQL-Profile` header with a token from the `create_profiling_token`
+# command, valid for GRAPHQL_PROFILING_TOKEN_MAX_AGE seconds, or when they
+# are sampled with GRAPHQL_PROFILING_SAMPLE_RATE.
+GRAPHQL_PROFILING_DIRECTORY = os.environ.get("GRAPHQL_PROFILING_DIRECTORY")
+GRAPHQL_PROFILING_SAMPLE_RATE = float(
+    os.environ.get("GRAPHQL_PROFILING_SAMPLE_RATE", 0)
+)
+GRAPHQL_PROFILING_TOKEN_MAX_AGE = int(
+    os.environ.get("GRAPHQL_PROFILING_TOKEN_MAX_AGE", 3600)
+)
+# Seconds between two samples of the stack of a profiled request.
+GRAPHQL_PROFILING_INTERVAL = float(os.environ.get("GRAPHQL_PROFILING_INTERVAL", 0.001))
+# Number of profiles kept in GRAPHQL_PROFILING_DIRECTORY, the oldest are
+# removed when a profile is written.
+GRAPHQL_PROFILING_MAX_FILES = int(os.environ.get("GRAPHQL_PROFILING_MAX_FILES", 1000))
+# Dotted path of the class encoding the GraphQL responses, by default orjson
+# is used when it's installed and the standard library json module otherwise.
+GRAPHQL_JSON_ENCODER = os.environ.get("GRAPHQL_JSON_ENCODER")
+# Number of parsed GraphQL documents cached by every process, 0 disables it.
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.environ.get("GRAPHQL_DOCUMENT_CACHE_SIZE", 1000))
+# Directory of `.graphql` files with the operations of the clients, their
+# documents are cached by the warmup.
+GRAPHQL_WARMUP_DOCUMENTS_DIR = os.environ.get("GRAPHQL_WARMUP_DOCUMENTS_DIR")
+# Maximum number of operations of a batch request, a JSON list of operations
+# executed in the same request. 0 disables the batch requests.
+GRAPHQL_BATCH_MAX_SIZE = int(os.environ.get("GRAPHQL_BATCH_MAX_SIZE", 20))
+# Maximum sum of the costs of the operations of a batch, 0 disables the limit.
+GRAPHQL_BATCH_MAX_COST = int(
+    os.environ.get("GRAPHQL_BATCH_MAX_COST", GRAPHQL_QUERY_MAX_COST)
+)
+# Threads of every process executing the consecutive queries of a batch in
+# parallel, 0 executes the operations of a batch in order.
+GRAPHQL_BATCH_PARALLEL_WORKERS = int(
+    os.environ.get("GRAPHQL_BATCH_PARALLEL_WORKERS", 0)
+)
+# Maximum number of questions of the `pollResultsBulk` query.
+GRAPHQL_POLL_RESULTS_MAX_BATCH_SIZE = int(
+    os.environ.get("GRAPHQL_POLL_RESULTS_MAX_BATCH_SIZE", 100)
+)
+# Milliseconds between two messages of a subscription, the events in between
+# are coalesced in one message.
+GRAPHQL_SUBSCRIPTION_INTERVAL = int(
+    os.environ.get("GRAPHQL_SUBSCRIPTION_INTERVAL", 500)
+)
+# Messages waiting to be sent to a WebSocket client of the subscriptions, and
+# milliseconds a message can take to be sent. The slower clients are dropped.
+GRAPHQL_SUBSCRIPTION_QUEUE_SIZE = int(
+    os.environ.get("GRAPHQL_SUBSCRIPTION_QUEUE_SIZE", 100)
+)
+GRAPHQL_SUBSCRIPTION_SEND_TIMEOUT = int(
+    os.environ.get("GRAPHQL_SUBSCRIPTION_SEND_TIMEOUT", 5000)
+)
+# Maximum number of questions of the `trendingQuestions` query.
+GRAPHQL_TRENDING_MAX_FIRST = int(os.environ.get("GRAPHQL_TRENDING_MAX_FIRST", 100))
+# Maximum number of questions of a page of the `searchQuestions` query.
+GRAPHQL_SEARCH_MAX_FIRST = int(os.environ.get("GRAPHQL_SEARCH_MAX_FIRST", 100))
+# Maximum number of IDs accepted by the `nodes` query.
+GRAPHQL_NODES_MAX_BATCH_SIZE = int(
+    os.environ.get("GRAPHQL_NODES_MAX_BATCH_SIZE", 500)
+)
+
+# PUB/SUB
+# Directory of the sockets delivering the published messages to the other
+# processes of the host, the subscriptions served by a process only receive
+# its own messages when it's not set.
+PUBSUB_BRIDGE_DIRECTORY = os.environ.get("PUBSUB_BRIDGE_DIRECTORY")
+
+# TRENDING
+# Seconds between two checkpoints of the votes of the trending leaderboard
+# in the database, a new process starts its leaderboard from them.
+TRENDING_CHECKPOINT_INTERVAL = int(
+    os.environ.get("TRENDING_CHECKPOINT_INTERVAL", 30)
+)
+
+# METRICS
+# Share of the requests whose SQL queries and resolvers are measured.
+METRICS_SAMPLE_RATE = float(os.environ.get("METRICS_SAMPLE_RATE", 0.1))
+# Directory shared by the worker processes of the host, the metrics of every
+# process are saved in it and merged by the `/metrics` view. When it's not
+# set the view only returns the metrics of the process serving it.
+METRICS_DIRECTORY = os.environ.get("METRICS_DIRECTORY")
+# Seconds between two saves of the metrics of a process.
+METRICS_FLUSH_INTERVAL = int(os.environ.get("METRICS_FLUSH_INTERVAL", 10))
+# Distinct operation names labeling the metrics of a process, the names are
+# chosen by the clients and the next ones are labeled `other`.
+METRICS_MAX_OPERATIONS = int(os.environ.get("METRICS_MAX_OPERATIONS", 200))
+# Client IPs allowed to read the metrics.
+METRICS_ALLOWED_IPS = os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+
 # AUTHENTICATION
 AUTHENTICATION_BACKENDS = [
     "project.core.auth_backend.JSONWebTokenBackend",
@@ -149,4 +304,46 @@ JWT_SIGNATURE_ACCESS_EXPIRED_TIME = os.environ.get(
 )
 JWT_SIGNATURE_REFRESH_EXPIRED_TIME = os.environ.get(
     "JWT_SIGNATURE_REFRESH_EXPIRED_TIME", 60*24
-)
\ No newline at end of file
+)
+
+# Algorithm signing the JWT: "HS256" with the SECRET_KEY, or "EdDSA", "ES256"
+# or "RS256" with the keys of the keyset, whose public keys are published at
+# /.well-known/jwks.json. The asymmetric algorithms require the cryptography
+# package. The tokens of the keys are verified whatever the algorithm. The tokens
+# are signed with the SECRET_KEY until a key is published, create the first key
+# with `rotate_jwt_keys --algorithm <algorithm>` JWT_KEY_PUBLICATION_DELAY
+# seconds before setting the algorithm.
+JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
+# ISO 8601 date until which the tokens signed with the SECRET_KEY are still
+# verified with an asymmetric JWT_ALGORITHM, e.g. the switch of the algorithm
+# plus JWT_SIGNATURE_REFRESH_EXPIRED_TIME. They are rejected when it's unset.
+JWT_SECRET_KEY_TOKENS_UNTIL = os.environ.get("JWT_SECRET_KEY_TOKENS_UNTIL")
+# Days between two rotations of the signing key by the `rotate_jwt_keys`
+# command, the keys are deleted once the tokens they signed expired.
+JWT_KEY_ROTATION_INTERVAL = int(os.environ.get("JWT_KEY_ROTATION_INTERVAL", 30))
+# Seconds between the creation of a key and its first token, so the verifiers
+# caching the JWKS know it first.
+JWT_KEY_PUBLICATION_DELAY = int(os.environ.get("JWT_KEY_PUBLICATION_DELAY", 3600))
+# Seconds the processes and the verifiers cache the keyset.
+JWT_KEYSET_CACHE_TIMEOUT = int(os.environ.get("JWT_KEYSET_CACHE_TIMEOUT", 300))
+
+# Logins within this number of seconds from the stored last login date don't
+# update it.
+LAST_LOGIN_UPDATE_GRANULARITY = int(
+    os.environ.get("LAST_LOGIN_UPDATE_GRANULARITY", 60)
+)
+# When set, last login dates are buffered and written in batches of this size
+# or at the latest LAST_LOGIN_FLUSH_INTERVAL seconds after the first buffered
+# login.
+LAST_LOGIN_BUFFER_SIZE = int(os.environ.get("LAST_LOGIN_BUFFER_SIZE", 0))
+LAST_LOGIN_FLUSH_INTERVAL = int(os.environ.get("LAST_LOGIN_FLUSH_INTERVAL", 30))
+
+# RATE LIMITING
+# Cache alias shared by the workers to store the rate limit counters, when it's
+# not set the counters are kept in the memory of every process.
+RATE_LIMIT_CACHE = os.environ.get("RATE_LIMIT_CACHE")
+# Login attempts allowed per client IP and per email address in the period
+# (in seconds), set a limit to 0 to disable it.
+LOGIN_RATE_LIMIT_PERIOD = int(os.environ.get("LOGIN_RATE_LIMIT_PERIOD", 60))
+LOGIN_RATE_LIMIT_PER_IP = int(os.environ.get("LOGIN_RATE_LIMIT_PER_IP", 30))
+LOGIN_RATE_LIMIT_PER_EMAIL = int(os.environ.get("LOGIN_RATE_LIMIT_PER_EMAIL", 10))
\ No newline at end of file
@@ -17,14 +17,22 @@ from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 
-from .graphql.api import schema
+from .core.views import jwks, metrics, upload_chunk
+from .graphql.core.encoders import get_json_encoder
+from .graphql.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
-from graphene_django.views import GraphQLView
 
 urlpatterns = [
     path(
         "graphql/",
-        csrf_exempt(GraphQLView.as_view(graphiql=settings.DEBUG)),
+        csrf_exempt(
+            GraphQLView.as_view(
+                graphiql=settings.DEBUG, json_encoder=get_json_encoder()
+            )
+        ),
     ),
+    path("uploads/<str:upload_id>", upload_chunk),
+    path("metrics", metrics),
+    path(".well-known/jwks.json", jwks),
     path('admin/', admin.site.urls),
 ]
\ No newline at end of file
@@ -10,4 +10,5 @@ class UserErrorCodes(Enum):
     INVALID_CREDENTIALS = "invalid_credencials"
     JWT_SIGNATURE_EXPIRED = "signature_expired"
     JWT_DECODE_ERROR = "decode_error"
-    JWT_INVALID_TOKEN = "invalid_token"
\ No newline at end of file
+    JWT_INVALID_TOKEN = "invalid_token"
+    TOO_MANY_REQUESTS = "too_many_requests"
\ No newline at end of file
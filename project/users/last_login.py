@@ -0,0 +1,98 @@
+import atexit
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import User
+
+
+class LastLoginBuffer:
+    """Collect the last login dates in memory and write them in batches.
+
+    Pending dates are written with a single `bulk_update` when the buffer is
+    full, when the oldest pending date is older than the flush interval or
+    when the process exits. A timer flushes them after the interval when no
+    other login comes.
+    """
+
+    def __init__(self):
+        self._pending: Dict[uuid.UUID, datetime] = {}
+        self._oldest = None
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def add(self, user: User, login_date: datetime):
+        with self._lock:
+            self._pending[user.pk] = login_date
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+                self._start_timer()
+            should_flush = (
+                len(self._pending) >= settings.LAST_LOGIN_BUFFER_SIZE
+                or time.monotonic() - self._oldest
+                >= settings.LAST_LOGIN_FLUSH_INTERVAL
+            )
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending, self._oldest = self._pending, {}, None
+        if not pending:
+            return
+        users = [
+            User(pk=pk, last_login=login_date, modified=login_date)
+            for pk, login_date in pending.items()
+        ]
+        User.objects.bulk_update(users, ["last_login", "modified"])
+
+    def _start_timer(self):
+        # the threads don't survive a fork, a timer started in the parent
+        # isn't alive in the workers
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(
+            settings.LAST_LOGIN_FLUSH_INTERVAL, self._flush_on_timer
+        )
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_on_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # the connections of the timer thread aren't reused
+            connections.close_all()
+
+
+last_login_buffer = LastLoginBuffer()
+atexit.register(last_login_buffer.flush)
+
+
+def update_last_login(user: User):
+    """Store the date of the login, coalescing frequent logins of the user.
+
+    The write is skipped when the stored date is more recent than
+    `LAST_LOGIN_UPDATE_GRANULARITY` seconds and buffered when
+    `LAST_LOGIN_BUFFER_SIZE` is set. The first login is always written right
+    away, as inactive accounts are recognized by a stored last login date.
+    """
+    now = timezone.now()
+    first_login = user.last_login is None
+    granularity = timedelta(seconds=settings.LAST_LOGIN_UPDATE_GRANULARITY)
+    if not first_login and now - user.last_login < granularity:
+        return
+
+    user.last_login = now
+    if not first_login and settings.LAST_LOGIN_BUFFER_SIZE:
+        last_login_buffer.add(user, now)
+        return
+    user.save(update_fields=["last_login", "modified"])
@@ -0,0 +1,145 @@
+import secrets
+import statistics
+import threading
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+
+from ...models import User
+
+TOKEN_CREATE_MUTATION = """
+    mutation TokenCreate($email: String!, $password: String!) {
+        tokenCreate(email: $email, password: $password) {
+            token
+            errors {
+                code
+            }
+        }
+    }
+"""
+
+LOADTEST_EMAIL_DOMAIN = "loadtest.invalid"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the latency of legitimate logins while other threads run a "
+        "credential stuffing attack, with and without the login rate limits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--attackers", type=int, default=4)
+        parser.add_argument("--attacker-ips", type=int, default=8)
+        parser.add_argument("--victims", type=int, default=20)
+        parser.add_argument(
+            "--legit-interval",
+            type=float,
+            default=1.0,
+            help="Seconds between two legitimate logins.",
+        )
+
+    def handle(self, *args, **options):
+        from ....graphql.api import schema
+
+        self.schema = schema
+        self.factory = RequestFactory()
+        password = secrets.token_hex(8)
+        # hash the password once, every account of the test shares it
+        password_hash = make_password(password)
+        users = User.objects.bulk_create(
+            [
+                User(email=f"user{i}@{LOADTEST_EMAIL_DOMAIN}", password=password_hash)
+                for i in range(options["victims"] + 1)
+            ]
+        )
+        legit_user, victims = users[0], users[1:]
+        try:
+            disabled_limits = override_settings(
+                LOGIN_RATE_LIMIT_PER_IP=0, LOGIN_RATE_LIMIT_PER_EMAIL=0
+            )
+            with disabled_limits:
+                results = self.run(legit_user.email, password, victims, options)
+            self.report("Rate limits disabled", results)
+            results = self.run(legit_user.email, password, victims, options)
+            self.report("Rate limits enabled", results)
+        finally:
+            User.objects.filter(email__endswith=f"@{LOADTEST_EMAIL_DOMAIN}").delete()
+
+    def login(self, email, password, ip):
+        request = self.factory.post("/graphql/", REMOTE_ADDR=ip)
+        result = self.schema.execute(
+            TOKEN_CREATE_MUTATION,
+            context_value=request,
+            variable_values={"email": email, "password": password},
+        )
+        return result.data["tokenCreate"] if result.data else None
+
+    def attack(self, victims, attacker_ips, stop, stats):
+        try:
+            while not stop.is_set():
+                victim = secrets.choice(victims)
+                response = self.login(
+                    victim.email, secrets.token_hex(8), secrets.choice(attacker_ips)
+                )
+                codes = [error["code"] for error in (response or {}).get("errors", [])]
+                with stats["lock"]:
+                    stats["attempts"] += 1
+                    if "TOO_MANY_REQUESTS" in codes:
+                        stats["rejected"] += 1
+        finally:
+            connection.close()
+
+    def run(self, email, password, victims, options):
+        stop = threading.Event()
+        stats = {"lock": threading.Lock(), "attempts": 0, "rejected": 0}
+        attacker_ips = [f"10.1.0.{i + 1}" for i in range(options["attacker_ips"])]
+        threads = [
+            threading.Thread(
+                target=self.attack, args=(victims, attacker_ips, stop, stats)
+            )
+            for _ in range(options["attackers"])
+        ]
+        for thread in threads:
+            thread.start()
+
+        latencies, failures = [], 0
+        started = time.perf_counter()
+        try:
+            while time.perf_counter() - started < options["duration"]:
+                login_started = time.perf_counter()
+                response = self.login(email, password, "10.2.0.1")
+                latencies.append(time.perf_counter() - login_started)
+                if not response or not response["token"]:
+                    failures += 1
+                time.sleep(options["legit_interval"])
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+        return {
+            "latencies": latencies,
+            "failures": failures,
+            "attempts": stats["attempts"],
+            "rejected": stats["rejected"],
+            "elapsed": elapsed,
+        }
+
+    def report(self, title, results):
+        latencies = sorted(latency * 1000 for latency in results["latencies"])
+        p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        self.stdout.write(
+            f"  legitimate logins: {len(latencies)}, failed: {results['failures']}, "
+            f"p50: {statistics.median(latencies):.1f} ms, p95: {p95:.1f} ms, "
+            f"max: {latencies[-1]:.1f} ms"
+        )
+        self.stdout.write(
+            f"  attack attempts: {results['attempts']} "
+            f"({results['attempts'] / results['elapsed']:.0f}/s), "
+            f"rejected by the rate limits: {results['rejected']}"
+        )
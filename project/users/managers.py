@@ -1,18 +1,26 @@
 #! -*- coding: utf-8 -*-
-from typing import Any  # NOQA
+from typing import Any, Optional  # NOQA
 
 from django.contrib.auth.models import UserManager as DjangoUserManager
 from django.db.models import Model, QuerySet
 
 
 class UserManager(DjangoUserManager):
+    @classmethod
+    def normalize_email(cls, email: Optional[str]) -> str:
+        """
+        Return the stored form of the address, lowercased, so the lookups
+        are exact matches served by the unique index of the emails.
+        """
+        return (email or "").strip().lower()
+
     def _create_user(
         self, email: str, password: str = None, **extra_fields: Any
     ) -> Model:
         """
         Creates and saves a User with the given email and password.
         """
-        email = self.normalize_email(email.lower())
+        email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
@@ -47,7 +55,13 @@ class UserManager(DjangoUserManager):
         return self._create_user(email, password, **extra_fields)
 
     def get_by_natural_key(self, username: str) -> Model:
-        return self.get(**{self.model.USERNAME_FIELD + "__iexact": username})
+        return self.get(**{self.model.USERNAME_FIELD: self.normalize_email(username)})
+
+    def get_by_email(self, email: str) -> Optional[Model]:
+        try:
+            return self.get(email=self.normalize_email(email))
+        except self.model.DoesNotExist:
+            return None
 
     def filter_active(self) -> QuerySet:
         return self.exclude(is_active=False)
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.12 on 2026-10-19 10:30
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower, Trim
+
+
+def normalize_emails(apps, schema_editor):
+    """Normalize the emails saved before their normalization, the lookups
+    are exact matches.
+
+    The migration fails when addresses differ only by their case or their
+    surrounding spaces, the accounts should be merged, or their addresses
+    changed, before running it again.
+    """
+    User = apps.get_model("users", "User")
+    users = User.objects.annotate(normalized=Lower(Trim("email")))
+    collisions = (
+        users.values("normalized")
+        .annotate(count=Count("pk"))
+        .filter(count__gt=1)
+        .values_list("normalized", flat=True)
+    )
+    colliding = (
+        users.filter(normalized__in=collisions)
+        .order_by("normalized", "email")
+        .values_list("pk", "email")
+    )
+    if colliding:
+        raise RuntimeError(
+            "These users have addresses that only differ by their case or "
+            "their spaces, merge the accounts or change their addresses and "
+            "run the migration again:\n"
+            + "\n".join(f"  {pk} {email!r}" for pk, email in colliding)
+        )
+    for user in users.exclude(email=Lower(Trim("email"))).only("email").iterator():
+        User.objects.filter(pk=user.pk).update(email=user.normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_jwt_token_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_emails, migrations.RunPython.noop),
+    ]
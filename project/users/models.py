@@ -55,6 +55,10 @@ class User(AbstractBaseUser, SimpleModel, PermissionsMixin):
     EMAIL_FIELD = "email"
     USERNAME_FIELD = "email"
 
+    def clean(self):
+        super().clean()
+        self.email = self.__class__.objects.normalize_email(self.email)
+
     def get_full_name(self):
         # type: () -> str
         full_name = "%s %s" % (self.first_name, self.last_name)
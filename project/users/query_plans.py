@@ -0,0 +1,23 @@
+import uuid
+from typing import List, Tuple
+
+from django.db.models import QuerySet
+
+from .models import User
+
+
+def get_query_plan_checks() -> List[Tuple[str, QuerySet]]:
+    """Return the lookups of the authentication, their plans should seek an
+    index. They aren't ordered, like the queries of `get`."""
+    return [
+        (
+            "user by email",
+            User.objects.filter(
+                email=User.objects.normalize_email("User@Example.com")
+            ).order_by(),
+        ),
+        (
+            "active user by ID",
+            User.objects.filter(pk=uuid.uuid4(), is_active=True).order_by(),
+        ),
+    ]
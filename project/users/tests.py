@@ -0,0 +1,143 @@
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from ..core.jwt import create_access_token, get_user_from_access_token
+from ..core.query_plans import PLAN_PATTERNS, explain, get_plan_problems
+from ..graphql.api import schema
+from . import last_login
+from .last_login import LastLoginBuffer, update_last_login
+from .models import User
+from .query_plans import get_query_plan_checks
+
+TOKEN_CREATE_MUTATION = """
+    mutation($email: String!, $password: String!) {
+        tokenCreate(email: $email, password: $password) { token errors { code } }
+    }
+"""
+
+
+class AuthenticationQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="User@Example.com", password="password"
+        )
+
+    def test_user_is_found_by_any_form_of_its_email_in_one_query(self):
+        with self.assertNumQueries(1):
+            user = User.objects.get_by_email("  USER@example.com ")
+        self.assertEqual(user, self.user)
+
+    def test_user_of_an_access_token_is_fetched_in_one_query(self):
+        token = create_access_token(self.user)
+
+        with self.assertNumQueries(1):
+            user = get_user_from_access_token(token)
+        self.assertEqual(user, self.user)
+
+    def test_token_create_looks_the_user_up_once(self):
+        request = RequestFactory().post("/graphql/")
+        # the user lookup and the first last login date
+        with self.assertNumQueries(2):
+            result = schema.execute(
+                TOKEN_CREATE_MUTATION,
+                context_value=request,
+                variable_values={"email": "user@EXAMPLE.com", "password": "password"},
+            )
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data["tokenCreate"]["errors"], [])
+
+
+@override_settings(
+    LAST_LOGIN_UPDATE_GRANULARITY=60,
+    LAST_LOGIN_BUFFER_SIZE=3,
+    LAST_LOGIN_FLUSH_INTERVAL=30,
+)
+class LastLoginTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.buffer = LastLoginBuffer()
+        patcher = mock.patch.object(last_login, "last_login_buffer", self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.cancel_timer)
+        self.last_login = timezone.now() - timedelta(hours=1)
+        self.users = [
+            User.objects.create_user(
+                email=f"user{number}@example.com", last_login=self.last_login
+            )
+            for number in range(3)
+        ]
+
+    def cancel_timer(self):
+        if self.buffer._timer is not None:
+            self.buffer._timer.cancel()
+
+    def get_stored_last_logins(self):
+        return [User.objects.get(pk=user.pk).last_login for user in self.users]
+
+    def test_first_login_is_written_right_away(self):
+        user = User.objects.create_user(email="new@example.com")
+
+        update_last_login(user)
+
+        self.assertEqual(User.objects.get(pk=user.pk).last_login, user.last_login)
+        self.assertEqual(self.buffer._pending, {})
+
+    def test_login_within_the_granularity_isnt_written(self):
+        user = self.users[0]
+        user.last_login = last_login_date = timezone.now() - timedelta(seconds=30)
+
+        with self.assertNumQueries(0):
+            update_last_login(user)
+
+        self.assertEqual(user.last_login, last_login_date)
+        self.assertEqual(self.buffer._pending, {})
+
+    @override_settings(LAST_LOGIN_BUFFER_SIZE=0)
+    def test_login_is_written_without_a_buffer(self):
+        user = self.users[0]
+
+        update_last_login(user)
+
+        self.assertGreater(user.last_login, self.last_login)
+        self.assertEqual(User.objects.get(pk=user.pk).last_login, user.last_login)
+
+    def test_logins_are_written_when_the_buffer_is_full(self):
+        with self.assertNumQueries(0):
+            for user in self.users[:2]:
+                update_last_login(user)
+        self.assertEqual(self.get_stored_last_logins(), [self.last_login] * 3)
+
+        update_last_login(self.users[2])
+
+        self.assertEqual(
+            self.get_stored_last_logins(), [user.last_login for user in self.users]
+        )
+        self.assertEqual(self.buffer._pending, {})
+
+    def test_logins_are_written_after_the_flush_interval(self):
+        with mock.patch("time.monotonic", return_value=1000.0):
+            update_last_login(self.users[0])
+        self.assertEqual(self.get_stored_last_logins()[0], self.last_login)
+
+        with mock.patch("time.monotonic", return_value=1030.0):
+            update_last_login(self.users[1])
+
+        self.assertEqual(
+            self.get_stored_last_logins(),
+            [self.users[0].last_login, self.users[1].last_login, self.last_login],
+        )
+
+
+@skipUnless(connection.vendor in PLAN_PATTERNS, "The plans aren't checked.")
+class AuthenticationQueryPlanTests(TestCase):
+    def test_authentication_lookups_seek_an_index(self):
+        for name, queryset in get_query_plan_checks():
+            with self.subTest(name):
+                plan = explain(queryset)
+                self.assertEqual(get_plan_problems(plan), [], plan)